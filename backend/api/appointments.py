@@ -1,23 +1,21 @@
 from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
 from database import get_db, Appointment, Doctor
 from typing import List, Optional
 from pydantic import BaseModel
+from whatsapp_bot.appointment_manager import appointment_manager, is_slot_conflict
+from api.pagination import keyset_page, count_total, TOTAL_EXACT, TOTAL_ESTIMATE
+from api.export import streaming_export, NDJSON
+from clinic_clock import clinic_clock
+from structured_logging import get_logger
 
 router = APIRouter(tags=["Appointments"])
 
-@router.get("")
-def get_appointments(
-    skip: int = 0,
-    limit: int = 100,
-    status: Optional[str] = None,
-    date: Optional[str] = None,
-    doctorId: Optional[str] = None,
-    db: Session = Depends(get_db)
-):
-    print(f">>> GET APPOINTMENTS CALLED params: status={status}, date={date}, doctorId={doctorId}")
-    query = db.query(Appointment)
-    
+logger = get_logger("api.appointments", sampled=True)  # The list is polled by every dashboard
+
+def filter_appointments(query, status: Optional[str] = None, date: Optional[str] = None, doctorId: Optional[str] = None):
+    """Apply the list filters shared by the list and export endpoints"""
     if status and status != "All Statuses":
         if ',' in status:
             status_list = [s.strip() for s in status.split(',')]
@@ -36,35 +34,99 @@ def get_appointments(
 
     if doctorId:
         query = query.filter(Appointment.doctor_id == int(doctorId))
-    
-    total = query.count()
-    appointments_db = query.offset(skip).limit(limit).all()
-    
-    # Format to camelCase for frontend
-    formatted_appointments = []
-    for apt in appointments_db:
-        formatted_appointments.append({
-            "id": apt.id,
-            "patient": {
-                "name": apt.patient_name,
-                "mobile": apt.patient_phone or "N/A"
-            },
-            "doctor": {
-                "name": apt.doctor_name,
-                "department": apt.department
-            },
-            "appointmentDate": str(apt.date),
-            "slotStartTime": apt.time,
-            "type": apt.type,
-            "status": apt.status,
-            "reasonForVisit": apt.reason,
-            "source": apt.booking_source or "Dashboard"
-        })
-    
+    return query
+
+def format_appointment(apt) -> dict:
+    """camelCase shape used by the frontend"""
     return {
+        "id": apt.id,
+        "patient": {
+            "name": apt.patient_name,
+            "mobile": apt.patient_phone or "N/A"
+        },
+        "doctor": {
+            "name": apt.doctor_name,
+            "department": apt.department
+        },
+        "appointmentDate": str(apt.date),
+        "slotStartTime": apt.time,
+        "type": apt.type,
+        "status": apt.status,
+        "reasonForVisit": apt.reason,
+        "source": apt.booking_source or "Dashboard"
+    }
+
+# Stable list order; the keyset cursor is the last row's values (ix_appointments_date_time_id)
+LIST_ORDER = (Appointment.date, Appointment.time, Appointment.id)
+
+def _cursor_values(values):
+    from datetime import datetime
+    return [datetime.strptime(values[0], "%Y-%m-%d").date(), str(values[1]), int(values[2])]
+
+@router.get("")
+def get_appointments(
+    skip: int = 0,
+    limit: int = 100,
+    status: Optional[str] = None,
+    date: Optional[str] = None,
+    doctorId: Optional[str] = None,
+    cursor: Optional[str] = None,
+    total: Optional[str] = None,
+    db: Session = Depends(get_db)
+):
+    """Appointments ordered by date, time, id. Pass the returned `nextCursor` as
+    `cursor` for the next page (`skip` still works, but deep offsets are slow).
+    `total=exact` or `total=estimate` adds the number of matching rows."""
+    logger.debug("List appointments", extra={"status": status, "date": date, "doctorId": doctorId, "cursor": cursor})
+    query = filter_appointments(db.query(Appointment), status, date, doctorId)
+
+    appointments_db, next_cursor = keyset_page(
+        query, LIST_ORDER, cursor, limit, convert=_cursor_values, offset=0 if cursor else skip
+    )
+
+    response = {
         "success": True,
-        "data": formatted_appointments
+        "data": [format_appointment(apt) for apt in appointments_db],
+        "nextCursor": next_cursor
     }
+    if total in (TOTAL_EXACT, TOTAL_ESTIMATE):
+        filtered = filter_appointments(db.query(Appointment), status, date, doctorId)
+        response["total"], response["totalIsEstimate"] = count_total(
+            db, filtered, total, Appointment.__tablename__, filtered=bool(status or date or doctorId)
+        )
+    return response
+
+# CSV columns of format_appointment (nested keys flattened)
+EXPORT_COLUMNS = [
+    "id", "patient.name", "patient.mobile", "doctor.name", "doctor.department", "appointmentDate",
+    "slotStartTime", "type", "status", "reasonForVisit", "source"
+]
+
+@router.get("/export")
+def export_appointments(
+    format: str = NDJSON,
+    status: Optional[str] = None,
+    date: Optional[str] = None,
+    doctorId: Optional[str] = None
+):
+    """Every matching appointment, streamed as NDJSON or CSV, in list order"""
+    if doctorId and not doctorId.isdigit():
+        raise HTTPException(status_code=400, detail="doctorId must be a number")
+    return streaming_export(
+        "appointments",
+        lambda db: filter_appointments(db.query(Appointment), status, date, doctorId).order_by(*LIST_ORDER),
+        format_appointment,
+        format,
+        EXPORT_COLUMNS
+    )
+
+def slot_taken(doctor_id, date: str, time: str) -> HTTPException:
+    """409 for a doctor slot that already has an active booking, with the next free one"""
+    next_slot = appointment_manager.next_free_slot(doctor_id, date, time)
+    return HTTPException(status_code=409, detail={
+        "message": f"The slot {date} {time} is already booked for this doctor",
+        "nextAvailable": {"date": next_slot[0], "time": next_slot[1]} if next_slot else None
+    })
 
 class StatusUpdate(BaseModel):
     status: str
@@ -82,7 +144,14 @@ def update_appointment_status(
         raise HTTPException(status_code=404, detail="Appointment not found")
     
     appointment.status = status_update.status
-    db.commit()
+    try:
+        db.commit()
+    except IntegrityError as e:
+        # Reactivating a cancelled appointment whose slot has been rebooked
+        db.rollback()
+        if not is_slot_conflict(e):
+            raise
+        raise slot_taken(appointment.doctor_id, str(appointment.date), appointment.time)
     return {"success": True, "message": "Status updated"}
 
 from database import get_db, Appointment, Doctor
@@ -124,58 +193,49 @@ def create_appointment(appointment: AppointmentCreate, db: Session = Depends(get
 
         # Validate appointment time is not in the past
         appointment_datetime = datetime.combine(new_appointment.date, datetime.strptime(new_appointment.time, "%H:%M").time())
-        if appointment_datetime < datetime.now():
+        if appointment_datetime < clinic_clock.local_now():
             raise HTTPException(status_code=400, detail="Cannot book appointments in the past")
         
         db.add(new_appointment)
-        db.commit()
-        db.refresh(new_appointment)
 
-        # Sync to Google Calendar
-        try:
-            from whatsapp_bot.google_calendar_service import google_calendar_service
-            # Use doctor's specific calendar ID if available, otherwise fallback to 'primary'
-            calendar_id = doctor.google_calendar_id if doctor.google_calendar_id else 'primary'
-            
-            google_calendar_service.create_appointment(
-                calendar_id=calendar_id,
+        # The calendar event is created by the background sync worker
+        from whatsapp_bot.calendar_sync import mark_pending, calendar_sync_worker
+        mark_pending(new_appointment)
+
+        # Queue the WhatsApp confirmation in the same transaction; the outbox
+        # dispatcher delivers it (with retries) after the commit
+        from whatsapp_bot.outbox import enqueue_template, outbox_dispatcher
+        from whatsapp_bot.templates import WhatsAppTemplates
+
+        if new_appointment.patient_phone:
+            components = WhatsAppTemplates.get_confirmation_components(
                 patient_name=new_appointment.patient_name,
-                patient_phone=new_appointment.patient_phone,
                 doctor_name=new_appointment.doctor_name,
-                date=str(new_appointment.date),
+                date=new_appointment.date,
                 time=new_appointment.time
             )
-            print(f"Appointment synced to Google Calendar ({calendar_id})")
-        except Exception as e:
-            print(f"Failed to sync to Google Calendar: {e}")
-            # We do NOT rollback the DB transaction here because the appointment IS created in our system.
-            # In a production system, we might want a background job to retry sync.
-            
-        # Send WhatsApp Confirmation Template
-        try:
-            from whatsapp_bot.whatsapp_client import whatsapp_client
-            from whatsapp_bot.templates import WhatsAppTemplates
-
-            if new_appointment.patient_phone:
-                components = WhatsAppTemplates.get_confirmation_components(
-                    patient_name=new_appointment.patient_name,
-                    doctor_name=new_appointment.doctor_name,
-                    date=new_appointment.date,
-                    time=new_appointment.time
-                )
-                whatsapp_client.send_template(
-                    to=new_appointment.patient_phone,
-                    template_name=WhatsAppTemplates.APPOINTMENT_CONFIRMATION,
-                    components=components
-                )
-                print(f"WhatsApp confirmation sent to {new_appointment.patient_phone}")
-        except Exception as e:
-            print(f"Failed to send WhatsApp confirmation: {e}")
+            enqueue_template(
+                db,
+                to=new_appointment.patient_phone,
+                template_name=WhatsAppTemplates.APPOINTMENT_CONFIRMATION,
+                components=components
+            )
+
+        db.commit()
+        db.refresh(new_appointment)
+        outbox_dispatcher.wake()
+        calendar_sync_worker.wake()
 
         return {"success": True, "data": new_appointment, "message": "Appointment created successfully"}
+    except IntegrityError as e:
+        db.rollback()
+        if not is_slot_conflict(e):
+            logger.error("Error creating appointment: %s", e)
+            raise HTTPException(status_code=400, detail=str(e))
+        raise slot_taken(appointment.doctor_id, appointment.date, appointment.time)
     except Exception as e:
         db.rollback()
-        print(f"Error creating appointment: {e}")
+        logger.exception("Error creating appointment: %s", e)
         raise HTTPException(status_code=400, detail=str(e))
 
 @router.post("/{appointment_id}/remind")
@@ -188,7 +248,7 @@ def send_appointment_reminder(appointment_id: int, db: Session = Depends(get_db)
         raise HTTPException(status_code=400, detail="Patient has no phone number")
         
     try:
-        from whatsapp_bot.whatsapp_client import whatsapp_client
+        from whatsapp_bot.outbox import enqueue_template, outbox_dispatcher
         from whatsapp_bot.templates import WhatsAppTemplates
         
         components = WhatsAppTemplates.get_reminder_components(
@@ -197,13 +257,57 @@ def send_appointment_reminder(appointment_id: int, db: Session = Depends(get_db)
             time=f"{appointment.date} at {appointment.time}"
         )
         
-        whatsapp_client.send_template(
+        enqueue_template(
+            db,
             to=appointment.patient_phone,
             template_name=WhatsAppTemplates.APPOINTMENT_REMINDER,
             components=components
         )
+        db.commit()
+        outbox_dispatcher.wake()
         
-        return {"success": True, "message": "Reminder sent successfully"}
+        return {"success": True, "message": "Reminder queued for delivery"}
     except Exception as e:
-        print(f"Error sending reminder: {e}")
+        db.rollback()
+        logger.exception("Error queueing reminder: %s", e)
         raise HTTPException(status_code=500, detail=f"Failed to send reminder: {str(e)}")
+
+@router.get("/calendar-sync")
+def get_unsynced_appointments(limit: int = 100, db: Session = Depends(get_db)):
+    """Appointments whose Google Calendar event is still pending or failed"""
+    from whatsapp_bot.calendar_sync import unsynced_query
+
+    appointments = unsynced_query(db).order_by(Appointment.id).limit(limit).all()
+    return {
+        "success": True,
+        "data": [
+            {
+                "id": a.id,
+                "patientName": a.patient_name,
+                "doctorName": a.doctor_name,
+                "date": str(a.date),
+                "time": a.time,
+                "syncStatus": a.calendar_sync_status,
+                "attempts": a.calendar_sync_attempts,
+                "nextAttemptAt": a.calendar_sync_next_at.isoformat() if a.calendar_sync_next_at else None,
+                "lastError": a.calendar_sync_error
+            }
+            for a in appointments
+        ]
+    }
+
+@router.post("/{appointment_id}/calendar-sync/retry")
+def retry_calendar_sync(appointment_id: int, db: Session = Depends(get_db)):
+    """Queue a failed (or never synced) appointment for another calendar sync"""
+    from whatsapp_bot.calendar_sync import mark_pending, calendar_sync_worker, SYNCED
+
+    appointment = db.query(Appointment).filter(Appointment.id == appointment_id).first()
+    if not appointment:
+        raise HTTPException(status_code=404, detail="Appointment not found")
+    if appointment.calendar_sync_status == SYNCED:
+        raise HTTPException(status_code=400, detail="Appointment is already synced")
+
+    mark_pending(appointment)
+    db.commit()
+    calendar_sync_worker.wake()
+    return {"success": True, "message": "Calendar sync queued"}
@@ -0,0 +1,27 @@
+from fastapi import APIRouter, Request
+from starlette.concurrency import run_in_threadpool
+from whatsapp_bot.calendar_mirror import calendar_mirror
+from structured_logging import get_logger
+
+logger = get_logger("api.calendar")
+
+router = APIRouter(tags=["Calendar"])
+
+@router.post("/notifications")
+async def receive_calendar_notification(request: Request):
+    """Google Calendar push notification (events.watch channel).
+    Always answered with 200 so Google doesn't retry; unknown channels are ignored."""
+    accepted = await run_in_threadpool(
+        calendar_mirror.handle_notification,
+        request.headers.get("X-Goog-Channel-ID", ""),
+        request.headers.get("X-Goog-Channel-Token", ""),
+        request.headers.get("X-Goog-Resource-State", "")
+    )
+    if not accepted:
+        logger.warning("Ignoring calendar notification for unknown channel %s", request.headers.get('X-Goog-Channel-ID'))
+    return {"status": "ok"}
+
+@router.get("/mirror")
+def get_mirror_status():
+    """Sync state of the local calendar mirror"""
+    return {"success": True, "data": calendar_mirror.status()}
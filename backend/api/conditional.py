@@ -0,0 +1,147 @@
+"""
+Conditional GET (ETag / If-None-Match) for the read-heavy endpoints.
+
+Every table an endpoint reads has a write generation in resource_versions,
+bumped after any commit that inserts, updates or deletes its rows, in a
+short transaction of its own - so concurrent writers never wait on each
+other's hold of the shared row. Between a commit and its bump a reader can
+get the new rows under the old generation; its next revalidation sees the
+bump and gets a 200. The endpoint's ETag hashes those generations with the
+path and query string (and the clinic date, for endpoints that show "today"), so
+it changes whenever the response could. `conditional(...)` is a dependency
+that reads the generations - one primary-key lookup - and answers a
+matching If-None-Match with 304 before the endpoint's own queries run;
+otherwise it puts the ETag on the 200. Browsers revalidate XHRs with
+If-None-Match on their own once a response has an ETag.
+
+Writes are tracked on SessionLocal: ORM flushes (after_flush) and bulk
+query.update()/delete() or session.execute(update(...)) (do_orm_execute).
+Only tables named in some `conditional(...)` are counted, and writes that
+only change UNVERSIONED_COLUMNS (the calendar sync worker's bookkeeping,
+which no conditional endpoint shows) don't count. Raw SQL, and
+Core writes on engine connections (scripts, migrations), are not seen -
+clients keep their cached copy until the next tracked write to the table.
+"""
+
+import hashlib
+from typing import Dict, Iterable, Optional, Set
+
+from fastapi import Depends, HTTPException, Request, Response
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+
+from clinic_clock import clinic_clock
+from database import SessionLocal, ResourceVersion, bulk_set_columns, dialect_insert, engine, get_db
+from structured_logging import get_logger
+
+logger = get_logger("api.conditional")
+
+# Tables some endpoint's ETag depends on; writes to any other table aren't counted
+VERSIONED_TABLES: Set[str] = set()
+
+# Columns no conditional endpoint returns; writes to only these keep the ETags
+UNVERSIONED_COLUMNS: Dict[str, Set[str]] = {
+    "appointments": {
+        "calendar_sync_status", "calendar_sync_attempts", "calendar_sync_next_at",
+        "calendar_sync_error", "calendar_event_id"
+    },
+}
+
+
+def bump_versions(session, tables: Iterable[str]):
+    """Increment the write generation of `tables` in `session`'s (or a Connection's) transaction"""
+    # Sorted, so concurrent commits lock the rows in the same order
+    statement = dialect_insert(ResourceVersion).values([{"name": name, "version": 1} for name in sorted(tables)])
+    session.execute(statement.on_conflict_do_update(
+        index_elements=[ResourceVersion.name],
+        set_={"version": ResourceVersion.version + 1}
+    ))
+
+
+def current_versions(db: Session, tables: Iterable[str]) -> Dict[str, int]:
+    rows = db.query(ResourceVersion.name, ResourceVersion.version).filter(ResourceVersion.name.in_(list(tables)))
+    return dict(rows.all())
+
+
+def _touch(session: Session, table: str, columns: Optional[Set[str]] = None):
+    """Note a write to `table`; `columns`, if known, are the ones it changed"""
+    if table not in VERSIONED_TABLES:
+        return
+    if columns is not None and columns <= UNVERSIONED_COLUMNS.get(table, set()):
+        return
+    session.info.setdefault("touched_tables", set()).add(table)
+
+
+def _changed_columns(obj) -> Set[str]:
+    state = inspect(obj)
+    return {attr.key for attr in state.mapper.column_attrs if state.attrs[attr.key].history.has_changes()}
+
+
+@event.listens_for(SessionLocal, "after_flush")
+def _collect_flushed(session, flush_context):
+    for obj in session.new:
+        _touch(session, obj.__table__.name)
+    for obj in session.dirty:
+        if session.is_modified(obj):
+            _touch(session, obj.__table__.name, _changed_columns(obj))
+    for obj in session.deleted:
+        _touch(session, obj.__table__.name)
+
+
+@event.listens_for(SessionLocal, "do_orm_execute")
+def _collect_bulk(orm_execute_state):
+    if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        table = getattr(orm_execute_state.statement, "table", None)
+        if table is not None:
+            columns = bulk_set_columns(orm_execute_state) if orm_execute_state.is_update else None
+            _touch(orm_execute_state.session, table.name, columns)
+
+
+@event.listens_for(SessionLocal, "after_commit")
+def _bump_touched(session):
+    # The commit's flush has run, so its tables are counted. The session can't
+    # execute here; the bump commits on its own connection, holding the row lock
+    # only for the upsert.
+    tables = session.info.pop("touched_tables", None)
+    if not tables:
+        return
+    try:
+        with engine.begin() as conn:
+            bump_versions(conn, tables)
+    except Exception:
+        # The write is committed; clients keep their copy until the table's next bump
+        logger.exception("Failed to bump versions of %s", sorted(tables))
+
+
+@event.listens_for(SessionLocal, "after_rollback")
+def _discard_touched(session):
+    session.info.pop("touched_tables", None)
+
+
+def _matches(if_none_match: str, etag: str) -> bool:
+    # Weak comparison (RFC 9110 13.1.2)
+    if if_none_match.strip() == "*":
+        return True
+    opaque = etag.removeprefix("W/")
+    return any(tag.strip().removeprefix("W/") == opaque for tag in if_none_match.split(","))
+
+
+def conditional(*tables: str, daily: bool = False):
+    """Dependency: 304 if the client's copy is current, else set the response's ETag.
+    `tables` are every table the endpoint reads; `daily` for endpoints showing "today"."""
+    VERSIONED_TABLES.update(tables)
+
+    def check(request: Request, response: Response, db: Session = Depends(get_db)):
+        versions = current_versions(db, tables)
+        parts = [request.url.path, request.url.query] + [f"{name}:{versions.get(name, 0)}" for name in tables]
+        if daily:
+            parts.append(clinic_clock.today().isoformat())
+        etag = f'W/"{hashlib.sha1("|".join(parts).encode()).hexdigest()[:20]}"'
+
+        if_none_match = request.headers.get("if-none-match")
+        if if_none_match and _matches(if_none_match, etag):
+            raise HTTPException(status_code=304, headers={"ETag": etag})
+        response.headers["ETag"] = etag
+        response.headers["Cache-Control"] = "no-cache"
+
+    return check
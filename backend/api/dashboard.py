@@ -1,70 +1,108 @@
 from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy import func
 from sqlalchemy.orm import Session
-from database import get_db, Doctor, Patient, Appointment
-from datetime import datetime, date
+from database import get_db, Doctor, Patient, DailyStat
+from daily_stats import NO_DOCTOR
+from datetime import date
+from api.conditional import conditional, current_versions
+from clinic_clock import DailyCache
+from structured_logging import get_logger
 
 router = APIRouter(tags=["Dashboard"])
 
-@router.get("/summary")
+logger = get_logger("api.dashboard")
+
+# Appointment statuses that count as "waiting" in the per-doctor summary
+WAITING_STATUSES = ("Booked", "Checked In")
+
+# Appointment status -> its counter in data.summary
+STATUS_KEYS = {
+    "Completed": "completed",
+    "Cancelled": "cancelled",
+    "Booked": "booked",
+    "Checked In": "checkedIn",
+    "In Consultation": "inConsultation",
+    "No Show": "noShow",
+}
+
+# Tables the summary is built from
+SUMMARY_TABLES = ("appointments", "doctors", "patients")
+
+# Today's summary, keyed on the SUMMARY_TABLES versions it was built from:
+# one build per change for every open dashboard, rolled over at clinic midnight
+summary_cache = DailyCache(max_entries=8)
+
+@router.get("/summary", dependencies=[Depends(conditional(*SUMMARY_TABLES, daily=True))])
 def get_dashboard_stats(db: Session = Depends(get_db)):
     """Generate dashboard data from database counts for TODAY only"""
     try:
-        # Get today's date
-        today = date.today()
-        
-        # Get actual counts from database
-        total_doctors = db.query(Doctor).count()
-        total_patients = db.query(Patient).count()
-        
-        # Filter appointments by today's date
-        total_appointments = db.query(Appointment).filter(Appointment.date == today).count()
-        
-        # Calculate statistics from actual data (TODAY only)
-        available_doctors = db.query(Doctor).filter(Doctor.status == "Available").count()
-        completed = db.query(Appointment).filter(Appointment.date == today, Appointment.status == "Completed").count()
-        cancelled = db.query(Appointment).filter(Appointment.date == today, Appointment.status == "Cancelled").count()
-        rescheduled = db.query(Appointment).filter(Appointment.date == today, Appointment.status == "Rescheduled").count()
-        booked = db.query(Appointment).filter(Appointment.date == today, Appointment.status == "Booked").count()
-        checked_in = db.query(Appointment).filter(Appointment.date == today, Appointment.status == "Checked In").count()
-        in_consultation = db.query(Appointment).filter(Appointment.date == today, Appointment.status == "In Consultation").count()
-        no_show = db.query(Appointment).filter(Appointment.date == today, Appointment.status == "No Show").count()
-        
-        # Doctor Summary (Group by doctor) - TODAY only
-        doctors = db.query(Doctor).all()
-        doctor_summary = []
-        for doc in doctors:
-            doc_appts = db.query(Appointment).filter(Appointment.doctor_id == doc.id, Appointment.date == today).count()
-            doc_completed = db.query(Appointment).filter(Appointment.doctor_id == doc.id, Appointment.date == today, Appointment.status == "Completed").count()
-            doc_waiting = db.query(Appointment).filter(Appointment.doctor_id == doc.id, Appointment.date == today, Appointment.status.in_(["Booked", "Checked In"])).count()
-            
-            doctor_summary.append({
-                "doctorId": doc.id,
-                "doctor": {
-                    "name": doc.name,
-                    "department": doc.specialization
-                },
-                "totalAppointments": doc_appts,
-                "completed": doc_completed,
-                "waiting": doc_waiting
-            })
-
+        versions = current_versions(db, SUMMARY_TABLES)
+        key = tuple(versions.get(name, 0) for name in SUMMARY_TABLES)
         return {
             "success": True,
-            "data": {
-                "summary": {
-                    "total": total_appointments,
-                    "completed": completed,
-                    "cancelled": cancelled,
-                    "booked": booked,
-                    "checkedIn": checked_in,
-                    "inConsultation": in_consultation,
-                    "noShow": no_show,
-                    "doctors": total_doctors,
-                    "patients": total_patients
-                },
-                "doctorSummary": doctor_summary
-            }
+            "data": summary_cache.get(key, lambda today: build_summary(db, today))
         }
     except Exception as e:
-        print(f"Error generating dashboard data: {e}")
+        logger.exception("Error generating dashboard data: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
+
+def build_summary(db: Session, today: date) -> dict:
+    """Summary counts and per-doctor rows for the clinic date `today`"""
+    # Precomputed (doctor_id, status) -> count rows for today, kept current by daily_stats.py
+    grouped = db.query(
+        DailyStat.doctor_id,
+        DailyStat.status,
+        DailyStat.count
+    ).filter(
+        DailyStat.date == today,
+        DailyStat.count > 0
+    ).all()
+
+    # Roll the groups up into hospital-wide and per-doctor counters
+    status_counts = {}
+    doctor_counts = {}
+    for doctor_id, status, count in grouped:
+        status_counts[status] = status_counts.get(status, 0) + count
+        if doctor_id == NO_DOCTOR:
+            continue
+        counts = doctor_counts.setdefault(doctor_id, {"total": 0, "completed": 0, "waiting": 0})
+        counts["total"] += count
+        if status == "Completed":
+            counts["completed"] += count
+        elif status in WAITING_STATUSES:
+            counts["waiting"] += count
+
+    total_appointments = sum(status_counts.values())
+    total_patients = db.query(func.count(Patient.id)).scalar()
+
+    # Doctor Summary - only the columns we render
+    doctors = db.query(Doctor.id, Doctor.name, Doctor.specialization).all()
+    empty_counts = {"total": 0, "completed": 0, "waiting": 0}
+    doctor_summary = []
+    for doc_id, doc_name, doc_specialization in doctors:
+        counts = doctor_counts.get(doc_id, empty_counts)
+        doctor_summary.append({
+            "doctorId": doc_id,
+            "doctor": {
+                "name": doc_name,
+                "department": doc_specialization
+            },
+            "totalAppointments": counts["total"],
+            "completed": counts["completed"],
+            "waiting": counts["waiting"]
+        })
+
+    return {
+        "summary": {
+            "total": total_appointments,
+            "completed": status_counts.get("Completed", 0),
+            "cancelled": status_counts.get("Cancelled", 0),
+            "booked": status_counts.get("Booked", 0),
+            "checkedIn": status_counts.get("Checked In", 0),
+            "inConsultation": status_counts.get("In Consultation", 0),
+            "noShow": status_counts.get("No Show", 0),
+            "doctors": len(doctors),
+            "patients": total_patients
+        },
+        "doctorSummary": doctor_summary
+    }
@@ -3,10 +3,15 @@ from sqlalchemy.orm import Session
 from database import get_db, Doctor
 from typing import List, Optional
 from pydantic import BaseModel
+from whatsapp_bot.doctor_service import doctor_service
+from api.conditional import conditional
+from structured_logging import get_logger
+
+logger = get_logger("api.doctors")
 
 router = APIRouter(tags=["Doctors"])
 
-@router.get("")
+@router.get("", dependencies=[Depends(conditional("doctors"))])
 def get_doctors(
     skip: int = 0,
     limit: int = 100,
@@ -78,12 +83,14 @@ def create_doctor(doctor: DoctorCreate, db: Session = Depends(get_db)):
         db.add(new_doctor)
         db.commit()
         db.refresh(new_doctor)
+        # SQLite can reuse ids of deleted doctors; never serve a stale slot grid
+        doctor_service.invalidate_slot_templates(new_doctor.id)
         return {"success": True, "data": new_doctor, "message": "Doctor created successfully"}
     except HTTPException as he:
         raise he
     except Exception as e:
         db.rollback()
-        print(f"Error creating doctor: {e}")
+        logger.exception("Error creating doctor")
         raise HTTPException(status_code=400, detail=str(e))
 
 @router.delete("/{doctor_id}")
@@ -99,8 +106,9 @@ def delete_doctor(doctor_id: int, db: Session = Depends(get_db)):
         
         db.delete(doctor)
         db.commit()
+        doctor_service.invalidate_slot_templates(doctor_id)
         return {"success": True, "message": "Doctor deleted successfully"}
     except Exception as e:
         db.rollback()
-        print(f"Error deleting doctor: {e}")
+        logger.exception("Error deleting doctor %s", doctor_id)
         raise HTTPException(status_code=500, detail=str(e))
@@ -0,0 +1,243 @@
+"""
+Live change feed for the queue and dashboard pages (Server-Sent Events).
+
+GET /api/live streams one `appointment` event per committed change that
+affects today's queue or dashboard counts. The pages load /api/queue and
+/api/dashboard/summary once and then apply the events, instead of every
+open tab re-running the summary aggregation every few seconds. Each event
+carries the appointment's queue row, whether it is in the queue now, and
+the change to the summary and per-doctor counters:
+
+    {"op": "updated", "day": "2025-03-01", "appointment": {...}, "inQueue": false,
+     "summary": {"booked": -1, "completed": 1},
+     "doctorSummary": [{"doctorId": 3, "waiting": -1, "completed": 1}]}
+
+`day` is the clinic date the deltas are for. The stream also sends a `day`
+event with the clinic date when it starts and whenever the date changes,
+so pages reload their snapshot at the clinic's midnight, not the browser's.
+
+Changes are picked up from session events on SessionLocal, so every write
+path - the dashboard endpoints and the WhatsApp booking and cancel flows -
+feeds the stream without call-site changes: after_flush records each
+Appointment's old and new (date, status, doctor), after_commit publishes
+them and a rollback forgets them. Bulk query.update()s bypass the ORM and
+are not seen.
+
+One in-process broadcaster fans events out to every subscriber: an event
+is serialised once and the same bytes are queued on every stream. Commits
+happen on request and worker threads, so publishing hops onto the event
+loop with call_soon_threadsafe. A subscriber that falls LIVE_BACKLOG
+events behind (a stalled client) is disconnected rather than buffered;
+EventSource reconnects and the page reloads its snapshot. Like the slot
+holds, the feed is per process - each worker only sees its own writes.
+"""
+
+import asyncio
+import contextvars
+import json
+from datetime import date
+from typing import Dict, List, Optional, Set, Tuple
+
+from fastapi import APIRouter
+from fastapi.responses import StreamingResponse
+from sqlalchemy import event, inspect
+
+from clinic_clock import clinic_clock
+from database import SessionLocal, Appointment
+from api.dashboard import STATUS_KEYS, WAITING_STATUSES
+from api.queue import QUEUE_STATUSES, format_queue_entry
+
+router = APIRouter(tags=["Live"])
+
+# Events a subscriber may fall behind by before it is disconnected
+LIVE_BACKLOG = 256
+# Comment line sent on idle streams so proxies don't time them out
+LIVE_HEARTBEAT_SECONDS = 15
+# EventSource reconnect delay
+LIVE_RETRY_MS = 3000
+
+# Columns whose changes can move an appointment in or out of the queue or a counter
+WATCHED_COLUMNS = ("date", "status", "doctor_id", "time")
+
+State = Tuple[date, str, Optional[int]]  # (date, status, doctor_id)
+
+
+class ChangeFeed:
+    def __init__(self, backlog: int = LIVE_BACKLOG):
+        self.backlog = backlog
+        self._subscribers: Set[asyncio.Queue] = set()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._seq = 0
+        self.stats = {"published": 0, "disconnected": 0}
+
+    def subscribe(self) -> asyncio.Queue:
+        self._loop = asyncio.get_running_loop()
+        queue = asyncio.Queue(self.backlog)
+        self._subscribers.add(queue)
+        return queue
+
+    def unsubscribe(self, queue: asyncio.Queue):
+        self._subscribers.discard(queue)
+
+    def publish(self, event_type: str, payload: Dict):
+        """Send an event to every subscriber. Safe to call from any thread."""
+        loop = self._loop
+        if not self._subscribers or loop is None or loop.is_closed():
+            return
+        body = f"event: {event_type}\ndata: {json.dumps(payload, default=str)}\n\n"
+        loop.call_soon_threadsafe(self._broadcast, body)
+
+    def _broadcast(self, body: str):
+        self._seq += 1
+        self.stats["published"] += 1
+        frame = f"id: {self._seq}\n{body}".encode()
+        for queue in list(self._subscribers):
+            try:
+                queue.put_nowait(frame)
+            except asyncio.QueueFull:
+                # Too far behind: drop what it has and tell the stream to end
+                self._subscribers.discard(queue)
+                self.stats["disconnected"] += 1
+                while not queue.empty():
+                    queue.get_nowait()
+                queue.put_nowait(None)
+
+    async def stream(self):
+        """SSE body for one subscriber"""
+        queue = self.subscribe()
+        try:
+            yield f"retry: {LIVE_RETRY_MS}\n\n".encode()
+            day = _clinic_today()
+            yield _day_frame(day)
+            while True:
+                try:
+                    frame = await asyncio.wait_for(queue.get(), LIVE_HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    frame = b": ping\n\n"
+                if frame is None:
+                    return
+                if _clinic_today() != day:
+                    day = _clinic_today()
+                    yield _day_frame(day)
+                yield frame
+        finally:
+            self.unsubscribe(queue)
+
+    def metrics(self) -> Dict:
+        return {**self.stats, "subscribers": len(self._subscribers)}
+
+change_feed = ChangeFeed()
+
+
+def _clinic_today() -> date:
+    # The stream's request pinned the clinic clock when it opened; read past the pin
+    return contextvars.Context().run(clinic_clock.today)
+
+
+def _day_frame(day: date) -> bytes:
+    return f"event: day\ndata: {json.dumps({'day': day.isoformat()})}\n\n".encode()
+
+
+def _counters(state: Optional[State], summary_day: date):
+    """(summary, per-doctor) counters one appointment contributes to the dashboard summary"""
+    if state is None or state[0] != summary_day:
+        return {}, {}
+    day, status, doctor_id = state
+    summary = {"total": 1}
+    if status in STATUS_KEYS:
+        summary[STATUS_KEYS[status]] = 1
+    doctors = {}
+    if doctor_id is not None:
+        doctors[doctor_id] = {
+            "totalAppointments": 1,
+            "completed": int(status == "Completed"),
+            "waiting": int(status in WAITING_STATUSES)
+        }
+    return summary, doctors
+
+
+def _subtract(after: Dict, before: Dict) -> Dict:
+    delta = {key: after.get(key, 0) - before.get(key, 0) for key in set(after) | set(before)}
+    return {key: value for key, value in delta.items() if value}
+
+
+def _in_queue(state: Optional[State], queue_day: date) -> bool:
+    return state is not None and state[0] == queue_day and state[1] in QUEUE_STATUSES
+
+
+def appointment_event(apt: Appointment, op: str, before: Optional[State], after: Optional[State]) -> Optional[Dict]:
+    """Payload for a change from `before` to `after`, or None if neither the queue nor the summary is affected"""
+    # GET /api/queue and GET /api/dashboard/summary both show the clinic's today
+    queue_day = summary_day = clinic_clock.today()
+
+    summary_before, doctors_before = _counters(before, summary_day)
+    summary_after, doctors_after = _counters(after, summary_day)
+    summary = _subtract(summary_after, summary_before)
+    doctor_summary = []
+    for doctor_id in sorted(set(doctors_before) | set(doctors_after)):
+        delta = _subtract(doctors_after.get(doctor_id, {}), doctors_before.get(doctor_id, {}))
+        if delta:
+            doctor_summary.append({"doctorId": doctor_id, **delta})
+
+    was_queued, in_queue = _in_queue(before, queue_day), _in_queue(after, queue_day)
+    if not (summary or doctor_summary or was_queued or in_queue):
+        return None
+    return {
+        "op": op,
+        "day": queue_day.isoformat(),
+        "appointment": format_queue_entry(apt),
+        "inQueue": in_queue,
+        "summary": summary,
+        "doctorSummary": doctor_summary
+    }
+
+
+def _state(apt: Appointment, previous: bool = False) -> State:
+    attrs = inspect(apt).attrs
+    values = []
+    for key in ("date", "status", "doctor_id"):
+        history = attrs[key].history
+        values.append(history.deleted[0] if previous and history.deleted else attrs[key].value)
+    return tuple(values)
+
+
+@event.listens_for(SessionLocal, "after_flush")
+def _collect_changes(session, flush_context):
+    changes: List[Dict] = []
+    for apt in session.new:
+        if isinstance(apt, Appointment):
+            changes.append(appointment_event(apt, "created", None, _state(apt)))
+    for apt in session.dirty:
+        if isinstance(apt, Appointment) and any(inspect(apt).attrs[key].history.has_changes() for key in WATCHED_COLUMNS):
+            changes.append(appointment_event(apt, "updated", _state(apt, previous=True), _state(apt)))
+    for apt in session.deleted:
+        if isinstance(apt, Appointment):
+            changes.append(appointment_event(apt, "deleted", _state(apt, previous=True), None))
+    changes = [change for change in changes if change]
+    if changes:
+        session.info.setdefault("live_changes", []).extend(changes)
+
+
+@event.listens_for(SessionLocal, "after_commit")
+def _publish_changes(session):
+    for change in session.info.pop("live_changes", ()):
+        change_feed.publish("appointment", change)
+
+
+@event.listens_for(SessionLocal, "after_rollback")
+def _discard_changes(session):
+    session.info.pop("live_changes", None)
+
+
+@router.get("")
+async def live_events():
+    return StreamingResponse(
+        change_feed.stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+@router.get("/metrics")
+def live_metrics():
+    return {"success": True, "data": change_feed.metrics()}
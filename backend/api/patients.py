@@ -2,41 +2,54 @@ from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
 from database import get_db, Patient
 from typing import List, Optional
+from api.export import streaming_export, NDJSON
+from api.conditional import conditional
 
 router = APIRouter(tags=["Patients"])
 
-@router.get("")
+def format_patient(p) -> dict:
+    """camelCase shape used by the frontend"""
+    return {
+        "id": p.id,
+        "name": p.name,
+        "age": p.age,
+        "gender": p.gender,
+        "bloodGroup": p.blood_group,
+        "condition": p.condition,
+        "lastVisit": str(p.last_visit) if p.last_visit else None,
+        "status": p.status,
+        "email": p.email,
+        "phone": p.phone,
+        "address": p.address
+    }
+
+@router.get("", dependencies=[Depends(conditional("patients"))])
 def get_patients(
     skip: int = 0,
     limit: int = 100,
     db: Session = Depends(get_db)
 ):
     query = db.query(Patient)
-    total = query.count()
     patients_db = query.offset(skip).limit(limit).all()
     
-    # Format to camelCase for frontend
-    formatted_patients = []
-    for p in patients_db:
-        formatted_patients.append({
-            "id": p.id,
-            "name": p.name,
-            "age": p.age,
-            "gender": p.gender,
-            "bloodGroup": p.blood_group,
-            "condition": p.condition,
-            "lastVisit": str(p.last_visit) if p.last_visit else None,
-            "status": p.status,
-            "email": p.email,
-            "phone": p.phone,
-            "address": p.address
-        })
-    
     return {
         "success": True,
-        "data": formatted_patients
+        "data": [format_patient(p) for p in patients_db]
     }
 
+EXPORT_COLUMNS = ["id", "name", "age", "gender", "bloodGroup", "condition", "lastVisit", "status", "email", "phone", "address"]
+
+@router.get("/export")
+def export_patients(format: str = NDJSON):
+    """Every patient, streamed as NDJSON or CSV, by id"""
+    return streaming_export(
+        "patients",
+        lambda db: db.query(Patient).order_by(Patient.id),
+        format_patient,
+        format,
+        EXPORT_COLUMNS
+    )
+
 @router.post("/")
 def create_patient(patient_data: dict, db: Session = Depends(get_db)):
     try:
@@ -1,17 +1,38 @@
 from fastapi import APIRouter, Depends
 from sqlalchemy.orm import Session
 from database import get_db, Appointment
-from datetime import datetime
-import pytz
-from whatsapp_bot.config import config
+from api.conditional import conditional
+from clinic_clock import clinic_clock
+from structured_logging import get_logger
 
 router = APIRouter(tags=["Queue"])
 
-@router.get("")
+logger = get_logger("api.queue", sampled=True)  # Every dashboard polls the queue
+
+# Statuses shown in the live queue
+QUEUE_STATUSES = ("Booked", "Checked In", "In Consultation")
+
+def format_queue_entry(apt) -> dict:
+    return {
+        "id": apt.id,
+        "patient": {
+            "name": apt.patient_name,
+            "mobile": apt.patient_phone
+        },
+        "doctor": {
+            "name": apt.doctor_name,
+            "department": apt.department
+        },
+        "slotStartTime": apt.time,
+        "status": apt.status,
+        "source": apt.booking_source,
+        "waitingTime": 0 # Placeholder implementation
+    }
+
+@router.get("", dependencies=[Depends(conditional("appointments", daily=True))])
 def get_queue(db: Session = Depends(get_db)):
     # Get today's date in local timezone
-    tz = pytz.timezone(config.TIMEZONE)
-    today = datetime.now(tz).date()
+    today = clinic_clock.today()
     
     # Get all active appointments for today
     # Filter by date and status (exclude cancelled/completed for queue view if desired, but frontend filters too)
@@ -20,32 +41,13 @@ def get_queue(db: Session = Depends(get_db)):
     
     query = db.query(Appointment).filter(
         Appointment.date == today,
-        Appointment.status.in_(["Booked", "Checked In", "In Consultation"])
-    )
+        Appointment.status.in_(QUEUE_STATUSES)
+    ).order_by(Appointment.time, Appointment.id)  # The live feed inserts in this order too
     
-    print(f"[DEBUG] Queue Request. Date: {today}")
     appointments = query.all()
-    print(f"[DEBUG] Found {len(appointments)} appointments for today.")
-    for apt in appointments:
-         print(f" - ID: {apt.id}, Status: {apt.status}, Doc: {apt.doctor_name}")
+    logger.debug("Queue request", extra={"date": today, "count": len(appointments)})
     
-    formatted_queue = []
-    for apt in appointments:
-        formatted_queue.append({
-            "id": apt.id,
-            "patient": {
-                "name": apt.patient_name,
-                "mobile": apt.patient_phone
-            },
-            "doctor": {
-                "name": apt.doctor_name,
-                "department": apt.department
-            },
-            "slotStartTime": apt.time,
-            "status": apt.status,
-            "source": apt.booking_source,
-            "waitingTime": 0 # Placeholder implementation
-        })
+    formatted_queue = [format_queue_entry(apt) for apt in appointments]
         
     return {
         "success": True,
@@ -4,25 +4,39 @@ Handles WhatsApp booking, cancellation, and rescheduling
 Directly integrated into the FastAPI backend
 """
 
-from fastapi import APIRouter, Depends, HTTPException, Request, BackgroundTasks
+from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi.responses import JSONResponse
 from sqlalchemy.orm import Session
 from database import get_db
 from datetime import datetime
+import asyncio
 import os
-import traceback
-import json
+from anyio import from_thread
+from starlette.concurrency import run_in_threadpool
 from whatsapp_bot.config import config
+from clinic_clock import clinic_clock
+from structured_logging import get_logger, metrics as log_metrics
 
 # Import local bot services
-from whatsapp_bot.whatsapp_client import whatsapp_client
+from whatsapp_bot.whatsapp_client import async_whatsapp_client
 # from whatsapp_bot.ai_service import ai_service # AI Removed
 from whatsapp_bot.doctor_service import doctor_service
-from whatsapp_bot.appointment_manager import appointment_manager
-from whatsapp_bot.google_calendar_service import google_calendar_service
+from whatsapp_bot.appointment_manager import appointment_manager, SlotUnavailableError
+from whatsapp_bot.calendar_mirror import calendar_mirror
+from whatsapp_bot.async_calendar import async_calendar_service
 from whatsapp_bot.cancel_functions import show_user_appointments, cancel_appointment
+from whatsapp_bot.calendar_sync import calendar_sync_worker
+from whatsapp_bot.webhook_ingest import iter_messages, webhook_dedup
+from whatsapp_bot.keyed_scheduler import message_scheduler
+from whatsapp_bot.slot_holds import slot_holds
+from whatsapp_bot.outbox import outbox_stats, format_message, outbox_dispatcher, DEAD, PENDING
 
 router = APIRouter(tags=["WhatsApp"])
 
+logger = get_logger("api.whatsapp")
+# Every inbound webhook body, at DEBUG; benchmarks/replay_webhooks.py replays these lines
+webhook_log = get_logger("api.whatsapp.webhook", sampled=True)
+
 # ==================== WEBHOOK ENDPOINTS ====================
 
 @router.head("/webhook")
@@ -49,32 +63,39 @@ async def verify_webhook(request: Request):
     return {"status": "ok", "message": "Webhook endpoint is active"}
 
 @router.post("/webhook")
-async def receive_webhook(request: Request, background_tasks: BackgroundTasks):
+async def receive_webhook(request: Request):
     """Receive WhatsApp messages and process them"""
     try:
         data = await request.json()
-        print(f"Webhook Received: {json.dumps(data)}")
-        
-        if data.get('object') == 'whatsapp_business_account':
-            for entry in data.get('entry', []):
-                for change in entry.get('changes', []):
-                    value = change.get('value', {})
-                    
-                    if 'messages' in value:
-                        for message in value['messages']:
-                            # Process each message in background to avoid timeouts
-                            background_tasks.add_task(process_message, message, value)
+        webhook_log.debug("Webhook Received", extra={"payload": data})
         
+        # Only in-memory work here: the 200 goes out before any DB access
+        rejected = 0
+        for message, value in iter_messages(data):
+            if webhook_dedup.seen(message.get('id')):
+                continue  # Redelivery of a message this worker already took
+            # Processed after the response, one message at a time per sender
+            if not message_scheduler.submit(message.get('from'), process_message, message, value):
+                webhook_dedup.forget(message.get('id'))  # Not handled: let the redelivery through
+                rejected += 1
+                logger.warning("Deferred message %s: too many queued for %s", message.get('id'), message.get('from'))
+
+        if rejected:
+            # Meta redelivers on a non-2xx; the messages taken on now are dropped as duplicates then
+            return JSONResponse(status_code=503, content={"status": "RETRY", "deferred": rejected})
         return {"status": "EVENT_RECEIVED"}
     
     except Exception as e:
-        print(f"Error processing webhook: {e}")
+        logger.exception("Error processing webhook: %s", e)
         return {"status": "error", "message": str(e)}
 
 async def process_message(message, value):
     """Process a single WhatsApp message"""
     try:
         sender = message.get('from')
+        if not await run_in_threadpool(webhook_dedup.claim, message.get('id'), sender):
+            return  # Another worker (or an earlier delivery) already handled it
+        webhook_dedup.processed()
         message_type = message.get('type')
         
         # Extract sender name
@@ -101,21 +122,105 @@ async def process_message(message, value):
                 await handle_incoming_message(sender, sender_name, '', button_id)
                 
     except Exception as e:
-        print(f"Error in process_message: {e}")
-        traceback.print_exc()
+        logger.exception("Error in process_message: %s", e)
+
+# ==================== SESSIONS ====================
+
+# Strong references to fire-and-forget send tasks
+_pending_sends = set()
+
+def _send_in_background(user_id: str, message: str):
+    task = asyncio.get_running_loop().create_task(async_whatsapp_client.send_message(user_id, message))
+    _pending_sends.add(task)
+    task.add_done_callback(_pending_sends.discard)
+
+def notify_session_expired(user_id: str, session: dict, reason: str):
+    """Tell a patient their half-finished conversation was dropped.
+    Called from a worker thread (session store calls run in the threadpool),
+    or from the event loop; never waits for the send."""
+    if session.get("step", "idle") == "idle":
+        return  # Nothing in progress - don't message people who simply went away
+    message = "⌛ Your session expired. Type *menu* to restart."
+    try:
+        asyncio.get_running_loop()
+        on_loop = True
+    except RuntimeError:
+        on_loop = False
+    try:
+        if on_loop:
+            _send_in_background(user_id, message)
+        else:
+            from_thread.run_sync(_send_in_background, user_id, message)
+    except Exception as e:
+        logger.error("Error sending session expiry notice: %s", e)
+
+appointment_manager.session_store.on_evict = notify_session_expired
+
+async def run_session_sweeper():
+    """Background loop: expire idle sessions (and old webhook message ids and slot holds) every SESSION_SWEEP_INTERVAL_SECONDS"""
+    while True:
+        await asyncio.sleep(config.SESSION_SWEEP_INTERVAL_SECONDS)
+        try:
+            expired = await run_in_threadpool(appointment_manager.session_store.purge_expired)
+            if expired:
+                logger.info("Expired %d idle WhatsApp sessions", len(expired))
+            await run_in_threadpool(webhook_dedup.prune)
+            slot_holds.purge_expired()
+        except Exception as e:
+            logger.exception("Error sweeping sessions: %s", e)
+
+@router.get("/api/whatsapp/metrics")
+def get_whatsapp_metrics():
+    """Operational metrics for the WhatsApp bot"""
+    return {
+        "success": True,
+        "data": {
+            "sessions": appointment_manager.session_store.metrics(),
+            "outbox": outbox_stats(),
+            "webhooks": webhook_dedup.metrics(),
+            "scheduler": message_scheduler.metrics(),
+            "slotHolds": slot_holds.metrics(),
+            "logging": log_metrics()
+        }
+    }
+
+@router.get("/api/whatsapp/outbox/dead-letters")
+def get_dead_letters(limit: int = 100, db: Session = Depends(get_db)):
+    """Outbound messages that exhausted their retries or were rejected by Meta"""
+    from database import OutboundMessage
+    messages = db.query(OutboundMessage).filter(
+        OutboundMessage.status == DEAD
+    ).order_by(OutboundMessage.id.desc()).limit(limit).all()
+    return {"success": True, "data": [format_message(m) for m in messages]}
+
+@router.post("/api/whatsapp/outbox/{message_id}/retry")
+def retry_dead_letter(message_id: int, db: Session = Depends(get_db)):
+    """Put a dead-lettered message back in the queue"""
+    from database import OutboundMessage
+    message = db.query(OutboundMessage).filter(OutboundMessage.id == message_id).first()
+    if not message:
+        raise HTTPException(status_code=404, detail="Message not found")
+    if message.status != DEAD:
+        raise HTTPException(status_code=400, detail=f"Message is {message.status}, not dead")
+    message.status = PENDING
+    message.attempts = 0
+    message.next_attempt_at = datetime.utcnow()
+    db.commit()
+    outbox_dispatcher.wake()
+    return {"success": True, "data": format_message(message)}
 
 # ==================== CORE LOGIC ====================
 
 async def handle_incoming_message(user_id: str, user_name: str, message_body: str, interaction_id: str):
     """Main message handler"""
-    session = appointment_manager.get_session(user_id)
+    session = await run_in_threadpool(appointment_manager.get_session, user_id)
     step = session.get("step")
     
-    print(f"Handling message from {user_name} ({user_id}). Step: {step}, Interaction: {interaction_id}")
+    logger.debug("Handling message from %s (%s). Step: %s, Interaction: %s", user_name, user_id, step, interaction_id)
     
     # If text message 'hi' or 'menu', reset
     if message_body and message_body.lower() in ['hi', 'hello', 'menu', 'start', 'restart']:
-        send_main_menu(user_id, user_name)
+        await send_main_menu(user_id, user_name)
         return
 
     # 1. Handle selection/button click
@@ -129,68 +234,68 @@ async def handle_incoming_message(user_id: str, user_name: str, message_body: st
         
         # Simple Keyword Matching
         if text in ['book', 'appointment', 'schedule', 'booking', 'new']:
-            send_specialization_list(user_id)
-            appointment_manager.update_session(user_id, {"step": "awaiting_specialization", "tempData": {"userName": user_name}})
+            await send_specialization_list(user_id)
+            await run_in_threadpool(appointment_manager.update_session, user_id, {"step": "awaiting_specialization", "tempData": {"userName": user_name}})
         
         elif text in ['cancel', 'cancellation', 'delete', 'remove']:
-            show_user_appointments(user_id)
+            await show_user_appointments(user_id)
             
         elif text in ['reschedule', 'change', 'move', 'update']:
-            appointment_manager.update_session(user_id, {"step": "rescheduling"})
-            show_user_appointments(user_id)
+            await run_in_threadpool(appointment_manager.update_session, user_id, {"step": "rescheduling"})
+            await show_user_appointments(user_id)
             
         else:
             # Default: Show Main Menu for any other text
-            send_main_menu(user_id, user_name)
+            await send_main_menu(user_id, user_name)
 
-def send_main_menu(user_id: str, user_name: str):
+async def send_main_menu(user_id: str, user_name: str):
     """Send the main menu buttons"""
     buttons = [
         {"id": "book_appointment", "title": "Book Appointment"},
         {"id": "reschedule_appointment", "title": "Reschedule"},
         {"id": "cancel_appointment", "title": "Cancel Appointment"}
     ]
-    whatsapp_client.send_interactive_buttons(
+    await async_whatsapp_client.send_interactive_buttons(
         user_id,
         f"Hello {user_name}! Welcome to City Hospital. How can we help you today?",
         buttons
     )
-    appointment_manager.update_session(user_id, {"step": "idle"})
+    await run_in_threadpool(appointment_manager.update_session, user_id, {"step": "idle"})
 
 async def process_interaction(user_id: str, user_name: str, interaction_id: str, session: dict):
     """Process button or list selection"""
     
     # Root buttons
     if interaction_id == "book_appointment":
-        send_specialization_list(user_id)
-        appointment_manager.update_session(user_id, {"step": "awaiting_specialization", "tempData": {"userName": user_name}})
+        await send_specialization_list(user_id)
+        await run_in_threadpool(appointment_manager.update_session, user_id, {"step": "awaiting_specialization", "tempData": {"userName": user_name}})
         return
     
     if interaction_id == "cancel_appointment":
-        show_user_appointments(user_id)
+        await show_user_appointments(user_id)
         return
 
     if interaction_id == "reschedule_appointment":
         # For now, rescheduling is just cancelling + booking. 
         # So we show appointments to cancel first.
         # Ideally, we should set a flag in session to know it's a reschedule flow.
-        appointment_manager.update_session(user_id, {"step": "rescheduling"})
-        show_user_appointments(user_id) 
+        await run_in_threadpool(appointment_manager.update_session, user_id, {"step": "rescheduling"})
+        await show_user_appointments(user_id) 
         return
     
     # Specialization selection
     if interaction_id.startswith("spec_"):
         spec = interaction_id.replace("spec_", "")
-        appointment_manager.update_session(user_id, {"step": "awaiting_doctor", "tempData": {**session["tempData"], "specialization": spec}})
-        send_doctor_list(user_id, spec)
+        await run_in_threadpool(appointment_manager.update_session, user_id, {"step": "awaiting_doctor", "tempData": {**session["tempData"], "specialization": spec}})
+        await send_doctor_list(user_id, spec)
         return
     
     # Doctor selection
     if interaction_id.startswith("dr_") or interaction_id.isdigit():
         doctor_id = interaction_id.replace("dr_", "")
-        doctor = doctor_service.get_doctor_by_id(doctor_id)
+        doctor = await run_in_threadpool(doctor_service.get_doctor_by_id, doctor_id)
         if doctor:
-            appointment_manager.update_session(user_id, {
+            await run_in_threadpool(appointment_manager.update_session, user_id, {
                 "step": "awaiting_date",
                 "tempData": {
                     **session.get("tempData", {}),
@@ -199,27 +304,37 @@ async def process_interaction(user_id: str, user_name: str, interaction_id: str,
                     "specialization": doctor['specialization']
                 }
             })
-            send_date_list(user_id, doctor['id'])
+            await send_date_list(user_id, doctor['id'])
         return
     
     # Date selection
     if interaction_id.startswith("date_"):
         date = interaction_id.replace("date_", "")
         current_data = session.get("tempData", {})
-        appointment_manager.update_session(user_id, {
+        await run_in_threadpool(appointment_manager.update_session, user_id, {
             "step": "awaiting_time",
             "tempData": {**current_data, "date": date}
         })
-        send_time_slots(user_id, current_data.get("doctor_id"), date)
+        await send_time_slots(user_id, current_data.get("doctor_id"), date)
         return
     
     # Time selection -> CONFIRM BOOKING
     if interaction_id.startswith("time_"):
         time = interaction_id.replace("time_", "")
         temp_data = session.get("tempData", {})
+
+        # Someone else is looking at this slot: treat it as taken
+        doctor_id, date = temp_data.get("doctor_id"), temp_data.get("date")
+        if doctor_id and date:
+            if slot_holds.is_held_by_other(user_id, doctor_id, date, time):
+                next_slot = await run_in_threadpool(appointment_manager.next_free_slot, doctor_id, date, time, user_id)
+                await send_slot_taken(user_id, SlotUnavailableError(doctor_id, date, time, next_slot))
+                return
+            slot_holds.hold(user_id, doctor_id, date, [time])
         
         # Validate Booking Constraints
-        is_valid, error_msg, error_code = appointment_manager.validate_booking_constraints(
+        is_valid, error_msg, error_code = await run_in_threadpool(
+            appointment_manager.validate_booking_constraints,
             user_id, 
             temp_data.get("doctor_id"), 
             temp_data.get("date"), 
@@ -227,6 +342,7 @@ async def process_interaction(user_id: str, user_name: str, interaction_id: str,
         )
         
         if not is_valid:
+            slot_holds.release(user_id)
             if error_code == "SAME_DOCTOR_DAY":
                 buttons = [
                     {"id": "reschedule_appointment", "title": "Reschedule Existing"},
@@ -237,7 +353,7 @@ async def process_interaction(user_id: str, user_name: str, interaction_id: str,
                     {"id": "reschedule_appointment", "title": "Reschedule Old"},
                     {"id": "cancel_appointment", "title": "Cancel Old"}
                 ]
-                whatsapp_client.send_interactive_buttons(user_id, f"⚠️ {error_msg}", buttons)
+                await async_whatsapp_client.send_interactive_buttons(user_id, f"⚠️ {error_msg}", buttons)
                 
             elif error_code == "TIME_CLASH":
                 # Go back to time selection for this doctor/date
@@ -246,43 +362,37 @@ async def process_interaction(user_id: str, user_name: str, interaction_id: str,
                 # Let's just send a message and then re-send the time slots?
                 # Or better, a button "Choose Different Time" that triggers... logic?
                 # Actually, simpler: Just send message and re-send time slots.
-                whatsapp_client.send_message(user_id, f"⚠️ {error_msg}")
-                send_time_slots(user_id, temp_data.get("doctor_id"), temp_data.get("date"))
+                await async_whatsapp_client.send_message(user_id, f"⚠️ {error_msg}")
+                await send_time_slots(user_id, temp_data.get("doctor_id"), temp_data.get("date"))
                 
             else:
-                 whatsapp_client.send_message(user_id, f"⚠️ {error_msg}")
-                 send_main_menu(user_id, user_name)
+                 await async_whatsapp_client.send_message(user_id, f"⚠️ {error_msg}")
+                 await send_main_menu(user_id, user_name)
                  
             return
 
         # Create appointment in DB
         try:
-            appointment = appointment_manager.create_appointment(
+            # The Google Calendar event is created by the background sync worker
+            doctor = await run_in_threadpool(doctor_service.get_doctor_by_id, temp_data.get("doctor_id"))
+            # Off the loop: a taken slot looks up the next free one, which can ask Google
+            appointment = await run_in_threadpool(
+                appointment_manager.create_appointment,
                 user_id,
                 temp_data.get("userName", user_name),
                 temp_data.get("doctor_id"),
                 temp_data.get("doctor_name"),
                 temp_data.get("specialization"),
                 temp_data.get("date"),
-                time
+                time,
+                sync_calendar=bool(doctor and doctor.get('google_calendar_id'))
             )
+            calendar_sync_worker.wake()
             
-            # Google Calendar
-            doctor = doctor_service.get_doctor_by_id(temp_data.get("doctor_id"))
-            if doctor and google_calendar_service.service and doctor.get('google_calendar_id'):
-                google_calendar_service.create_appointment(
-                    doctor.get('google_calendar_id'), 
-                    temp_data.get("userName", user_name), 
-                    user_id,
-                    temp_data.get("doctor_name"), 
-                    temp_data.get("date"), 
-                    time,
-                    doctor.get('slot_duration_minutes', 30)
-                )
-            
-            appointment_manager.clear_session(user_id)
+            await run_in_threadpool(appointment_manager.clear_session, user_id)
+            slot_holds.release(user_id)
             
-            whatsapp_client.send_message(
+            await async_whatsapp_client.send_message(
                 user_id, 
                 f"✅ *Appointment Confirmed!*\n\n"
                 f"ID: {appointment['id']}\n"
@@ -291,9 +401,12 @@ async def process_interaction(user_id: str, user_name: str, interaction_id: str,
                 f"Time: {time}\n\n"
                 f"See you then!"
             )
+        except SlotUnavailableError as e:
+            # Someone else got the slot between the list and the tap; offer the nearest free one
+            await send_slot_taken(user_id, e)
         except Exception as e:
-            whatsapp_client.send_message(user_id, f"Error booking appointment: {str(e)}")
-            print(traceback.format_exc())
+            await async_whatsapp_client.send_message(user_id, f"Error booking appointment: {str(e)}")
+            logger.exception("Error booking appointment for %s", user_id)
         return
 
     # Cancellation
@@ -302,87 +415,172 @@ async def process_interaction(user_id: str, user_name: str, interaction_id: str,
         parts = interaction_id.split("_")
         if len(parts) >= 2:
             apt_id = parts[1]
-            cancel_appointment(user_id, apt_id)
+            await cancel_appointment(user_id, apt_id)
             
             # Check if we are in rescheduling mode
             current_step = session.get("step")
             if current_step == "rescheduling":
-                whatsapp_client.send_message(user_id, "🗓️ Now, let's book your new appointment time.")
-                send_specialization_list(user_id)
-                appointment_manager.update_session(user_id, {"step": "awaiting_specialization", "tempData": {"userName": user_name}})
+                await async_whatsapp_client.send_message(user_id, "🗓️ Now, let's book your new appointment time.")
+                await send_specialization_list(user_id)
+                await run_in_threadpool(appointment_manager.update_session, user_id, {"step": "awaiting_specialization", "tempData": {"userName": user_name}})
         return
 
 # ==================== UI HELPERS ====================
 
-def send_specialization_list(user_id: str):
-    specs = doctor_service.get_all_specializations()
+async def send_slot_taken(user_id: str, error: SlotUnavailableError):
+    """Tell the patient their slot was just taken and offer (and hold) the next free one"""
+    label = datetime.strptime(error.time, "%H:%M").strftime("%I:%M %p")
+    if not error.next_slot:
+        buttons = [{"id": f"dr_{error.doctor_id}", "title": "Choose Different Date"}]
+        await async_whatsapp_client.send_interactive_buttons(
+            user_id, f"⚠️ Sorry, {label} on {error.date} was just taken by another patient.", buttons
+        )
+        return
+
+    next_date, next_time = error.next_slot
+    slot_holds.hold(user_id, error.doctor_id, next_date, [next_time])
+    next_label = datetime.strptime(next_time, "%H:%M").strftime("%I:%M %p")
+    if next_date == error.date:
+        # The session is still on this date, so a time_ button books it directly
+        buttons = [
+            {"id": f"time_{next_time}", "title": f"Book {next_label}"},
+            {"id": f"date_{error.date}", "title": "Other Times"}
+        ]
+        body = f"⚠️ Sorry, {label} on {error.date} was just taken by another patient. The next free slot is {next_label}."
+    else:
+        buttons = [
+            {"id": f"date_{next_date}", "title": f"See {datetime.strptime(next_date, '%Y-%m-%d').strftime('%d %b')}"},
+            {"id": f"dr_{error.doctor_id}", "title": "Choose Different Date"}
+        ]
+        body = (f"⚠️ Sorry, {label} on {error.date} was just taken by another patient, and that day is now full. "
+                f"The next free slot is {next_label} on {next_date}.")
+    await async_whatsapp_client.send_interactive_buttons(user_id, body, buttons)
+
+async def send_specialization_list(user_id: str):
+    specs = await run_in_threadpool(doctor_service.get_all_specializations)
     rows = [{"id": f"spec_{s}", "title": s} for s in specs]
     sections = [{"title": "Our Departments", "rows": rows}]
-    whatsapp_client.send_interactive_list(user_id, "Choose Department", "Select the type of care you need:", "View Departments", sections)
+    await async_whatsapp_client.send_interactive_list(user_id, "Choose Department", "Select the type of care you need:", "View Departments", sections)
+
+def weekly_free_slot_counts(doctors: list, days: int = 7) -> dict:
+    """
+    Free slots per doctor over the next `days` days: one DB query for all
+    bookings and one busy-time lookup for every calendar and day (the local
+    calendar mirror, or batched freebusy for calendars not mirrored yet),
+    merged with each doctor's slot grid.
+    """
+    from datetime import timedelta
+    today = clinic_clock.now()
+    dates = [(today + timedelta(days=i)) for i in range(days)]
 
-def send_doctor_list(user_id: str, specialization: str):
-    doctors = doctor_service.get_doctors_by_specialization(specialization)
-    rows = [{"id": f"{d['id']}", "title": d['name'], "description": f"{d['specialization']} | {d['working_hours']['start']}-{d['working_hours']['end']}"} for d in doctors]
+    pairs = [
+        (d['id'], day.strftime("%Y-%m-%d"))
+        for d in doctors for day in dates
+        if day.strftime("%A") in d['working_days']
+    ]
+    occupied = appointment_manager.get_occupied_times_bulk(pairs)
+    busy = calendar_mirror.busy_intervals(
+        [d.get('google_calendar_id') for d in doctors], [day.strftime("%Y-%m-%d") for day in dates]
+    )
+
+    by_id = {d['id']: d for d in doctors}
+    counts = {d['id']: 0 for d in doctors}
+    for doctor_id, date in pairs:
+        doctor = by_id[doctor_id]
+        calendar_busy = busy.get((doctor.get('google_calendar_id'), date), [])
+        counts[doctor_id] += len(doctor_service.get_available_slots(
+            doctor_id, date, occupied[(doctor_id, date)], doctor=doctor, calendar_busy=calendar_busy
+        ))
+    return counts
+
+async def send_doctor_list(user_id: str, specialization: str):
+    doctors = await run_in_threadpool(doctor_service.get_doctors_by_specialization, specialization)
+    free = await run_in_threadpool(weekly_free_slot_counts, doctors)
+    rows = []
+    for d in doctors:
+        availability = f"{free[d['id']]} slots this week" if free[d['id']] else "Fully booked this week"
+        description = f"{d['specialization']} | {d['working_hours']['start']}-{d['working_hours']['end']} | {availability}"
+        rows.append({"id": f"{d['id']}", "title": d['name'], "description": description[:72]})  # WhatsApp row limit
     sections = [{"title": specialization, "rows": rows}]
-    whatsapp_client.send_interactive_list(user_id, "Select Doctor", f"Available {specialization}s:", "View Doctors", sections)
+    await async_whatsapp_client.send_interactive_list(user_id, "Select Doctor", f"Available {specialization}s:", "View Doctors", sections)
 
-def send_date_list(user_id: str, doctor_id: str):
-    doctor = doctor_service.get_doctor_by_id(doctor_id)
+async def send_date_list(user_id: str, doctor_id: str):
+    doctor = await run_in_threadpool(doctor_service.get_doctor_by_id, doctor_id)
     if not doctor:
-        whatsapp_client.send_message(user_id, "Error: Doctor not found")
+        await async_whatsapp_client.send_message(user_id, "Error: Doctor not found")
         return
 
     working_days = doctor['working_days'] # List of strings e.g. ["Monday", "Tuesday"]
-    import pytz
-    from whatsapp_bot.config import config
-    tz = pytz.timezone(config.TIMEZONE)
-    today = datetime.now(tz)
+    today = clinic_clock.now()
     dates = []
     days_checked = 0
     from datetime import timedelta
     
-    # Logic to find next 7 working days
-    while len(dates) < 7 and days_checked < 14:
+    # Candidate working days over the next two weeks
+    candidates = []
+    while days_checked < 14:
         check_date = today + timedelta(days=days_checked)
         day_name = check_date.strftime("%A")
         
         # Check partial match if needed or exact
         if day_name in working_days:
-            date_str = check_date.strftime("%Y-%m-%d")
-            dates.append({"id": f"date_{date_str}", "title": check_date.strftime("%A, %d %B"), "description": "Available to book"})
+            candidates.append(check_date)
         days_checked += 1
+
+    # One query for every candidate day's bookings, then list the first 7 days with free slots
+    candidate_dates = [d.strftime("%Y-%m-%d") for d in candidates]
+    occupied = await run_in_threadpool(appointment_manager.get_occupied_times_bulk, [(doctor_id, d) for d in candidate_dates])
+    busy = {}
+    if doctor.get('google_calendar_id'):
+        busy = await async_calendar_service.busy_intervals([doctor['google_calendar_id']], candidate_dates)
+    for check_date in candidates:
+        if len(dates) >= 7:
+            break
+        date_str = check_date.strftime("%Y-%m-%d")
+        free = len(doctor_service.get_available_slots(
+            doctor_id, date_str, occupied[(doctor_id, date_str)], doctor=doctor,
+            calendar_busy=busy.get((doctor.get('google_calendar_id'), date_str), []), user_id=user_id
+        ))
+        if free:
+            label = "1 slot available" if free == 1 else f"{free} slots available"
+            dates.append({"id": f"date_{date_str}", "title": check_date.strftime("%A, %d %B"), "description": label})
     
     if not dates:
-        whatsapp_client.send_message(user_id, "No available dates found.")
+        await async_whatsapp_client.send_message(user_id, "No available dates found.")
         return
 
     sections = [{"title": "Dates", "rows": dates}]
-    whatsapp_client.send_interactive_list(user_id, "Select Date", f"Booking for {doctor['name']}:", "View Dates", sections)
+    await async_whatsapp_client.send_interactive_list(user_id, "Select Date", f"Booking for {doctor['name']}:", "View Dates", sections)
+
+async def send_time_slots(user_id: str, doctor_id: str, date: str):
+    # Fetch the doctor once for both the slot grid and the calendar check
+    doctor = await run_in_threadpool(doctor_service.get_doctor_by_id, doctor_id)
 
-def send_time_slots(user_id: str, doctor_id: str, date: str):
     # Get booked slots
-    booked = appointment_manager.get_slots_for_doctor(doctor_id, date)
-    
-    # Get available
-    slots = doctor_service.get_available_slots(doctor_id, date, booked)
+    booked = await run_in_threadpool(appointment_manager.get_occupied_times, doctor_id, date)
     
-    # Google Calendar Check (if enabled)
-    doctor = doctor_service.get_doctor_by_id(doctor_id)
-    if doctor and google_calendar_service.service and doctor.get('google_calendar_id'):
-        slots = [
-            s for s in slots 
-            if google_calendar_service.is_slot_available(doctor['google_calendar_id'], date, s, doctor['slot_duration_minutes'])
-        ]
+    # Google Calendar busy time (local mirror, or freebusy) off the event loop
+    calendar_id = doctor.get('google_calendar_id') if doctor else None
+    calendar_busy = []
+    if calendar_id:
+        busy = await async_calendar_service.busy_intervals([calendar_id], [date])
+        calendar_busy = busy.get((calendar_id, date), [])
+
+    # Get available (without slots held for other patients)
+    slots = doctor_service.get_available_slots(
+        doctor_id, date, booked, doctor=doctor, calendar_busy=calendar_busy, user_id=user_id
+    )
         
     if not slots:
         # UX Improvement: Offer to choose a different date
         buttons = [
             {"id": f"dr_{doctor_id}", "title": "Choose Different Date"} # Re-triggers date selection for this doctor
         ]
-        whatsapp_client.send_interactive_buttons(user_id, f"⚠️ No available slots on {date}.", buttons)
+        await async_whatsapp_client.send_interactive_buttons(user_id, f"⚠️ No available slots on {date}.", buttons)
         return
     
-    # Format for WhatsApp (Max 10 per list message)
-    rows = [{"id": f"time_{s}", "title": datetime.strptime(s, "%H:%M").strftime("%I:%M %p")} for s in slots[:10]]
+    # Format for WhatsApp (Max 10 per list message), and hold the listed slots for this patient
+    shown = slot_holds.hold(user_id, doctor_id, date, slots[:10])
+    rows = [{"id": f"time_{s}", "title": datetime.strptime(s, "%H:%M").strftime("%I:%M %p")} for s in shown]
     sections = [{"title": "Available Times", "rows": rows}]
-    whatsapp_client.send_interactive_list(user_id, "Select Time", f"Available on {date}:", "View Times", sections)
+    await async_whatsapp_client.send_interactive_list(user_id, "Select Time", f"Available on {date}:", "View Times", sections)
@@ -3,8 +3,12 @@ from .config import config
 from typing import Dict, Any
 from datetime import datetime
 from dateutil import parser as date_parser
+from structured_logging import get_logger
 import re
 
+# Every inbound message is parsed here; never log the patient's text
+logger = get_logger("api.whatsapp_bot.ai_service", sampled=True)
+
 groq_client = None
 if config.GROQ_API_KEY:
     groq_client = Groq(api_key=config.GROQ_API_KEY)
@@ -38,7 +42,8 @@ class AIService:
             return parsed_date.strftime("%Y-%m-%d")
             
         except Exception as e:
-            print(f"Error parsing date '{text}': {e}")
+            # Not the error: it quotes the patient's text
+            logger.debug("Could not parse a date: %s", type(e).__name__)
             return None
     
     @staticmethod
@@ -65,14 +70,14 @@ class AIService:
             return parsed_time.strftime("%H:%M")
             
         except Exception as e:
-            print(f"Error parsing time '{text}': {e}")
+            logger.debug("Could not parse a time: %s", type(e).__name__)
             return None
     
     @staticmethod
     def parse_intent(message: str) -> Dict[str, Any]:
         """Parse user intent using Groq AI with enhanced date/time parsing"""
         if not groq_client:
-            print("Groq SDK not initialized. Returning default intent.")
+            logger.warning("Groq SDK not initialized. Returning default intent.")
             return {"intent": "other", "entities": {}, "response": "I can help you book an appointment. Just say 'Book appointment'."}
         
         try:
@@ -146,7 +151,7 @@ Return ONLY valid JSON in the following format:
             return result
             
         except Exception as error:
-            print(f"Error parsing intent: {error}")
+            logger.error("Error parsing intent: %s", type(error).__name__)
             return {"intent": "other", "entities": {}, "response": "I can help you book an appointment. Just say 'Book appointment'."}
 
 # Import timedelta for date calculations
@@ -1,6 +1,9 @@
 from datetime import datetime, timedelta
 from typing import List, Dict, Optional
 from database import SessionLocal, Doctor, Appointment
+from structured_logging import get_logger
+
+logger = get_logger("api.whatsapp_bot.doctor_service")
 
 class DoctorService:
     def __init__(self):
@@ -132,7 +135,7 @@ class DoctorService:
                 
             return slots
         except Exception as e:
-            print(f"Error getting slots: {e}")
+            logger.exception("Error getting slots")
             return []
 
 doctor_service = DoctorService()
@@ -4,6 +4,9 @@ from datetime import datetime, timedelta
 import os
 from typing import List, Dict, Optional
 import pytz
+from structured_logging import get_logger
+
+logger = get_logger("api.whatsapp_bot.google_calendar_service")
 
 # Path to your service account credentials JSON file
 CREDENTIALS_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'credentials.json')
@@ -28,7 +31,7 @@ class GoogleCalendarService:
                     creds_dict,
                     scopes=['https://www.googleapis.com/auth/calendar']
                 )
-                print("Google Calendar credentials loaded from environment variable")
+                logger.info("Google Calendar credentials loaded from environment variable")
             
             # Fall back to credentials.json file (for local development)
             elif os.path.exists(CREDENTIALS_FILE):
@@ -36,23 +39,22 @@ class GoogleCalendarService:
                     CREDENTIALS_FILE,
                     scopes=['https://www.googleapis.com/auth/calendar']
                 )
-                print("Google Calendar credentials loaded from file")
+                logger.info("Google Calendar credentials loaded from file")
             
             else:
-                print(f"WARNING: {CREDENTIALS_FILE} not found. Google Calendar integration disabled.")
-                print("To enable Google Calendar:")
-                print("1. Go to https://console.cloud.google.com/")
-                print("2. Create a project and enable Google Calendar API")
-                print("3. Create a service account")
-                print("4. Download credentials.json and place it in the project root")
-                print("   OR set GOOGLE_CREDENTIALS environment variable with the JSON content")
+                logger.warning(
+                    "%s not found and GOOGLE_CREDENTIALS is not set. Google Calendar integration disabled. "
+                    "To enable it, create a service account with the Google Calendar API enabled "
+                    "(https://console.cloud.google.com/) and put its credentials.json in the project root "
+                    "or its JSON content in GOOGLE_CREDENTIALS.", CREDENTIALS_FILE
+                )
                 return
             
             self.service = build('calendar', 'v3', credentials=credentials)
-            print("Google Calendar service initialized successfully")
+            logger.info("Google Calendar service initialized")
             
         except Exception as e:
-            print(f"Error initializing Google Calendar service: {e}")
+            logger.exception("Error initializing Google Calendar service")
             self.service = None
     
     def get_busy_times(self, calendar_id: str, date: str) -> List[Dict]:
@@ -94,7 +96,7 @@ class GoogleCalendarService:
             return busy_times
             
         except Exception as e:
-            print(f"Error getting busy times: {e}")
+            logger.error("Error getting busy times: %r", e)
             return []
     
     def is_slot_available(self, calendar_id: str, date: str, time: str, duration_minutes: int = 30) -> bool:
@@ -126,14 +128,14 @@ class GoogleCalendarService:
             return True
             
         except Exception as e:
-            print(f"Error checking slot availability: {e}")
+            logger.error("Error checking slot availability: %r", e)
             return True  # Default to available if error
     
     def create_appointment(self, calendar_id: str, patient_name: str, patient_phone: str,
                           doctor_name: str, date: str, time: str, duration_minutes: int = 30) -> Optional[str]:
         """Create a calendar event for an appointment"""
         if not self.service:
-            print("Calendar service not available. Appointment not added to calendar.")
+            logger.warning("Calendar service not available. Appointment not added to calendar.")
             return None
         
         try:
@@ -168,17 +170,17 @@ class GoogleCalendarService:
             
             created_event = self.service.events().insert(calendarId=calendar_id, body=event).execute()
             
-            print(f"Calendar event created: {created_event.get('htmlLink')}")
+            logger.debug("Calendar event created", extra={"event_id": created_event.get('id')})
             return created_event.get('id')
             
         except Exception as e:
-            print(f"Error creating calendar event: {e}")
+            logger.error("Error creating calendar event: %r", e)
             return None
     
     def create_event(self, calendar_id: str, summary: str, description: str, start_time: str, end_time: str, date: str) -> dict:
         """Create a calendar event"""
         if not self.service:
-            print("Google Calendar service not initialized")
+            logger.warning("Google Calendar service not initialized")
             return None
         
         try:
@@ -203,17 +205,17 @@ class GoogleCalendarService:
             }
             
             created_event = self.service.events().insert(calendarId=calendar_id, body=event).execute()
-            print(f"Event created: {created_event.get('htmlLink')}")
+            logger.debug("Event created", extra={"event_id": created_event.get('id')})
             return created_event
             
         except Exception as e:
-            print(f"Error creating event: {e}")
+            logger.error("Error creating event: %r", e)
             return None
     
     def delete_event(self, calendar_id: str, date: str, start_time: str) -> bool:
         """Delete a calendar event by finding it with date and time"""
         if not self.service:
-            print("Google Calendar service not initialized")
+            logger.warning("Google Calendar service not initialized")
             return False
         
         try:
@@ -237,14 +239,14 @@ class GoogleCalendarService:
                 if start_time in event_start:
                     # Delete the event
                     self.service.events().delete(calendarId=calendar_id, eventId=event['id']).execute()
-                    print(f"Event deleted: {event.get('summary')} at {start_time}")
+                    logger.debug("Event deleted", extra={"event_id": event['id']})
                     return True
             
-            print(f"No event found at {date} {start_time}")
+            logger.warning("No event found at %s %s", date, start_time)
             return False
             
         except Exception as e:
-            print(f"Error deleting event: {e}")
+            logger.error("Error deleting event: %r", e)
             return False
 
 # Singleton instance
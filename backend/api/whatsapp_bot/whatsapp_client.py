@@ -1,7 +1,11 @@
 import requests
 from .config import config
+from structured_logging import get_logger
 import json
 
+# Never log message bodies or recipients (patient data)
+logger = get_logger("api.whatsapp_bot.whatsapp_client", sampled=True)
+
 class WhatsAppClient:
     def __init__(self):
         self.api_url = f"{config.WHATSAPP_API_URL}/{config.WHATSAPP_PHONE_NUMBER_ID}/messages"
@@ -19,16 +23,15 @@ class WhatsAppClient:
             "text": {"body": message}
         }
         
-        print(f"Sending WhatsApp message to {to}: {message}")
+        logger.debug("Sending WhatsApp message")
         
         try:
             response = requests.post(self.api_url, headers=self.headers, json=payload)
             response.raise_for_status()
             return response.json()
         except requests.exceptions.RequestException as error:
-            print(f"Error sending WhatsApp message: {error}")
-            if hasattr(error, 'response') and error.response is not None:
-                print(f"Response: {error.response.text}")
+            response = error.response.text if getattr(error, 'response', None) is not None else None
+            logger.error("Error sending WhatsApp message: %s", error, extra={"response": response})
             raise
     
     def send_interactive_list(self, to: str, header: str, body: str, button_text: str, sections: list):
@@ -60,16 +63,15 @@ class WhatsAppClient:
             }
         }
         
-        print(f"Sending interactive list to {to}")
+        logger.debug("Sending interactive list")
         
         try:
             response = requests.post(self.api_url, headers=self.headers, json=payload)
             response.raise_for_status()
             return response.json()
         except requests.exceptions.RequestException as error:
-            print(f"Error sending interactive list: {error}")
-            if hasattr(error, 'response') and error.response is not None:
-                print(f"Response: {error.response.text}")
+            response = error.response.text if getattr(error, 'response', None) is not None else None
+            logger.error("Error sending interactive list: %s", error, extra={"response": response})
             raise
     
     def send_interactive_buttons(self, to: str, body: str, buttons: list):
@@ -99,16 +101,15 @@ class WhatsAppClient:
             }
         }
         
-        print(f"Sending interactive buttons to {to}")
+        logger.debug("Sending interactive buttons")
         
         try:
             response = requests.post(self.api_url, headers=self.headers, json=payload)
             response.raise_for_status()
             return response.json()
         except requests.exceptions.RequestException as error:
-            print(f"Error sending interactive buttons: {error}")
-            if hasattr(error, 'response') and error.response is not None:
-                print(f"Response: {error.response.text}")
+            response = error.response.text if getattr(error, 'response', None) is not None else None
+            logger.error("Error sending interactive buttons: %s", error, extra={"response": response})
             raise
 
 whatsapp_client = WhatsAppClient()
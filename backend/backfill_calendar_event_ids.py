@@ -0,0 +1,90 @@
+"""
+Backfill `calendar_event_id` for appointments booked before event ids were stored.
+
+For every active, upcoming appointment without an event id it lists the
+doctor's calendar for that day (once per calendar and day) and takes the
+event that starts at the appointment's time, preferring one whose summary
+names the patient. Appointments with no matching event are reported and left
+alone. Safe to re-run.
+
+    python backfill_calendar_event_ids.py              # from today on
+    python backfill_calendar_event_ids.py --since 2025-01-01 --dry-run
+"""
+
+import argparse
+import sys
+from collections import defaultdict
+from datetime import date, datetime
+
+from database import SessionLocal, Appointment, Doctor, init_db
+from whatsapp_bot.calendar_sync import SYNCED, resolve_calendar_id
+from whatsapp_bot.google_calendar_service import google_calendar_service
+
+
+def backfill(since: date, dry_run: bool = False) -> dict:
+    db = SessionLocal()
+    stats = {"matched": 0, "unmatched": 0, "calendar_days": 0}
+    try:
+        appointments = db.query(Appointment).filter(
+            Appointment.calendar_event_id.is_(None),
+            Appointment.status != "Cancelled",
+            Appointment.date >= since,
+            # Pending/failed syncs never created an event
+            (Appointment.calendar_sync_status.is_(None)) | (Appointment.calendar_sync_status == SYNCED)
+        ).all()
+
+        calendars = dict(db.query(Doctor.id, Doctor.google_calendar_id).all())
+        by_calendar_day = defaultdict(list)
+        for appointment in appointments:
+            calendar_id = resolve_calendar_id(calendars.get(appointment.doctor_id))
+            by_calendar_day[(calendar_id, str(appointment.date))].append(appointment)
+
+        claimed = set(eid for (eid,) in db.query(Appointment.calendar_event_id).filter(
+            Appointment.calendar_event_id.isnot(None)
+        ))
+        for (calendar_id, day), group in sorted(by_calendar_day.items()):
+            stats["calendar_days"] += 1
+            events_by_time = defaultdict(list)
+            for event in google_calendar_service.list_day_events(calendar_id, day):
+                start = google_calendar_service.local_start_time(event)
+                if start and event['id'] not in claimed:
+                    events_by_time[start].append(event)
+
+            for appointment in group:
+                candidates = events_by_time.get(appointment.time, [])
+                named = [e for e in candidates if appointment.patient_name in (e.get('summary') or '')]
+                match = (named or candidates or [None])[0]
+                if match is None:
+                    stats["unmatched"] += 1
+                    print(f"  no event for appointment {appointment.id} ({calendar_id} {day} {appointment.time})")
+                    continue
+                candidates.remove(match)
+                claimed.add(match['id'])
+                appointment.calendar_event_id = match['id']
+                appointment.calendar_sync_status = SYNCED
+                stats["matched"] += 1
+
+        if dry_run:
+            db.rollback()
+        else:
+            db.commit()
+        return stats
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Backfill Google Calendar event ids on appointments")
+    parser.add_argument("--since", type=lambda s: datetime.strptime(s, "%Y-%m-%d").date(), default=date.today(),
+                        help="first appointment date to backfill (default: today)")
+    parser.add_argument("--dry-run", action="store_true", help="report matches without saving them")
+    args = parser.parse_args()
+
+    if not google_calendar_service.service:
+        print("Google Calendar is not configured; nothing to backfill.")
+        sys.exit(1)
+
+    init_db()
+    result = backfill(args.since, args.dry_run)
+    print(f"{'Would match' if args.dry_run else 'Matched'} {result['matched']} appointments, "
+          f"{result['unmatched']} without an event ({result['calendar_days']} calendar days listed)")
@@ -0,0 +1,81 @@
+"""
+Benchmark: GET /api/appointments page latency, OFFSET vs keyset cursor.
+
+Seeds a year of appointments, then walks the list page by page both ways
+and reports the latency of selected pages. With OFFSET each page reads
+and discards every earlier row; with the cursor page N costs what page 1
+does.
+
+Usage (from backend/):
+    python -m benchmarks.appointments_pagination --per-day 300 --page-size 100
+"""
+
+import argparse
+import contextlib
+import io
+from datetime import date, timedelta
+
+from benchmarks.common import reset_schema, timed, median
+from database import SessionLocal, Appointment
+from api.appointments import get_appointments
+
+PAGES = (1, 10, 50, 200, 1000)
+
+
+def seed(days: int, per_day: int):
+    reset_schema()
+    start = date.today() - timedelta(days=days)
+    with SessionLocal() as db:
+        for d in range(days):
+            day = start + timedelta(days=d)
+            db.bulk_insert_mappings(Appointment, [
+                {"patient_name": f"Patient {i}", "doctor_name": f"Dr. {i % 40}", "doctor_id": 1 + i % 40,
+                 "date": day, "time": f"{8 + (i // 40) % 12:02d}:{(i % 4) * 15:02d}", "status": "Completed"}
+                for i in range(per_day)
+            ])
+        db.commit()
+
+
+def call(db, **params) -> dict:
+    with contextlib.redirect_stdout(io.StringIO()):
+        return get_appointments(db=db, **{"skip": 0, "status": None, "date": None, "doctorId": None,
+                                          "cursor": None, "total": None, **params})
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--per-day", type=int, default=300)
+    parser.add_argument("--page-size", type=int, default=100)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    seed(args.days, args.per_day)
+    rows = args.days * args.per_day
+    pages = [p for p in PAGES if (p - 1) * args.page_size < rows]
+    print(f"{rows} appointments, {args.page_size} per page")
+    print(f"{'page':>6} {'offset ms':>10} {'cursor ms':>10}")
+
+    with SessionLocal() as db:
+        # Walk with cursors once, remembering the cursor that starts each page
+        cursors, cursor = {1: None}, None
+        for page in range(2, max(pages) + 1):
+            cursor = call(db, limit=args.page_size, cursor=cursor)["nextCursor"]
+            cursors[page] = cursor
+
+        for page in pages:
+            offset_ms, cursor_ms = [], []
+            for _ in range(args.repeat):
+                with timed(offset_ms):
+                    by_offset = call(db, limit=args.page_size, skip=(page - 1) * args.page_size)
+                with timed(cursor_ms):
+                    by_cursor = call(db, limit=args.page_size, cursor=cursors[page])
+            assert [a["id"] for a in by_offset["data"]] == [a["id"] for a in by_cursor["data"]], page
+            print(f"{page:>6} {median(offset_ms):>10.2f} {median(cursor_ms):>10.2f}")
+
+        exact = call(db, limit=1, total="exact")
+        print(f"total=exact: {exact['total']}")
+
+
+if __name__ == "__main__":
+    main()
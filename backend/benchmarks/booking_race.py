@@ -0,0 +1,158 @@
+"""
+Stress test: concurrent WhatsApp taps must never double-book.
+
+Puts every simulated patient at the "pick a time" step, then fires several
+time-slot taps per patient at once (double taps, and taps on different
+times) through the same per-sender scheduler the webhook uses. Checks
+that every patient ends up with exactly one active appointment and that
+no patient ever had two messages in flight at the same time.
+
+--unserialized runs the same taps as independent tasks, the way the webhook
+used to schedule them, to show what the scheduler prevents.
+
+--contended makes every patient go for the same slot instead. Each slot
+must end up with exactly one booking and every other patient must be
+offered another slot. In one process the slot holds turn the losers away
+before they reach the database; --no-holds makes holds expire at once (as
+if every patient were on a different worker), so the
+uq_appointments_doctor_slot index has to do it.
+
+Usage (from backend/):
+    python -m benchmarks.booking_race --users 200 --taps 4
+    python -m benchmarks.booking_race --users 200 --taps 4 --unserialized
+    python -m benchmarks.booking_race --users 200 --taps 2 --contended
+    python -m benchmarks.booking_race --users 200 --taps 2 --contended --no-holds
+"""
+
+import argparse
+import asyncio
+import contextlib
+import io
+import os
+import sys
+import time
+import uuid
+from collections import Counter
+from datetime import date, timedelta
+
+from benchmarks.fake_graph_api import FakeGraphAPI
+
+TIMES = ["09:00", "09:30", "10:00", "10:30", "11:00", "11:30"]
+
+
+def tap(user_id: str, selection: str) -> tuple:
+    message = {
+        "from": user_id, "id": f"wamid.race.{uuid.uuid4().hex}", "type": "interactive",
+        "interactive": {"type": "list_reply", "list_reply": {"id": selection}}
+    }
+    value = {"contacts": [{"profile": {"name": f"Patient {user_id}"}}], "messages": [message]}
+    return message, value
+
+
+def next_weekday() -> str:
+    day = date.today() + timedelta(days=1)
+    while day.weekday() >= 5:
+        day += timedelta(days=1)
+    return day.isoformat()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--taps", type=int, default=4, help="concurrent time-slot taps per patient")
+    parser.add_argument("--latency", type=float, default=0.01, help="simulated Graph API latency (s)")
+    parser.add_argument("--unserialized", action="store_true", help="run taps as independent tasks (old behaviour)")
+    parser.add_argument("--contended", action="store_true", help="every patient taps the same slot")
+    parser.add_argument("--no-holds", action="store_true", help="slot holds expire immediately")
+    args = parser.parse_args()
+
+    with FakeGraphAPI(latency=args.latency) as graph:
+        os.environ["WHATSAPP_API_URL"] = graph.base_url
+        os.environ.setdefault("WHATSAPP_PHONE_NUMBER_ID", "1234567890")
+        if args.no_holds:
+            os.environ["SLOT_HOLD_TTL_SECONDS"] = "1e-9"
+        from benchmarks.common import reset_schema
+        from database import SessionLocal, Doctor, Appointment
+        import api.whatsapp as webhook
+        from whatsapp_bot.appointment_manager import appointment_manager
+        from whatsapp_bot.keyed_scheduler import KeyedScheduler
+
+        # A doctor per patient, unless they are all meant to fight over one
+        reset_schema()
+        doctors = 1 if args.contended else args.users
+        with SessionLocal() as db:
+            db.bulk_insert_mappings(Doctor, [
+                {"id": d, "name": f"Dr. Race {d}", "specialization": "General Medicine", "email": f"race{d}@bench.local",
+                 "working_days": "Monday,Tuesday,Wednesday,Thursday,Friday,Saturday,Sunday"}
+                for d in range(1, doctors + 1)
+            ])
+            db.commit()
+
+        day = next_weekday()
+        users = [f"9180000{i:05d}" for i in range(args.users)]
+        for i, user_id in enumerate(users):
+            doctor_id = 1 + i % doctors
+            appointment_manager.update_session(user_id, {"step": "awaiting_time", "tempData": {
+                "userName": f"Patient {user_id}", "doctor_id": str(doctor_id), "doctor_name": f"Dr. Race {doctor_id}",
+                "specialization": "General Medicine", "date": day
+            }})
+
+        # Track how many messages per patient are being handled at once
+        in_flight, overlaps = Counter(), Counter()
+        handle = webhook.handle_incoming_message
+
+        async def tracked(user_id, *rest):
+            in_flight[user_id] += 1
+            if in_flight[user_id] > 1:
+                overlaps[user_id] += 1
+            try:
+                await handle(user_id, *rest)
+            finally:
+                in_flight[user_id] -= 1
+        webhook.handle_incoming_message = tracked
+
+        if args.contended:
+            taps = [tap(user_id, f"time_{TIMES[0]}") for i in range(args.taps) for user_id in users]
+        else:
+            taps = [tap(user_id, f"time_{TIMES[i % len(TIMES)]}") for i in range(args.taps) for user_id in users]
+
+        async def run():
+            if args.unserialized:
+                await asyncio.gather(*(webhook.process_message(m, v) for m, v in taps))
+            else:
+                scheduler = KeyedScheduler(max_depth=args.taps)
+                for message, value in taps:
+                    assert scheduler.submit(message["from"], webhook.process_message, message, value)
+                await scheduler.join()
+
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            asyncio.run(run())
+        elapsed = time.perf_counter() - start
+
+        with SessionLocal() as db:
+            rows = db.query(Appointment.patient_phone, Appointment.doctor_id, Appointment.time).filter(
+                Appointment.status != "Cancelled"
+            ).all()
+        booked = Counter(phone for phone, _, _ in rows)
+        per_slot = Counter((doctor_id, slot) for _, doctor_id, slot in rows)
+        doubles = {u: n for u, n in booked.items() if n > 1}
+        shared_slots = {t: n for t, n in per_slot.items() if n > 1}
+        offered = sum(1 for p in graph.received if "just taken by another patient" in str(p))
+        # Contended: one winner per slot, everyone else is offered the next slot instead
+        missing = [] if args.contended else [u for u in users if not booked[u]]
+
+        mode = "unserialized" if args.unserialized else "per-user scheduler"
+        print(f"{mode}: {args.users} patients x {args.taps} taps in {elapsed:.2f}s, "
+              f"{len(graph.received)} replies sent")
+        print(f"  appointments {sum(booked.values())}  double-booked patients {len(doubles)}  "
+              f"double-booked slots {len(shared_slots)}  without a booking {len(missing)}  "
+              f"patients with overlapping handlers {len(overlaps)}  offered another slot {offered}")
+        if doubles or shared_slots or missing or overlaps:
+            print("FAIL")
+            sys.exit(1)
+        print("OK")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""
+Benchmark: event-loop responsiveness with Google Calendar calls in flight.
+
+Starts N slot checks against the fake Calendar API (each on its own
+calendar, so none is served from the freebusy cache) while a heartbeat
+coroutine ticks every 10 ms and records how late each tick fires. With the
+calls made inline the loop is blocked for every round-trip; through
+AsyncGoogleCalendarService they run on the executor and the loop keeps
+ticking.
+
+Usage (from backend/):
+    python -m benchmarks.calendar_event_loop --calls 50 --latency 0.2
+    python -m benchmarks.calendar_event_loop --calls 50 --latency 0.2 --timeout 0.1
+"""
+
+import argparse
+import asyncio
+import os
+import time
+
+from benchmarks import common  # noqa: F401  (throwaway DATABASE_URL)
+from benchmarks.fake_calendar_api import FakeCalendarAPI
+
+TICK = 0.01
+SLOTS = [f"{h:02d}:{m:02d}" for h in range(9, 17) for m in (0, 30)]
+
+
+async def heartbeat(lags: list, stop: asyncio.Event):
+    """Record how late each TICK-second sleep wakes up (ms)"""
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(TICK)
+        lags.append((time.perf_counter() - start - TICK) * 1000)
+
+
+async def run(label: str, calls: int, check):
+    lags, stop = [], asyncio.Event()
+    beat = asyncio.create_task(heartbeat(lags, stop))
+    await asyncio.sleep(TICK * 2)
+
+    start = time.perf_counter()
+    results = await asyncio.gather(*(check(f"bench-{label}-{i}@clinic") for i in range(calls)), return_exceptions=True)
+    elapsed = time.perf_counter() - start
+
+    stop.set()
+    await beat
+    failed = sum(1 for r in results if isinstance(r, Exception))
+    lags.sort()
+    p99 = lags[int(len(lags) * 0.99)] if lags else 0.0
+    print(f"{label:<10} {elapsed:>7.2f}s  {len(lags):>5} ticks  "
+          f"max lag {max(lags, default=0):>8.1f} ms  p99 {p99:>8.1f} ms  {failed:>3} failed")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, default=50)
+    parser.add_argument("--latency", type=float, default=0.2, help="simulated Calendar API latency (s)")
+    parser.add_argument("--timeout", type=float, default=None, help="per-call timeout (s) for the async run")
+    parser.add_argument("--concurrency", type=int, default=None, help="executor threads (default CALENDAR_MAX_CONCURRENCY)")
+    args = parser.parse_args()
+
+    with FakeCalendarAPI(latency=args.latency) as api:
+        # The calendar service reads the URL at import
+        os.environ["GOOGLE_CALENDAR_API_URL"] = api.api_url
+        from whatsapp_bot.google_calendar_service import google_calendar_service
+        from whatsapp_bot.async_calendar import AsyncGoogleCalendarService
+
+        facade = AsyncGoogleCalendarService(google_calendar_service, max_workers=args.concurrency, timeout=args.timeout)
+        date = "2025-01-15"
+
+        async def inline(calendar_id):
+            return google_calendar_service.available_slots(calendar_id, date, SLOTS)
+
+        async def executor(calendar_id):
+            return await facade.run(google_calendar_service.available_slots, calendar_id, date, SLOTS)
+
+        print(f"{args.calls} calendar calls, {args.latency * 1000:.0f} ms simulated latency, "
+              f"{facade._executor._max_workers} executor threads")
+        asyncio.run(run("inline", args.calls, inline))
+        asyncio.run(run("executor", args.calls, executor))
+        facade.shutdown()
+
+
+if __name__ == "__main__":
+    main()
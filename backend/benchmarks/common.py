@@ -0,0 +1,58 @@
+"""
+Shared helpers for the benchmark scripts.
+
+Every benchmark runs against a throwaway SQLite file unless DATABASE_URL is
+already set, so they never touch hospital.db. Import this module BEFORE
+`database` so the URL is in place when the engine is created.
+"""
+
+import os
+import tempfile
+import time
+from contextlib import contextmanager
+
+if not os.getenv("DATABASE_URL"):
+    _fd, _path = tempfile.mkstemp(prefix="bench_", suffix=".db")
+    os.close(_fd)
+    os.environ["DATABASE_URL"] = f"sqlite:///{_path}"
+
+from sqlalchemy import event
+
+from database import Base, engine
+
+
+def reset_schema():
+    """Drop and recreate every table on the benchmark database"""
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+
+
+class QueryCounter:
+    """Count SQL statements sent to the engine while active"""
+
+    def __init__(self):
+        self.count = 0
+
+    def _on_execute(self, *args, **kwargs):
+        self.count += 1
+
+    def __enter__(self):
+        self.count = 0
+        event.listen(engine, "before_cursor_execute", self._on_execute)
+        return self
+
+    def __exit__(self, *exc):
+        event.remove(engine, "before_cursor_execute", self._on_execute)
+
+
+@contextmanager
+def timed(results: list):
+    """Append the elapsed wall time (ms) of the block to `results`"""
+    start = time.perf_counter()
+    yield
+    results.append((time.perf_counter() - start) * 1000)
+
+
+def median(values):
+    ordered = sorted(values)
+    return ordered[len(ordered) // 2] if ordered else 0.0
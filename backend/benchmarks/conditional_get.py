@@ -0,0 +1,113 @@
+"""
+Benchmark: 200 dashboards polling /api/dashboard/summary and /api/queue,
+with and without If-None-Match.
+
+Seeds today's appointments, then runs --rounds polling rounds in which
+every dashboard fetches both endpoints; one appointment changes status
+every --write-every rounds. Run once as plain GETs and once revalidating
+with the last ETag (as a browser does), and report CPU time and SQL
+statements per request, and how many requests were answered 304.
+CPU is measured in-process (the test client included), so the saving on
+the server alone is larger than the ratio shown.
+
+Usage (from backend/):
+    python -m benchmarks.conditional_get
+    python -m benchmarks.conditional_get --dashboards 200 --rounds 20 --write-every 5
+"""
+
+import argparse
+import contextlib
+import io
+import random
+import time
+
+from benchmarks.common import QueryCounter, reset_schema
+from database import SessionLocal, Doctor, Patient, Appointment, engine
+import daily_stats
+from clinic_clock import clinic_clock
+
+STATUSES = ["Booked", "Checked In", "In Consultation", "Completed"]
+ENDPOINTS = ("/api/dashboard/summary", "/api/queue")
+
+
+def seed(doctors: int, per_doctor: int):
+    reset_schema()
+    with SessionLocal() as db:
+        db.bulk_insert_mappings(Doctor, [
+            {"id": i, "name": f"Dr. Bench {i}", "specialization": "General Medicine",
+             "email": f"doctor{i}@bench.local", "status": "Available"}
+            for i in range(1, doctors + 1)
+        ])
+        db.bulk_insert_mappings(Patient, [
+            {"name": f"Patient {i}", "email": f"patient{i}@bench.local"}
+            for i in range(1, 1001)
+        ])
+        db.bulk_insert_mappings(Appointment, [
+            {"patient_name": "Bench Patient", "doctor_name": f"Dr. Bench {d}", "doctor_id": d,
+             "date": clinic_clock.today(), "time": f"{9 + slot // 2:02d}:{(slot % 2) * 30:02d}",
+             "status": random.choice(STATUSES)}
+            for d in range(1, doctors + 1) for slot in range(per_doctor)
+        ])
+        db.commit()
+    with engine.begin() as conn:
+        daily_stats.rebuild(conn)  # Bulk inserts skip the counter hooks
+
+
+def run(client, dashboards: int, rounds: int, write_every: int, revalidate: bool, apt_ids: list):
+    """Returns (requests, 304s, CPU seconds, SQL statements)"""
+    etags = [dict() for _ in range(dashboards)]
+    requests = not_modified = 0
+    writes = iter(apt_ids)
+    with contextlib.redirect_stdout(io.StringIO()), QueryCounter() as queries:
+        cpu = time.process_time()
+        for round_no in range(rounds):
+            if round_no and round_no % write_every == 0:
+                client.put(f"/api/appointments/{next(writes)}/status", json={"status": "Cancelled"}).raise_for_status()
+            for seen in etags:
+                for path in ENDPOINTS:
+                    headers = {"If-None-Match": seen[path]} if revalidate and path in seen else {}
+                    response = client.get(path, headers=headers)
+                    requests += 1
+                    if response.status_code == 304:
+                        not_modified += 1
+                    else:
+                        response.raise_for_status()
+                        seen[path] = response.headers["etag"]
+        cpu = time.process_time() - cpu
+    return requests, not_modified, cpu, queries.count
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dashboards", type=int, default=200)
+    parser.add_argument("--rounds", type=int, default=20)
+    parser.add_argument("--write-every", type=int, default=5, help="rounds between status changes")
+    parser.add_argument("--doctors", type=int, default=250)
+    parser.add_argument("--per-doctor", type=int, default=8)
+    args = parser.parse_args()
+
+    from fastapi.testclient import TestClient
+    from medical_backend.asgi import app
+
+    seed(args.doctors, args.per_doctor)
+    with SessionLocal() as db:
+        active = [apt_id for (apt_id,) in db.query(Appointment.id).filter(Appointment.status != "Cancelled")]
+    print(f"{args.dashboards} dashboards x {args.rounds} rounds, {args.doctors * args.per_doctor} appointments today, "
+          f"a status change every {args.write_every} rounds")
+
+    with TestClient(app) as client:
+        results = {}
+        for revalidate in (False, True):
+            random.shuffle(active)
+            requests, not_modified, cpu, queries = run(client, args.dashboards, args.rounds, args.write_every,
+                                                       revalidate, active)
+            results[revalidate] = cpu
+            label = "If-None-Match" if revalidate else "plain GET"
+            print(f"{label:<14} {requests} requests, {not_modified} x 304; CPU {cpu:.1f}s "
+                  f"({cpu / requests * 1000:.2f} ms/request), {queries} SQL statements "
+                  f"({queries / requests:.2f}/request)")
+    print(f"CPU saved: {(1 - results[True] / results[False]) * 100:.0f}%")
+
+
+if __name__ == "__main__":
+    main()
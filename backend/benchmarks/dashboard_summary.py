@@ -0,0 +1,122 @@
+"""
+Benchmark: GET /api/dashboard/summary at hospital scale.
+
+Seeds 250, 2,500 and 25,000 doctors (with --per-doctor appointments each
+for today) and reports SQL statements and latency per summary call, cold
+and answered from the per-day cache until the next write. Also
+times reading today's counts on their own: from the daily_stats counters
+(what the endpoint does) and with the grouped pass over the appointments
+it replaced - the one grows with today's rows, the other with doctors.
+
+Usage (from backend/):
+    python -m benchmarks.dashboard_summary
+    python -m benchmarks.dashboard_summary --sizes 250 --per-doctor 200
+    python -m benchmarks.dashboard_summary --legacy   # also time the old per-doctor loop
+"""
+
+import argparse
+import random
+
+from sqlalchemy import func
+
+from benchmarks.common import QueryCounter, reset_schema, timed, median
+from database import SessionLocal, Doctor, Patient, Appointment, DailyStat, engine
+from api.dashboard import get_dashboard_stats, summary_cache
+from clinic_clock import clinic_clock
+import daily_stats
+
+STATUSES = ["Booked", "Checked In", "In Consultation", "Completed", "Cancelled", "No Show"]
+
+
+def seed(doctor_count: int, appointments_per_doctor: int = 8):
+    reset_schema()
+    today = clinic_clock.today()
+    with SessionLocal() as db:
+        db.bulk_insert_mappings(Doctor, [
+            {"id": i, "name": f"Dr. Bench {i}", "specialization": "General Medicine",
+             "email": f"doctor{i}@bench.local", "status": "Available"}
+            for i in range(1, doctor_count + 1)
+        ])
+        db.bulk_insert_mappings(Patient, [
+            {"name": f"Patient {i}", "email": f"patient{i}@bench.local"}
+            for i in range(1, 1001)
+        ])
+        db.bulk_insert_mappings(Appointment, [
+            {"patient_name": "Bench Patient", "doctor_name": f"Dr. Bench {d}", "doctor_id": d,
+             "date": today, "time": f"{9 + slot // 2:02d}:{(slot % 2) * 30:02d}",
+             "status": random.choice(STATUSES)}
+            for d in range(1, doctor_count + 1)
+            for slot in range(appointments_per_doctor)
+        ])
+        db.commit()
+    # Bulk inserts skip the flush hooks that keep the counters current
+    with engine.begin() as conn:
+        daily_stats.rebuild(conn)
+
+
+def grouped_counts(db):
+    """Today's counts the way the summary read them before daily_stats"""
+    return db.query(Appointment.doctor_id, Appointment.status, func.count(Appointment.id)).filter(
+        Appointment.date == clinic_clock.today()
+    ).group_by(Appointment.doctor_id, Appointment.status).all()
+
+
+def counter_counts(db):
+    return db.query(DailyStat.doctor_id, DailyStat.status, DailyStat.count).filter(
+        DailyStat.date == clinic_clock.today(), DailyStat.count > 0
+    ).all()
+
+
+def legacy_dashboard_stats(db):
+    """The previous implementation: 11 counts plus 3 per doctor"""
+    today = clinic_clock.today()
+    db.query(Doctor).count()
+    db.query(Patient).count()
+    db.query(Appointment).filter(Appointment.date == today).count()
+    db.query(Doctor).filter(Doctor.status == "Available").count()
+    for status in ["Completed", "Cancelled", "Rescheduled", "Booked", "Checked In", "In Consultation", "No Show"]:
+        db.query(Appointment).filter(Appointment.date == today, Appointment.status == status).count()
+    for doc in db.query(Doctor).all():
+        db.query(Appointment).filter(Appointment.doctor_id == doc.id, Appointment.date == today).count()
+        db.query(Appointment).filter(Appointment.doctor_id == doc.id, Appointment.date == today, Appointment.status == "Completed").count()
+        db.query(Appointment).filter(Appointment.doctor_id == doc.id, Appointment.date == today, Appointment.status.in_(["Booked", "Checked In"])).count()
+
+
+def measure(fn, runs: int):
+    latencies = []
+    with SessionLocal() as db:
+        fn(db)  # warm up
+        with QueryCounter() as counter:
+            fn(db)
+        for _ in range(runs):
+            with timed(latencies):
+                fn(db)
+    return counter.count, median(latencies)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[250, 2500, 25000])
+    parser.add_argument("--per-doctor", type=int, default=8, help="appointments per doctor today")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--legacy", action="store_true", help="also measure the pre-aggregation implementation")
+    args = parser.parse_args()
+
+    print(f"{'doctors':>8} {'impl':>8} {'queries':>8} {'median ms':>10}")
+    for size in args.sizes:
+        seed(size, args.per_doctor)
+        # Cold: the reseed restarts the table versions the cache is keyed on, so clear it per call
+        queries, latency = measure(lambda db: (summary_cache.clear(), get_dashboard_stats(db)), args.runs)
+        print(f"{size:>8} {'summary':>8} {queries:>8} {latency:>10.1f}")
+        queries, latency = measure(get_dashboard_stats, args.runs)
+        print(f"{size:>8} {'cached':>8} {queries:>8} {latency:>10.1f}")
+        for name, fn in (("counters", counter_counts), ("grouped", grouped_counts)):
+            queries, latency = measure(fn, args.runs)
+            print(f"{size:>8} {name:>8} {queries:>8} {latency:>10.1f}")
+        if args.legacy:
+            queries, latency = measure(legacy_dashboard_stats, 1)
+            print(f"{size:>8} {'legacy':>8} {queries:>8} {latency:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
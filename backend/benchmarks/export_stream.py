@@ -0,0 +1,108 @@
+"""
+Benchmark: streaming appointment export over a large table.
+
+Seeds N appointments (default 1,000,000), then drives the export generator
+behind GET /api/appointments/export to completion in each format, and
+reports throughput, output size and peak Python heap. The heap is measured
+with tracemalloc over a shorter run (--memory-rows), once at a tenth of
+that and once at the full count, to show it stays flat as the row count
+grows. --compare also measures building the whole result as a list, the
+way the list endpoint does for a page.
+
+Usage (from backend/):
+    python -m benchmarks.export_stream
+    python -m benchmarks.export_stream --rows 200000 --compare
+"""
+
+import argparse
+import gc
+import time
+import tracemalloc
+from datetime import date, timedelta
+
+from sqlalchemy import insert
+
+from benchmarks.common import reset_schema
+from database import SessionLocal, Appointment, engine
+from api.appointments import filter_appointments, format_appointment, LIST_ORDER, EXPORT_COLUMNS
+from api.export import export_rows, NDJSON, CSV
+
+SEED_CHUNK = 50000
+DOCTORS = 200
+STATUSES = ["Booked", "Completed", "Cancelled", "No Show"]
+
+
+def slot_label(n: int) -> str:
+    minutes = 8 * 60 + n * 15
+    return f"{minutes // 60:02d}:{minutes % 60:02d}"
+
+
+def seed(rows: int):
+    reset_schema()
+    start = date.today() - timedelta(days=365)
+    with engine.begin() as conn:
+        for offset in range(0, rows, SEED_CHUNK):
+            conn.execute(insert(Appointment), [
+                {"patient_name": f"Patient {i}", "patient_phone": f"98{i:08d}", "doctor_name": f"Dr. {i % DOCTORS}",
+                 "doctor_id": 1 + i % DOCTORS, "department": "General Medicine",
+                 # Distinct (doctor, date, time) for every row - see uq_appointments_doctor_slot
+                 "date": start + timedelta(days=(i // DOCTORS) % 365), "time": slot_label(i // DOCTORS // 365),
+                 "type": "Scheduled", "status": STATUSES[i % 4], "reason": "Checkup", "booking_source": "WhatsApp"}
+                for i in range(offset, min(offset + SEED_CHUNK, rows))
+            ])
+
+
+def build_query(limit=None):
+    def build(db):
+        query = filter_appointments(db.query(Appointment)).order_by(*LIST_ORDER)
+        return query.limit(limit) if limit else query
+    return build
+
+
+def drain(chunks) -> int:
+    return sum(len(chunk) for chunk in chunks)
+
+
+def peak_heap(fn) -> float:
+    """Peak traced Python heap (MB) while running fn"""
+    gc.collect()
+    tracemalloc.start()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak / 1e6
+
+
+def as_list(limit):
+    with SessionLocal() as db:
+        return [format_appointment(a) for a in build_query(limit)(db).all()]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--memory-rows", type=int, default=200_000)
+    parser.add_argument("--compare", action="store_true", help="also measure building a full list")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    seed(args.rows)
+    print(f"seeded {args.rows} appointments in {time.perf_counter() - start:.1f}s")
+
+    for fmt in (NDJSON, CSV):
+        start = time.perf_counter()
+        size = drain(export_rows(build_query(), format_appointment, fmt, EXPORT_COLUMNS))
+        elapsed = time.perf_counter() - start
+        print(f"{fmt:<7} {args.rows} rows in {elapsed:.1f}s ({args.rows / elapsed:,.0f} rows/s), {size / 1e6:.0f} MB")
+
+    small = max(1, args.memory_rows // 10)
+    for rows in (small, args.memory_rows):
+        streamed = peak_heap(lambda: drain(export_rows(build_query(rows), format_appointment, NDJSON, EXPORT_COLUMNS)))
+        line = f"peak heap for {rows:>8} rows: streamed {streamed:6.1f} MB"
+        if args.compare:
+            line += f"   full list {peak_heap(lambda: as_list(rows)):7.1f} MB"
+        print(line)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,240 @@
+"""
+Local stand-in for the Google Calendar v3 API.
+
+Implements the calls the calendar mirror and slot checks use - events
+list (with syncToken/pageToken), insert, delete, watch, channels.stop and
+freeBusy - and POSTs push notifications to watch channel addresses like
+Google does. Point the app at it with GOOGLE_CALENDAR_API_URL:
+
+    with FakeCalendarAPI() as calendar:
+        os.environ["GOOGLE_CALENDAR_API_URL"] = calendar.api_url
+        calendar.add_event("dr-1@clinic", "2025-01-15T10:00:00+05:30", "2025-01-15T11:00:00+05:30")
+        ...
+
+Or standalone:  python -m benchmarks.fake_calendar_api --port 8901
+"""
+
+import argparse
+import asyncio
+import itertools
+import socket
+import threading
+import time
+import uuid
+from datetime import datetime
+
+import httpx
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, Response
+
+
+class FakeCalendarAPI:
+    def __init__(self, port: int = 0, page_size: int = 250, latency: float = 0.0):
+        self.port = port or _free_port()
+        self.page_size = page_size
+        self.latency = latency
+        self.calendars = {}  # calendar_id -> {event_id: event}
+        self.channels = {}  # channel_id -> {"calendar_id", "address", "token", "resourceId"}
+        self.notifications = []  # (channel_id, resource_state) sent
+        self.requests = []  # (method, path) served
+        self._seq = itertools.count(1)
+        self._current_seq = 0
+        self._valid_tokens = set()
+        self._lock = threading.RLock()
+        self._server = None
+        self._thread = None
+        self.app = self._build_app()
+
+    @property
+    def api_url(self) -> str:
+        """Value for GOOGLE_CALENDAR_API_URL"""
+        return f"http://127.0.0.1:{self.port}/calendar/v3/"
+
+    # ==================== TEST HELPERS ====================
+
+    def add_event(self, calendar_id: str, start: str, end: str, **fields) -> dict:
+        """Create an event as if someone edited the calendar directly (notifies watchers)"""
+        event = {"summary": "Busy", **fields, "start": {"dateTime": start}, "end": {"dateTime": end}}
+        return self._insert(calendar_id, event)
+
+    def cancel_event(self, calendar_id: str, event_id: str):
+        self._delete(calendar_id, event_id)
+
+    def expire_sync_tokens(self):
+        """Make every issued syncToken invalid (next incremental list returns 410)"""
+        with self._lock:
+            self._valid_tokens.clear()
+
+    # ==================== STATE ====================
+
+    def _touch(self, event: dict):
+        event["_seq"] = next(self._seq)
+        self._current_seq = event["_seq"]
+        event["updated"] = datetime.utcnow().isoformat() + "Z"
+
+    def _insert(self, calendar_id: str, body: dict) -> dict:
+        with self._lock:
+            event = dict(body, id=body.get("id") or uuid.uuid4().hex, status="confirmed")
+            self._touch(event)
+            self.calendars.setdefault(calendar_id, {})[event["id"]] = event
+        self._notify(calendar_id, "exists")
+        return _public(event)
+
+    def _delete(self, calendar_id: str, event_id: str) -> bool:
+        with self._lock:
+            event = self.calendars.get(calendar_id, {}).get(event_id)
+            if not event or event["status"] == "cancelled":
+                return False
+            event["status"] = "cancelled"
+            self._touch(event)
+        self._notify(calendar_id, "exists")
+        return True
+
+    def _notify(self, calendar_id: str, state: str, only_channel: str = None):
+        for channel_id, channel in list(self.channels.items()):
+            if channel["calendar_id"] != calendar_id or (only_channel and channel_id != only_channel):
+                continue
+            self.notifications.append((channel_id, state))
+            headers = {
+                "X-Goog-Channel-ID": channel_id,
+                "X-Goog-Channel-Token": channel["token"],
+                "X-Goog-Resource-ID": channel["resourceId"],
+                "X-Goog-Resource-State": state,
+                "X-Goog-Message-Number": str(len(self.notifications)),
+            }
+            threading.Thread(target=_post_quietly, args=(channel["address"], headers), daemon=True).start()
+
+    # ==================== API ====================
+
+    def _build_app(self) -> FastAPI:
+        app = FastAPI()
+
+        @app.middleware("http")
+        async def record(request: Request, call_next):
+            self.requests.append((request.method, request.url.path))
+            if self.latency:
+                await asyncio.sleep(self.latency)
+            return await call_next(request)
+
+        @app.get("/calendar/v3/calendars/{calendar_id}/events")
+        def list_events(calendar_id: str, syncToken: str = None, pageToken: str = None, maxResults: int = None):
+            with self._lock:
+                events = list(self.calendars.get(calendar_id, {}).values())
+                if syncToken:
+                    if syncToken not in self._valid_tokens:
+                        return JSONResponse(status_code=410, content={
+                            "error": {"code": 410, "message": "Sync token is no longer valid, a full sync is required."}
+                        })
+                    events = [e for e in events if e["_seq"] > int(syncToken)]
+                else:
+                    events = [e for e in events if e["status"] != "cancelled"]
+                events.sort(key=lambda e: e["_seq"])
+                snapshot = str(self._current_seq)
+
+            size = min(maxResults or self.page_size, self.page_size)
+            offset = int(pageToken or 0)
+            page = events[offset:offset + size]
+            body = {"kind": "calendar#events", "items": [_public(e) for e in page]}
+            if offset + size < len(events):
+                body["nextPageToken"] = str(offset + size)
+            else:
+                with self._lock:
+                    self._valid_tokens.add(snapshot)
+                body["nextSyncToken"] = snapshot
+            return body
+
+        @app.post("/calendar/v3/calendars/{calendar_id}/events")
+        async def insert_event(calendar_id: str, request: Request):
+            return self._insert(calendar_id, await request.json())
+
+        @app.delete("/calendar/v3/calendars/{calendar_id}/events/{event_id}")
+        def delete_event(calendar_id: str, event_id: str):
+            if not self._delete(calendar_id, event_id):
+                return JSONResponse(status_code=410, content={"error": {"code": 410, "message": "Resource has been deleted"}})
+            return Response(status_code=204)
+
+        @app.post("/calendar/v3/calendars/{calendar_id}/events/watch")
+        async def watch(calendar_id: str, request: Request):
+            body = await request.json()
+            ttl = int(body.get("params", {}).get("ttl", 604800))
+            channel = {
+                "calendar_id": calendar_id,
+                "address": body["address"],
+                "token": body.get("token", ""),
+                "resourceId": f"res-{calendar_id}",
+            }
+            self.channels[body["id"]] = channel
+            threading.Timer(0.05, self._notify, args=(calendar_id, "sync", body["id"])).start()
+            return {
+                "kind": "api#channel",
+                "id": body["id"],
+                "resourceId": channel["resourceId"],
+                "expiration": str(int((time.time() + ttl) * 1000)),
+            }
+
+        @app.post("/calendar/v3/channels/stop")
+        async def stop_channel(request: Request):
+            body = await request.json()
+            self.channels.pop(body.get("id"), None)
+            return Response(status_code=204)
+
+        @app.post("/calendar/v3/freeBusy")
+        async def freebusy(request: Request):
+            body = await request.json()
+            time_min = _parse(body["timeMin"])
+            time_max = _parse(body["timeMax"])
+            calendars = {}
+            with self._lock:
+                for item in body.get("items", []):
+                    busy = []
+                    for event in self.calendars.get(item["id"], {}).values():
+                        if event["status"] == "cancelled" or event.get("transparency") == "transparent":
+                            continue
+                        start, end = _parse(event["start"]["dateTime"]), _parse(event["end"]["dateTime"])
+                        if start < time_max and end > time_min:
+                            busy.append({"start": event["start"]["dateTime"], "end": event["end"]["dateTime"]})
+                    calendars[item["id"]] = {"busy": sorted(busy, key=lambda b: b["start"])}
+            return {"kind": "calendar#freeBusy", "calendars": calendars}
+
+        return app
+
+    def __enter__(self):
+        config = uvicorn.Config(self.app, host="127.0.0.1", port=self.port, log_level="warning")
+        self._server = uvicorn.Server(config)
+        self._thread = threading.Thread(target=self._server.run, daemon=True)
+        self._thread.start()
+        while not self._server.started:
+            time.sleep(0.01)
+        return self
+
+    def __exit__(self, *exc):
+        self._server.should_exit = True
+        self._thread.join(timeout=5)
+
+
+def _public(event: dict) -> dict:
+    return {k: v for k, v in event.items() if not k.startswith("_")}
+
+def _parse(value: str) -> datetime:
+    return datetime.fromisoformat(value.replace("Z", "+00:00"))
+
+def _post_quietly(address: str, headers: dict):
+    try:
+        httpx.post(address, headers=headers, timeout=5)
+    except httpx.HTTPError as e:
+        print(f"Fake Calendar API: notification to {address} failed: {e!r}")
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run a fake Google Calendar API")
+    parser.add_argument("--port", type=int, default=8901)
+    args = parser.parse_args()
+    calendar = FakeCalendarAPI(port=args.port)
+    print(f"Fake Calendar API on {calendar.api_url} (set GOOGLE_CALENDAR_API_URL to this)")
+    uvicorn.run(calendar.app, host="127.0.0.1", port=args.port, log_level="warning")
@@ -0,0 +1,99 @@
+"""
+Local stand-in for the WhatsApp Graph API.
+
+Accepts POST /{version}/{phone_number_id}/messages, records the payloads and
+answers like Meta does. Latency and failure rate are configurable so client
+behaviour (pooling, timeouts, retries) can be exercised without a network.
+
+    with FakeGraphAPI(latency=0.05) as graph:
+        client = AsyncWhatsAppClient(api_url=graph.messages_url)
+        ...
+        graph.received  # list of payloads
+
+Or standalone:  python -m benchmarks.fake_graph_api --port 8900
+"""
+
+import argparse
+import asyncio
+import random
+import socket
+import threading
+import time
+import itertools
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+
+
+class FakeGraphAPI:
+    def __init__(self, latency: float = 0.0, failure_rate: float = 0.0, port: int = 0):
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.port = port or _free_port()
+        self.received = []
+        self.connections = set()
+        self._ids = itertools.count(1)
+        self._server = None
+        self._thread = None
+        self.app = self._build_app()
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self.port}/v21.0"
+
+    @property
+    def messages_url(self) -> str:
+        return f"{self.base_url}/1234567890/messages"
+
+    def _build_app(self) -> FastAPI:
+        app = FastAPI()
+
+        @app.post("/{version}/{phone_number_id}/messages")
+        async def messages(request: Request):
+            payload = await request.json()
+            self.connections.add(request.client.port)
+            if self.latency:
+                await asyncio.sleep(self.latency)
+            if self.failure_rate and random.random() < self.failure_rate:
+                return JSONResponse(status_code=429, content={
+                    "error": {"message": "(#130429) Rate limit hit", "code": 130429}
+                })
+            self.received.append(payload)
+            return {
+                "messaging_product": "whatsapp",
+                "contacts": [{"input": payload.get("to"), "wa_id": payload.get("to")}],
+                "messages": [{"id": f"wamid.fake{next(self._ids)}"}]
+            }
+
+        return app
+
+    def __enter__(self):
+        config = uvicorn.Config(self.app, host="127.0.0.1", port=self.port, log_level="warning")
+        self._server = uvicorn.Server(config)
+        self._thread = threading.Thread(target=self._server.run, daemon=True)
+        self._thread.start()
+        while not self._server.started:
+            time.sleep(0.01)
+        return self
+
+    def __exit__(self, *exc):
+        self._server.should_exit = True
+        self._thread.join(timeout=5)
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run a fake WhatsApp Graph API")
+    parser.add_argument("--port", type=int, default=8900)
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--failure-rate", type=float, default=0.0)
+    args = parser.parse_args()
+    graph = FakeGraphAPI(args.latency, args.failure_rate, args.port)
+    print(f"Fake Graph API on {graph.base_url} (set WHATSAPP_API_URL to this)")
+    uvicorn.run(graph.app, host="127.0.0.1", port=args.port, log_level="warning")
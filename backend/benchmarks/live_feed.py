@@ -0,0 +1,169 @@
+"""
+Benchmark: keeping 500 open queue/dashboard tabs current, polling vs the
+/api/live change feed.
+
+Seeds today's appointments, starts the app under uvicorn, then runs
+--clients browser-like clients two ways:
+
+  poll  every client fetches /api/dashboard/summary and /api/queue every
+        --interval seconds (the old setInterval), for --duration seconds
+  live  every client holds an SSE stream open on /api/live while
+        appointment statuses are changed through the API --updates times;
+        reports how long each change took to reach all clients
+
+and reports requests and SQL statements run on the server for each.
+
+Usage (from backend/):
+    python -m benchmarks.live_feed
+    python -m benchmarks.live_feed --clients 500 --interval 15 --duration 30 --updates 50
+"""
+
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import random
+import threading
+import time
+
+from benchmarks.common import QueryCounter, reset_schema, median
+from benchmarks.fake_graph_api import _free_port
+from database import SessionLocal, Doctor, Appointment, engine
+import daily_stats
+from clinic_clock import clinic_clock
+
+STATUSES = ["Booked", "Checked In", "In Consultation", "Completed"]
+
+
+def seed(doctors: int, per_doctor: int):
+    reset_schema()
+    with SessionLocal() as db:
+        db.bulk_insert_mappings(Doctor, [
+            {"id": i, "name": f"Dr. Bench {i}", "specialization": "General Medicine",
+             "email": f"doctor{i}@bench.local", "status": "Available"}
+            for i in range(1, doctors + 1)
+        ])
+        db.bulk_insert_mappings(Appointment, [
+            {"patient_name": "Bench Patient", "doctor_name": f"Dr. Bench {d}", "doctor_id": d,
+             "date": clinic_clock.today(), "time": f"{9 + slot // 2:02d}:{(slot % 2) * 30:02d}",
+             "status": random.choice(STATUSES)}
+            for d in range(1, doctors + 1) for slot in range(per_doctor)
+        ])
+        db.commit()
+    with engine.begin() as conn:
+        daily_stats.rebuild(conn)  # Bulk inserts skip the counter hooks
+
+
+def percentile(values, p):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * p))] if ordered else 0.0
+
+
+async def poll(base_url: str, clients: int, interval: float, duration: float) -> list:
+    import httpx
+    latencies = []
+
+    async def tab(client):
+        await asyncio.sleep(random.uniform(0, interval))  # Tabs opened at different times
+        deadline = time.perf_counter() + duration
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            await asyncio.gather(client.get(f"{base_url}/api/dashboard/summary"), client.get(f"{base_url}/api/queue"))
+            latencies.append((time.perf_counter() - start) * 1000)
+            await asyncio.sleep(interval)
+
+    limits = httpx.Limits(max_connections=None, max_keepalive_connections=None)
+    async with httpx.AsyncClient(timeout=60, limits=limits) as client:
+        await asyncio.gather(*(tab(client) for _ in range(clients)))
+    return latencies
+
+
+async def live(base_url: str, clients: int, updates: int, changes: list):
+    """Returns (ms from each PUT until every client had its event, events each client got)"""
+    import httpx
+    sent = {}
+    received = [dict() for _ in range(clients)]
+    connected = 0
+    all_connected = asyncio.Event()
+
+    async def tab(client, seen):
+        nonlocal connected
+        async with client.stream("GET", f"{base_url}/api/live") as response:
+            connected += 1
+            if connected == clients:
+                all_connected.set()
+            async for line in response.aiter_lines():
+                if line.startswith("data:"):
+                    seen[json.loads(line[5:])["appointment"]["id"]] = time.perf_counter()
+                    if len(seen) == updates:
+                        return
+
+    limits = httpx.Limits(max_connections=None, max_keepalive_connections=None)
+    async with httpx.AsyncClient(timeout=60, limits=limits) as client:
+        tabs = [asyncio.create_task(tab(client, seen)) for seen in received]
+        await all_connected.wait()
+        await asyncio.sleep(0.5)  # Let the last streams subscribe server-side
+
+        async with httpx.AsyncClient(base_url=base_url, timeout=60) as writer:
+            for apt_id, status in changes[:updates]:
+                sent[apt_id] = time.perf_counter()
+                (await writer.put(f"/api/appointments/{apt_id}/status", json={"status": status})).raise_for_status()
+                await asyncio.sleep(0.02)
+        await asyncio.wait_for(asyncio.gather(*tabs), 60)
+
+    fan_out = [(max(seen[apt_id] for seen in received) - start) * 1000 for apt_id, start in sent.items()]
+    return fan_out, [len(seen) for seen in received]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clients", type=int, default=500)
+    parser.add_argument("--doctors", type=int, default=250)
+    parser.add_argument("--per-doctor", type=int, default=8)
+    parser.add_argument("--interval", type=float, default=15.0, help="poll interval (s)")
+    parser.add_argument("--duration", type=float, default=30.0, help="poll phase length (s)")
+    parser.add_argument("--updates", type=int, default=50, help="status changes in the live phase")
+    args = parser.parse_args()
+
+    import uvicorn
+    from medical_backend.asgi import app
+
+    seed(args.doctors, args.per_doctor)
+    with SessionLocal() as db:
+        # A real status change on distinct appointments, so every one is published
+        changes = [(apt_id, "Cancelled" if status != "Cancelled" else "Booked") for apt_id, status in
+                   db.query(Appointment.id, Appointment.status).order_by(Appointment.id).limit(args.updates)]
+
+    port = _free_port()
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning",
+                                           backlog=args.clients * 2, timeout_keep_alive=int(args.interval) * 2))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.05)
+    base_url = f"http://127.0.0.1:{port}"
+    print(f"{args.clients} clients, {args.doctors * args.per_doctor} appointments today, {args.doctors} doctors")
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        with QueryCounter() as queries:
+            start = time.perf_counter()
+            latencies = asyncio.run(poll(base_url, args.clients, args.interval, args.duration))
+            elapsed = time.perf_counter() - start
+        poll_queries = queries.count
+    print(f"poll  {len(latencies) * 2} requests in {elapsed:.0f}s ({len(latencies) * 2 / elapsed:.0f}/s), "
+          f"{poll_queries} SQL statements; refresh p50 {median(latencies):.0f} ms p99 {percentile(latencies, 0.99):.0f} ms")
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        with QueryCounter() as queries:
+            fan_out, counts = asyncio.run(live(base_url, args.clients, args.updates, changes))
+    print(f"live  {args.updates} changes to {args.clients} streams, {queries.count} SQL statements; "
+          f"every client got {min(counts)}-{max(counts)} of {args.updates} events; "
+          f"PUT -> all clients p50 {median(fan_out):.1f} ms p99 {percentile(fan_out, 0.99):.1f} ms")
+
+    server.should_exit = True
+    thread.join(timeout=5)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,157 @@
+"""
+Benchmark: request latency of the hot endpoints with the server's logging on.
+
+Starts the API in a uvicorn subprocess whose stdout is a pipe (as on
+Render, where a collector reads it), seeds a full day of appointments, then
+sends --requests each of GET /api/queue, GET /api/appointments and POST
+/webhook at --concurrency and reports the median and p95 latency per
+endpoint, and how much the server wrote to stdout.
+
+Only HTTP is used, so the same script measures an older checkout for a
+before/after comparison. LOG_LEVEL / LOG_SAMPLE_RATE are passed through to
+the server.
+
+Usage (from backend/):
+    python -m benchmarks.log_overhead
+    python -m benchmarks.log_overhead --log-level DEBUG --sample-rate 1
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import subprocess
+import sys
+import threading
+import time
+
+from benchmarks.common import reset_schema
+from benchmarks.fake_graph_api import FakeGraphAPI, _free_port
+from benchmarks.replay_webhooks import generate
+from database import SessionLocal, Doctor, Appointment, engine
+from clinic_clock import clinic_clock
+import daily_stats
+
+STATUSES = ["Booked", "Checked In", "In Consultation", "Completed"]
+
+
+def seed(doctors: int, per_doctor: int):
+    reset_schema()
+    with SessionLocal() as db:
+        db.bulk_insert_mappings(Doctor, [
+            {"id": i, "name": f"Dr. Bench {i}", "specialization": "General Medicine",
+             "email": f"doctor{i}@bench.local", "status": "Available"}
+            for i in range(1, doctors + 1)
+        ])
+        db.bulk_insert_mappings(Appointment, [
+            {"patient_name": "Bench Patient", "doctor_name": f"Dr. Bench {d}", "doctor_id": d,
+             "date": clinic_clock.today(), "time": f"{9 + slot // 2:02d}:{(slot % 2) * 30:02d}",
+             "status": random.choice(STATUSES)}
+            for d in range(1, doctors + 1) for slot in range(per_doctor)
+        ])
+        db.commit()
+    with engine.begin() as conn:
+        daily_stats.rebuild(conn)  # Bulk inserts skip the counter hooks
+
+
+class Drain(threading.Thread):
+    """Reads the server's stdout as a log collector would"""
+
+    def __init__(self, stream):
+        super().__init__(daemon=True)
+        self.stream = stream
+        self.bytes = self.lines = 0
+
+    def run(self):
+        for line in self.stream:
+            self.bytes += len(line)
+            self.lines += 1
+
+
+async def hammer(base_url: str, requests: int, concurrency: int) -> dict:
+    import httpx
+    limit = asyncio.Semaphore(concurrency)
+    latencies = {"queue": [], "appointments": [], "webhook": []}
+    webhooks = iter(generate(requests))
+
+    async def call(client, name, send):
+        async with limit:
+            start = time.perf_counter()
+            response = await send(client)
+            latencies[name].append((time.perf_counter() - start) * 1000)
+            response.raise_for_status()
+
+    calls = []
+    for _ in range(requests):
+        calls.append(("queue", lambda c: c.get(f"{base_url}/api/queue")))
+        calls.append(("appointments", lambda c: c.get(f"{base_url}/api/appointments", params={"limit": 100})))
+        body = next(webhooks)
+        calls.append(("webhook", lambda c, body=body: c.post(f"{base_url}/webhook", json=body)))
+    random.shuffle(calls)
+    async with httpx.AsyncClient(timeout=60, limits=httpx.Limits(max_connections=concurrency)) as client:
+        await asyncio.gather(*(call(client, name, send) for name, send in calls))
+    return latencies
+
+
+def percentile(values: list, share: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * share))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=500, help="per endpoint")
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--doctors", type=int, default=250)
+    parser.add_argument("--per-doctor", type=int, default=8)
+    parser.add_argument("--log-level", default="INFO")
+    parser.add_argument("--sample-rate", default="0.01")
+    args = parser.parse_args()
+
+    seed(args.doctors, args.per_doctor)
+    with FakeGraphAPI() as graph:
+        port = _free_port()
+        env = {**os.environ, "WHATSAPP_API_URL": graph.base_url, "WHATSAPP_PHONE_NUMBER_ID": "1234567890",
+               "CALENDAR_MIRROR_ENABLED": "false", "LOG_LEVEL": args.log_level, "LOG_SAMPLE_RATE": args.sample_rate,
+               "PYTHONUNBUFFERED": "1"}
+        server = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "medical_backend.asgi:app", "--port", str(port),
+             "--log-level", "warning", "--no-access-log"],
+            env=env, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True
+        )
+        drain = Drain(server.stdout)
+        drain.start()
+        base_url = f"http://127.0.0.1:{port}"
+        try:
+            import httpx
+            deadline = time.time() + 60
+            while True:
+                try:
+                    httpx.get(f"{base_url}/").raise_for_status()
+                    break
+                except httpx.TransportError:
+                    if time.time() > deadline or server.poll() is not None:
+                        raise SystemExit("server did not start")
+                    time.sleep(0.2)
+
+            written = drain.bytes
+            start = time.perf_counter()
+            latencies = asyncio.run(hammer(base_url, args.requests, args.concurrency))
+            elapsed = time.perf_counter() - start
+            time.sleep(1)  # Let the background message handling and log output settle
+            written = drain.bytes - written
+        finally:
+            server.terminate()
+            server.wait(timeout=10)
+
+    print(f"{args.requests} requests per endpoint at concurrency {args.concurrency}, "
+          f"{args.doctors * args.per_doctor} appointments today; LOG_LEVEL={args.log_level} "
+          f"LOG_SAMPLE_RATE={args.sample_rate}")
+    print(f"{'endpoint':<14} {'p50 ms':>8} {'p95 ms':>8}")
+    for name, values in latencies.items():
+        print(f"{name:<14} {percentile(values, 0.5):>8.1f} {percentile(values, 0.95):>8.1f}")
+    print(f"total {elapsed:.1f}s; server wrote {written / 1024:.0f} KiB to stdout")
+
+
+if __name__ == "__main__":
+    main()
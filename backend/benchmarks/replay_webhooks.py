@@ -0,0 +1,152 @@
+"""
+Replay captured WhatsApp webhooks through the ingestion pipeline.
+
+Reads webhook bodies - one JSON object per line, either raw or as logged by
+the server (the "Webhook Received" JSON log lines, written with
+LOG_LEVEL=DEBUG LOG_SAMPLE_RATE=1, or older "Webhook Received: {...}"
+prints) - and POSTs them to /webhook, then
+waits for the background processing to drain. Each body can be sent
+several times (like Meta's redeliveries) to exercise deduplication.
+Reports the ack latency, how many messages were handled and how many
+duplicates were dropped, plus the replies sent to the fake Graph API.
+
+Without --file it generates text messages from distinct senders.
+
+Usage (from backend/):
+    python -m benchmarks.replay_webhooks --generate 500 --redeliver 3
+    python -m benchmarks.replay_webhooks --generate 500 --redeliver 3 --cold
+    python -m benchmarks.replay_webhooks --file captured_webhooks.log --concurrency 50
+"""
+
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import os
+import threading
+import time
+import uuid
+
+from benchmarks.common import median
+from benchmarks.fake_graph_api import FakeGraphAPI, _free_port
+
+PREFIX = "Webhook Received: "  # Lines printed before structured logging
+
+
+def load_captures(path: str) -> list:
+    bodies = []
+    with open(path) as f:
+        for line in f:
+            line = line.strip()
+            if PREFIX in line:
+                line = line.split(PREFIX, 1)[1]
+            if line.startswith("{"):
+                body = json.loads(line)
+                if body.get("msg") == "Webhook Received" and "payload" in body:
+                    body = body["payload"]
+                bodies.append(body)
+    return bodies
+
+
+def generate(count: int) -> list:
+    return [{
+        "object": "whatsapp_business_account",
+        "entry": [{"id": "bench", "changes": [{"field": "messages", "value": {
+            "messaging_product": "whatsapp",
+            "contacts": [{"profile": {"name": f"Bench {i}"}, "wa_id": f"9190000{i:05d}"}],
+            "messages": [{"from": f"9190000{i:05d}", "id": f"wamid.bench.{uuid.uuid4().hex}",
+                          "timestamp": str(int(time.time())), "type": "text", "text": {"body": "hi"}}]
+        }}]}]
+    } for i in range(count)]
+
+
+def count_messages(bodies: list) -> int:
+    from whatsapp_bot.webhook_ingest import iter_messages
+    return sum(1 for body in bodies for _ in iter_messages(body))
+
+
+async def replay(base_url: str, bodies: list, redeliver: int, concurrency: int, forget=None) -> list:
+    import httpx
+    limit = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async def post(client, body):
+        async with limit:
+            start = time.perf_counter()
+            response = await client.post(f"{base_url}/webhook", json=body)
+            latencies.append((time.perf_counter() - start) * 1000)
+            response.raise_for_status()
+
+    # Every body once, then the redeliveries, like Meta retrying
+    async with httpx.AsyncClient(timeout=30) as client:
+        for attempt in range(redeliver):
+            if attempt and forget:
+                forget()
+            await asyncio.gather(*(post(client, body) for body in bodies))
+    return latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--file", help="captured webhook bodies, one per line")
+    parser.add_argument("--generate", type=int, default=200, help="synthetic messages when no --file")
+    parser.add_argument("--redeliver", type=int, default=2, help="times each body is delivered")
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--cold", action="store_true",
+                        help="empty the in-memory cache between deliveries (as after a restart or on another worker)")
+    parser.add_argument("--latency", type=float, default=0.02, help="simulated Graph API latency (s)")
+    args = parser.parse_args()
+
+    with FakeGraphAPI(latency=args.latency) as graph:
+        os.environ["WHATSAPP_API_URL"] = graph.base_url
+        os.environ.setdefault("WHATSAPP_PHONE_NUMBER_ID", "1234567890")
+        os.environ.setdefault("CALENDAR_MIRROR_ENABLED", "false")
+        from benchmarks import common  # noqa: F401  (throwaway DATABASE_URL)
+        import httpx
+        import uvicorn
+        from medical_backend.asgi import app
+        from whatsapp_bot.webhook_ingest import webhook_dedup
+
+        port = _free_port()
+        server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+        thread = threading.Thread(target=server.run, daemon=True)
+        thread.start()
+        while not server.started:
+            time.sleep(0.05)
+        base_url = f"http://127.0.0.1:{port}"
+
+        bodies = load_captures(args.file) if args.file else generate(args.generate)
+        unique = count_messages(bodies)
+        print(f"{len(bodies)} webhook bodies ({unique} messages) x {args.redeliver} deliveries, "
+              f"concurrency {args.concurrency}")
+
+        forget = webhook_dedup._seen.clear if args.cold else None
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            latencies = asyncio.run(replay(base_url, bodies, args.redeliver, args.concurrency, forget))
+            acked = time.perf_counter() - start
+
+            # Wait for the background tasks to finish
+            deadline = time.time() + 60
+            while time.time() < deadline:
+                stats = httpx.get(f"{base_url}/api/whatsapp/metrics").json()["data"]["webhooks"]
+                if stats["processed"] + stats["duplicates"] + stats["redelivered"] >= stats["received"]:
+                    break
+                time.sleep(0.1)
+            drained = time.perf_counter() - start
+        server.should_exit = True
+        thread.join(timeout=5)
+
+        latencies.sort()
+        print(f"acked    {len(latencies)} deliveries in {acked:.2f}s ({len(latencies) / acked:.0f}/s)  "
+              f"p50 {median(latencies):.1f} ms  p99 {latencies[int(len(latencies) * 0.99)]:.1f} ms")
+        print(f"handled  {stats['processed']} messages in {drained:.2f}s; dropped {stats['duplicates']} in memory, "
+              f"{stats['redelivered']} by the table")
+        print(f"replies  {len(graph.received)} sent to the Graph API")
+        if stats["processed"] != unique:
+            print(f"MISMATCH: expected {unique} handled messages")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""
+Benchmark: outbound WhatsApp message throughput against the fake Graph API.
+
+Compares the old per-call requests.post, the pooled sync client and the
+async pooled client at a given simulated Graph API latency.
+
+Usage (from backend/):
+    python -m benchmarks.whatsapp_client_throughput --messages 500 --latency 0.02
+"""
+
+import argparse
+import asyncio
+import contextlib
+import io
+import time
+
+import requests
+
+from benchmarks.fake_graph_api import FakeGraphAPI
+from whatsapp_bot.whatsapp_client import WhatsAppClient, AsyncWhatsAppClient
+
+
+def run_legacy(url: str, count: int):
+    """The previous client: a fresh connection per requests.post, no timeout"""
+    client = WhatsAppClient(api_url=url)
+    for i in range(count):
+        requests.post(url, headers=client.headers, json=client._text_payload("9876543210", f"msg {i}")).raise_for_status()
+
+
+def run_pooled_sync(url: str, count: int):
+    client = WhatsAppClient(api_url=url)
+    for i in range(count):
+        client.send_message("9876543210", f"msg {i}")
+
+
+def run_async(url: str, count: int, concurrency: int):
+    async def main():
+        client = AsyncWhatsAppClient(api_url=url, max_concurrency=concurrency)
+        await asyncio.gather(*(client.send_message(f"98765{i:05d}", f"msg {i}") for i in range(count)))
+        await client.aclose()
+    asyncio.run(main())
+
+
+def measure(label: str, graph: FakeGraphAPI, fn, count: int):
+    graph.received.clear()
+    graph.connections.clear()
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        fn()
+    elapsed = time.perf_counter() - start
+    print(f"{label:<22} {count / elapsed:>10.1f} msg/s {elapsed:>8.2f}s  "
+          f"{len(graph.connections):>5} connections  {len(graph.received):>5} delivered")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--messages", type=int, default=500)
+    parser.add_argument("--latency", type=float, default=0.02, help="simulated Graph API latency (s)")
+    parser.add_argument("--concurrency", type=int, default=20)
+    args = parser.parse_args()
+
+    with FakeGraphAPI(latency=args.latency) as graph:
+        url = graph.messages_url
+        print(f"{args.messages} messages, {args.latency * 1000:.0f} ms simulated latency")
+        measure("requests.post (old)", graph, lambda: run_legacy(url, args.messages), args.messages)
+        measure("pooled sync client", graph, lambda: run_pooled_sync(url, args.messages), args.messages)
+        measure(f"async x{args.concurrency}", graph, lambda: run_async(url, args.messages, args.concurrency), args.messages)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""
+Index coverage check for the appointment hot paths.
+
+Runs EXPLAIN on each hot query and fails (exit code 1) if any of them falls
+back to a full scan of the appointments table. Works on SQLite and PostgreSQL:
+    python check_indexes.py
+"""
+
+import sys
+from datetime import date
+
+from sqlalchemy import func, text
+
+from database import SessionLocal, Appointment, init_db
+
+SAMPLE_DATE = date(2025, 1, 15)
+SAMPLE_PHONE = "919876543210"
+
+
+def hot_queries(db):
+    """The appointment lookups that must stay index-backed"""
+    return {
+        "queue (date, status)": db.query(Appointment).filter(
+            Appointment.date == SAMPLE_DATE,
+            Appointment.status.in_(["Booked", "Checked In", "In Consultation"])
+        ),
+        "dashboard (date) group by doctor_id, status": db.query(
+            Appointment.doctor_id, Appointment.status, func.count(Appointment.id)
+        ).filter(
+            Appointment.date == SAMPLE_DATE
+        ).group_by(Appointment.doctor_id, Appointment.status),
+        "doctor slots (doctor_id, date, status)": db.query(Appointment.time).filter(
+            Appointment.doctor_id == 1,
+            Appointment.date == SAMPLE_DATE,
+            Appointment.status != "Cancelled"
+        ),
+        "slot occupancy bulk (doctor_id IN, date IN)": db.query(
+            Appointment.doctor_id, Appointment.date, Appointment.time
+        ).filter(
+            Appointment.doctor_id.in_([1, 2, 3]),
+            Appointment.date.in_([SAMPLE_DATE, date(2025, 1, 16)]),
+            Appointment.status != "Cancelled"
+        ),
+        "booking constraints (patient_phone, date)": db.query(Appointment).filter(
+            Appointment.patient_phone == SAMPLE_PHONE,
+            Appointment.date == SAMPLE_DATE,
+            Appointment.status != "Cancelled"
+        ),
+        "user appointments (patient_phone, status)": db.query(Appointment).filter(
+            Appointment.patient_phone == SAMPLE_PHONE,
+            Appointment.status != "Cancelled"
+        ),
+    }
+
+
+def explain(db, query) -> list:
+    """Return the plan lines for a query on the current dialect"""
+    sql = str(query.statement.compile(db.bind, compile_kwargs={"literal_binds": True}))
+    if db.bind.dialect.name == "postgresql":
+        # Tiny tables always favour a seq scan; ask whether an index CAN serve it
+        db.execute(text("SET LOCAL enable_seqscan = off"))
+        return [row[0] for row in db.execute(text(f"EXPLAIN {sql}"))]
+    return [row[-1] for row in db.execute(text(f"EXPLAIN QUERY PLAN {sql}"))]
+
+
+def is_full_scan(plan: list) -> bool:
+    for line in plan:
+        if "Seq Scan on appointments" in line:
+            return True
+        # SQLite: "SCAN appointments" is a table scan; "SCAN ... USING INDEX" is not
+        if line.startswith("SCAN appointments") and "INDEX" not in line:
+            return True
+    return False
+
+
+def check_indexes() -> bool:
+    init_db()
+    db = SessionLocal()
+    ok = True
+    try:
+        for name, query in hot_queries(db).items():
+            plan = explain(db, query)
+            if is_full_scan(plan):
+                ok = False
+                print(f"❌ {name}: full table scan")
+            else:
+                print(f"✅ {name}")
+            for line in plan:
+                print(f"     {line}")
+    finally:
+        db.rollback()
+        db.close()
+    return ok
+
+
+if __name__ == "__main__":
+    sys.exit(0 if check_indexes() else 1)
@@ -0,0 +1,122 @@
+"""
+The clinic's wall clock.
+
+Appointment dates and times are clinic-local (config.TIMEZONE), whatever
+timezone the server runs in, so "today" and "now" must come from here
+rather than date.today() / datetime.now().
+
+Each HTTP request resolves the time once (ClinicClockMiddleware) and every
+call during the request - in the endpoint, its threadpool work and the
+session hooks it triggers - sees that same instant, so the queue, the
+summary and their ETags can't straddle midnight halfway through a request.
+Outside a request each call reads the system clock.
+
+Tests can freeze the clock for the whole process:
+
+    with clinic_clock.frozen(datetime(2025, 3, 1, 23, 59)):   # clinic-local
+        ...
+
+DailyCache holds per-date aggregates keyed on the clinic date, so entries
+roll over exactly at local midnight.
+"""
+
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import date, datetime
+from typing import Any, Callable, Hashable, Optional
+
+import pytz
+
+from whatsapp_bot.config import config
+
+_request_now: ContextVar[Optional[datetime]] = ContextVar("clinic_request_now", default=None)
+
+
+class ClinicClock:
+    def __init__(self, timezone: str = None):
+        self.tz = pytz.timezone(timezone or config.TIMEZONE)
+        self._frozen: Optional[datetime] = None
+
+    def now(self) -> datetime:
+        """Current clinic-local time (timezone-aware)"""
+        if self._frozen is not None:
+            return self._frozen
+        return _request_now.get() or datetime.now(self.tz)
+
+    def today(self) -> date:
+        return self.now().date()
+
+    def local_now(self) -> datetime:
+        """now() without tzinfo - for comparing with naive clinic-local datetimes"""
+        return self.now().replace(tzinfo=None)
+
+    @contextmanager
+    def pinned(self):
+        """Resolve the time once; now() returns it until the block exits"""
+        token = _request_now.set(self.now())
+        try:
+            yield
+        finally:
+            _request_now.reset(token)
+
+    @contextmanager
+    def frozen(self, at: datetime):
+        """Tests: now() returns `at` (naive = clinic-local) everywhere until the block exits"""
+        previous = self._frozen
+        self._frozen = at if at.tzinfo else self.tz.localize(at)
+        try:
+            yield
+        finally:
+            self._frozen = previous
+
+clinic_clock = ClinicClock()
+
+
+class ClinicClockMiddleware:
+    """Pins clinic_clock for the duration of each HTTP request"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        with clinic_clock.pinned():
+            await self.app(scope, receive, send)
+
+
+class DailyCache:
+    """Values computed once per clinic date and key, at most `max_entries`
+    (oldest dropped first). Entries from earlier dates are dropped the first
+    time the date rolls over."""
+
+    def __init__(self, max_entries: int = 128):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._day: Optional[date] = None
+        self._entries: "OrderedDict[Hashable, Any]" = OrderedDict()
+        self.stats = {"hits": 0, "misses": 0}
+
+    def get(self, key: Hashable, compute: Callable[[date], Any]) -> Any:
+        """Cached value for (today, key), else compute(today) and cache it"""
+        today = clinic_clock.today()
+        with self._lock:
+            if self._day != today:
+                self._day, self._entries = today, OrderedDict()
+            if key in self._entries:
+                self.stats["hits"] += 1
+                return self._entries[key]
+        value = compute(today)
+        with self._lock:
+            self.stats["misses"] += 1
+            if self._day == today:
+                self._entries[key] = value
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._entries = OrderedDict()
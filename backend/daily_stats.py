@@ -0,0 +1,186 @@
+"""
+Per-day appointment counters.
+
+daily_stats holds the number of appointments for each (date, doctor,
+status), so the dashboard summary reads a few rows per doctor instead of
+grouping all of today's appointments on every poll. Appointments without a
+doctor are counted under doctor_id 0 (NO_DOCTOR): key columns can't be NULL.
+
+The counters change in the same transaction as the appointments. A
+before_flush hook on SessionLocal turns every insert, delete, or change of
+date, doctor or status about to be flushed into +1/-1 deltas, and applies
+them with INSERT .. ON CONFLICT DO UPDATE, in key order so concurrent
+writers lock the rows the same way. A failed flush rolls them back with
+the rest. A bulk query.update() that sets date, doctor or status, or any
+bulk delete, on appointments can't be turned into deltas; before that
+commit the counters are compared with the appointments in one statement
+and only the differences applied, again as deltas. Bulk updates of other
+columns (the calendar sync bookkeeping) don't touch the counters.
+
+Writes that bypass SessionLocal (raw SQL, engine connections) are not
+counted. reconcile_daily_stats.py recomputes the counters from the
+appointments and reports (and with --fix, repairs) any drift.
+"""
+
+from collections import Counter
+from datetime import date
+from typing import Dict, Optional, Tuple
+
+from sqlalchemy import delete, event, func, inspect, select, union_all
+from sqlalchemy.engine import Connection
+
+from database import SessionLocal, Appointment, DailyStat, bulk_set_columns, dialect_insert
+
+NO_DOCTOR = 0
+NO_STATUS = ""
+
+# Appointment columns that make up a counter key
+COUNTED_COLUMNS = ("date", "doctor_id", "status")
+
+Key = Tuple[date, int, str]  # (date, doctor_id, status)
+
+
+def _key(day, doctor_id, status) -> Key:
+    return day, doctor_id if doctor_id is not None else NO_DOCTOR, status if status is not None else NO_STATUS
+
+
+def _current_key(apt: Appointment) -> Key:
+    values = []
+    for name in COUNTED_COLUMNS:
+        value = getattr(apt, name)
+        default = Appointment.__table__.c[name].default
+        if value is None and default is not None and default.is_scalar:
+            value = default.arg  # Pending row: the column default applies at INSERT
+        values.append(value)
+    return _key(*values)
+
+
+def _committed_key(apt: Appointment) -> Key:
+    attrs = inspect(apt).attrs
+    values = []
+    for name in COUNTED_COLUMNS:
+        history = attrs[name].load_history()
+        values.append((history.deleted or history.unchanged or [None])[0])
+    return _key(*values)
+
+
+def apply_deltas(conn: Connection, deltas: Dict[Key, int]):
+    for (day, doctor_id, status), delta in sorted(deltas.items()):
+        if not delta:
+            continue
+        statement = dialect_insert(DailyStat).values(date=day, doctor_id=doctor_id, status=status, count=delta)
+        conn.execute(statement.on_conflict_do_update(
+            index_elements=[DailyStat.date, DailyStat.doctor_id, DailyStat.status],
+            set_={"count": DailyStat.count + delta}
+        ))
+
+
+def counts_from_appointments(conn: Connection, since: Optional[date] = None) -> Dict[Key, int]:
+    """The counters as they should be, grouped from the appointments themselves"""
+    query = select(
+        Appointment.date,
+        func.coalesce(Appointment.doctor_id, NO_DOCTOR),
+        func.coalesce(Appointment.status, NO_STATUS),
+        func.count()
+    ).group_by(Appointment.date, Appointment.doctor_id, Appointment.status)
+    if since:
+        query = query.where(Appointment.date >= since)
+    counts = Counter()
+    for day, doctor_id, status, count in conn.execute(query):
+        counts[(day, doctor_id, status)] += count
+    return dict(counts)
+
+
+def counts_from_stats(conn: Connection, since: Optional[date] = None) -> Dict[Key, int]:
+    query = select(DailyStat.date, DailyStat.doctor_id, DailyStat.status, DailyStat.count).where(DailyStat.count != 0)
+    if since:
+        query = query.where(DailyStat.date >= since)
+    return {(day, doctor_id, status): count for day, doctor_id, status, count in conn.execute(query)}
+
+
+def count_drift(conn: Connection) -> Dict[Key, int]:
+    """{key: actual - counted} for every counter that is off"""
+    # One statement, so both sides come from the same snapshot
+    both = union_all(
+        select(
+            Appointment.date.label("date"),
+            func.coalesce(Appointment.doctor_id, NO_DOCTOR).label("doctor_id"),
+            func.coalesce(Appointment.status, NO_STATUS).label("status"),
+            func.count().label("n")
+        ).group_by(Appointment.date, Appointment.doctor_id, Appointment.status),
+        select(DailyStat.date, DailyStat.doctor_id, DailyStat.status, -DailyStat.count)
+    ).subquery()
+    difference = func.sum(both.c.n)
+    query = select(both.c.date, both.c.doctor_id, both.c.status, difference).group_by(
+        both.c.date, both.c.doctor_id, both.c.status
+    ).having(difference != 0)
+    return {(day, doctor_id, status): delta for day, doctor_id, status, delta in conn.execute(query)}
+
+
+def repair(conn: Connection):
+    """Bring the counters in line with the appointments, touching only the keys that are off"""
+    drift = count_drift(conn)
+    # Deltas rather than absolute counts, so concurrent writers' increments still add up
+    apply_deltas(conn, drift)
+    for day, doctor_id, status in sorted(drift):
+        conn.execute(delete(DailyStat).where(
+            DailyStat.date == day, DailyStat.doctor_id == doctor_id, DailyStat.status == status, DailyStat.count == 0
+        ))
+
+
+def rebuild(conn: Connection):
+    """Recompute every counter from the appointments"""
+    counts = counts_from_appointments(conn)
+    conn.execute(delete(DailyStat))
+    if counts:
+        conn.execute(DailyStat.__table__.insert(), [
+            {"date": day, "doctor_id": doctor_id, "status": status, "count": count}
+            for (day, doctor_id, status), count in counts.items()
+        ])
+
+
+# Load the old value when one of these is assigned, so the flush knows which counter to decrement
+for _name in COUNTED_COLUMNS:
+    event.listen(getattr(Appointment, _name), "set", lambda *args: None, active_history=True)
+
+
+@event.listens_for(SessionLocal, "before_flush")
+def _count_flushed(session, flush_context, instances):
+    deltas = Counter()
+    for apt in session.new:
+        if isinstance(apt, Appointment):
+            deltas[_current_key(apt)] += 1
+    for apt in session.deleted:
+        if isinstance(apt, Appointment):
+            deltas[_committed_key(apt)] -= 1
+    for apt in session.dirty:
+        if isinstance(apt, Appointment):
+            attrs = inspect(apt).attrs
+            if any(attrs[name].history.has_changes() for name in COUNTED_COLUMNS):
+                deltas[_committed_key(apt)] -= 1
+                deltas[_current_key(apt)] += 1
+    if any(deltas.values()):
+        apply_deltas(session.connection(), deltas)
+
+
+@event.listens_for(SessionLocal, "do_orm_execute")
+def _note_bulk_write(orm_execute_state):
+    if not (orm_execute_state.is_update or orm_execute_state.is_delete):
+        return
+    table = getattr(orm_execute_state.statement, "table", None)
+    if table is None or table.name != Appointment.__tablename__:
+        return
+    names = None if orm_execute_state.is_delete else bulk_set_columns(orm_execute_state)
+    if names is None or not names.isdisjoint(COUNTED_COLUMNS):
+        orm_execute_state.session.info["daily_stats_stale"] = True
+
+
+@event.listens_for(SessionLocal, "before_commit")
+def _repair_after_bulk(session):
+    if session.info.pop("daily_stats_stale", False):
+        repair(session.connection())
+
+
+@event.listens_for(SessionLocal, "after_rollback")
+def _discard_stale(session):
+    session.info.pop("daily_stats_stale", None)
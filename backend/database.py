@@ -2,7 +2,7 @@
 Database Configuration - PostgreSQL Only
 """
 
-from sqlalchemy import create_engine, Column, Integer, String, Date, Float, Boolean, DateTime
+from sqlalchemy import create_engine, Column, Integer, String, Date, Float, Boolean, DateTime, Index, Text, text
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 from datetime import datetime
@@ -74,6 +74,9 @@ class Patient(Base):
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
+# Rows that hold a doctor's slot - kept in sync with the "status != 'Cancelled'" slot lookups
+ACTIVE_SLOT_PREDICATE = "status != 'Cancelled'"
+
 class Appointment(Base):
     __tablename__ = "appointments"
     
@@ -92,10 +95,136 @@ class Appointment(Base):
     doctor_id = Column(Integer, nullable=True)   # Link to doctor
     patient_phone = Column(String, nullable=True)  # For WhatsApp notifications
     booking_source = Column(String, default="Dashboard")  # Dashboard, WhatsApp, Phone
+
+    # Google Calendar sync, done by whatsapp_bot/calendar_sync.py after booking
+    calendar_sync_status = Column(String, nullable=True)  # pending, synced, failed (NULL = not synced to a calendar)
+    calendar_sync_attempts = Column(Integer, nullable=False, default=0, server_default="0")
+    calendar_sync_next_at = Column(DateTime, nullable=True)  # Next attempt, or lease expiry while in flight
+    calendar_sync_error = Column(Text, nullable=True)
+    calendar_event_id = Column(String, nullable=True)  # Google Calendar event id, set once synced
     
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
+    # Composite indexes for the hot lookups. Existing databases get these
+    # through migrations.py, since create_all never alters a table.
+    __table_args__ = (
+        Index("ix_appointments_date_status_doctor", "date", "status", "doctor_id"),  # queue, dashboard
+        Index("ix_appointments_doctor_date_status_time", "doctor_id", "date", "status", "time"),  # slot lookups
+        Index("ix_appointments_phone_date", "patient_phone", "date"),  # booking constraints
+        Index("ix_appointments_phone_status", "patient_phone", "status"),  # user's appointments
+        Index("ix_appointments_calendar_sync", "calendar_sync_status", "calendar_sync_next_at"),  # sync worker
+        Index("ix_appointments_date_time_id", "date", "time", "id"),  # list order / keyset pagination
+        # One active booking per doctor slot, enforced by the database (partial: cancelled rows don't count)
+        Index("uq_appointments_doctor_slot", "doctor_id", "date", "time", unique=True,
+              sqlite_where=text(ACTIVE_SLOT_PREDICATE), postgresql_where=text(ACTIVE_SLOT_PREDICATE)),
+    )
+
+class WhatsAppSession(Base):
+    """Conversation state for the WhatsApp bot, shared across workers"""
+    __tablename__ = "whatsapp_sessions"
+
+    user_id = Column(String, primary_key=True)  # Sender phone number
+    data = Column(Text, nullable=False)  # JSON-encoded session dict
+    version = Column(Integer, nullable=False, default=1)  # Bumped on every write (compare-and-set)
+    expires_at = Column(DateTime, nullable=False, index=True)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+class ProcessedMessage(Base):
+    """Inbound WhatsApp message ids already handled - drops Meta's redelivered webhooks"""
+    __tablename__ = "whatsapp_processed_messages"
+
+    message_id = Column(String, primary_key=True)  # wamid from the webhook
+    sender = Column(String, nullable=True)
+    received_at = Column(DateTime, nullable=False, default=datetime.utcnow, index=True)  # Pruned after the retention window
+
+class OutboundMessage(Base):
+    """Outbox of WhatsApp messages, delivered by whatsapp_bot.outbox"""
+    __tablename__ = "outbound_messages"
+
+    id = Column(Integer, primary_key=True, index=True)
+    recipient = Column(String, nullable=False)  # Formatted phone number
+    payload = Column(Text, nullable=False)  # JSON body for the Graph API
+    status = Column(String, nullable=False, default="pending")  # pending, sending, sent, dead
+    attempts = Column(Integer, nullable=False, default=0)
+    next_attempt_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+    last_error = Column(Text, nullable=True)
+    provider_message_id = Column(String, nullable=True)  # wamid returned by Meta
+
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    __table_args__ = (
+        Index("ix_outbound_messages_status_next_attempt", "status", "next_attempt_at"),
+        Index("ix_outbound_messages_recipient_status", "recipient", "status"),
+    )
+
+class CalendarBusyInterval(Base):
+    """Local mirror of Google Calendar busy time, one row per event per clinic-local day.
+    Kept current by whatsapp_bot.calendar_mirror."""
+    __tablename__ = "calendar_busy_intervals"
+
+    id = Column(Integer, primary_key=True, index=True)
+    calendar_id = Column(String, nullable=False)
+    event_id = Column(String, nullable=False)
+    date = Column(Date, nullable=False)
+    start_minute = Column(Integer, nullable=False)  # Minute of day, clinic timezone
+    end_minute = Column(Integer, nullable=False)  # Exclusive, up to 1440
+
+    __table_args__ = (
+        Index("ix_calendar_busy_intervals_calendar_date", "calendar_id", "date", "start_minute"),  # slot lookups
+        Index("ix_calendar_busy_intervals_calendar_event", "calendar_id", "event_id"),  # incremental sync
+    )
+
+class CalendarMirrorState(Base):
+    """Incremental sync token and push channel per mirrored calendar"""
+    __tablename__ = "calendar_mirror_state"
+
+    calendar_id = Column(String, primary_key=True)
+    sync_token = Column(Text, nullable=True)  # NULL until the first full sync completes
+    channel_id = Column(String, nullable=True, index=True)
+    channel_resource_id = Column(String, nullable=True)
+    channel_token = Column(String, nullable=True)  # Echoed by Google in X-Goog-Channel-Token
+    channel_expires_at = Column(DateTime, nullable=True)
+    last_synced_at = Column(DateTime, nullable=True)
+
+class ResourceVersion(Base):
+    """Write generation per table, bumped on every commit that changes it - the ETags in api.conditional"""
+    __tablename__ = "resource_versions"
+
+    name = Column(String, primary_key=True)  # Table name
+    version = Column(Integer, nullable=False, default=0)
+
+class DailyStat(Base):
+    """Appointment count per (date, doctor, status), maintained by daily_stats.py"""
+    __tablename__ = "daily_stats"
+
+    date = Column(Date, primary_key=True)
+    doctor_id = Column(Integer, primary_key=True)  # 0 for appointments without a doctor
+    status = Column(String, primary_key=True)
+    count = Column(Integer, nullable=False, default=0)
+
+class SchemaMigration(Base):
+    __tablename__ = "schema_migrations"
+
+    version = Column(Integer, primary_key=True)
+    description = Column(String, nullable=False)
+    applied_at = Column(DateTime, default=datetime.utcnow)
+
+def dialect_insert(model):
+    """INSERT supporting .on_conflict_do_update() on PostgreSQL and SQLite"""
+    from sqlalchemy.dialects import postgresql, sqlite
+    return (postgresql.insert if engine.dialect.name == "postgresql" else sqlite.insert)(model)
+
+def bulk_set_columns(orm_execute_state):
+    """Column names an ORM bulk UPDATE sets (from .values() or per-row parameters), or None if unknown"""
+    names = {getattr(column, "key", column) for column in orm_execute_state.statement._values or ()}
+    parameters = orm_execute_state.parameters
+    # Bulk UPDATE by primary key: the new values come as parameter dicts
+    for row in parameters if isinstance(parameters, list) else [parameters or {}]:
+        names.update(row)
+    return names or None
+
 # Dependency to get database session
 def get_db():
     db = SessionLocal()
@@ -106,10 +235,13 @@ def get_db():
 
 # Create all tables
 def init_db():
-    """Initialize database - create all tables"""
+    """Initialize database - create all tables and apply pending migrations"""
     Base.metadata.create_all(bind=engine)
     print("✅ Database tables created successfully!")
 
+    from migrations import run_migrations
+    run_migrations()
+
 # Database utility functions
 def get_db_info():
     """Get database information"""
@@ -118,3 +250,6 @@ def get_db_info():
         "url": DATABASE_URL.replace(DATABASE_URL.split("@")[-1].split("/")[0] if "@" in DATABASE_URL else "", "***") if "@" in DATABASE_URL else DATABASE_URL,
         "status": "Connected"
     }
+
+# Registers the daily_stats counter maintenance on SessionLocal, for every writer
+import daily_stats  # noqa: E402,F401
@@ -1,8 +1,15 @@
+import asyncio
+from structured_logging import setup_logging
+
+# Before the app's modules are imported, so what they log at import time is kept
+setup_logging()
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from medical_backend.settings import CORS_ORIGINS
 from medical_backend.urls import api_router
 from database import init_db
+from clinic_clock import ClinicClockMiddleware
 
 app = FastAPI(title="Medical Dashboard API", version="3.0.0")
 
@@ -15,6 +22,9 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Resolve the clinic's "now" once per request
+app.add_middleware(ClinicClockMiddleware)
+
 # Include Centralized Router (urls.py)
 app.include_router(api_router)
 
@@ -23,6 +33,31 @@ def startup_event():
     init_db()
     print("✅ Database initialized successfully!")
 
+@app.on_event("startup")
+async def start_background_tasks():
+    from api.whatsapp import run_session_sweeper
+    from whatsapp_bot.outbox import outbox_dispatcher
+    from whatsapp_bot.calendar_sync import calendar_sync_worker
+    from whatsapp_bot.calendar_mirror import calendar_mirror
+    # Keep references so the tasks are not garbage collected
+    app.state.background_tasks = [
+        asyncio.create_task(run_session_sweeper()),
+        asyncio.create_task(outbox_dispatcher.run()),
+        asyncio.create_task(calendar_sync_worker.run()),
+        asyncio.create_task(calendar_mirror.run()),
+    ]
+
+@app.on_event("shutdown")
+async def stop_background_tasks():
+    for task in getattr(app.state, "background_tasks", []):
+        task.cancel()
+    from whatsapp_bot.keyed_scheduler import message_scheduler
+    message_scheduler.cancel_all()
+    from whatsapp_bot.whatsapp_client import async_whatsapp_client
+    await async_whatsapp_client.aclose()
+    from whatsapp_bot.async_calendar import async_calendar_service
+    async_calendar_service.shutdown()
+
 @app.get("/")
 def read_root():
     return {
@@ -23,3 +23,9 @@ api_router.include_router(whatsapp_router, prefix="", tags=["WhatsApp"])
 
 from api.search import router as search_router
 api_router.include_router(search_router, prefix="/api/search", tags=["Search"])
+
+from api.calendar import router as calendar_router
+api_router.include_router(calendar_router, prefix="/api/calendar", tags=["Calendar"])
+
+from api.live import router as live_router
+api_router.include_router(live_router, prefix="/api/live", tags=["Live"])
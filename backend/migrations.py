@@ -0,0 +1,147 @@
+"""
+Schema Migrations
+`Base.metadata.create_all` only creates missing tables - it never adds
+columns or indexes to tables that already exist. Every schema change to an
+existing table is registered here as a numbered migration, applied once and
+recorded in `schema_migrations`.
+
+Runs automatically from `database.init_db()`, or by hand:
+    python migrations.py
+"""
+
+from datetime import datetime
+from typing import Callable, List, Tuple
+
+from sqlalchemy import inspect, select, text
+from sqlalchemy.engine import Connection
+
+from database import engine, Appointment, SchemaMigration, ACTIVE_SLOT_PREDICATE
+
+# (version, description, apply(conn)) - append only, never renumber
+MIGRATIONS: List[Tuple[int, str, Callable[[Connection], None]]] = []
+
+# Arbitrary key for the PostgreSQL advisory lock that serializes workers
+MIGRATION_LOCK_KEY = 74210391
+
+
+def migration(version: int, description: str):
+    """Register a migration function"""
+    def decorator(fn):
+        MIGRATIONS.append((version, description, fn))
+        return fn
+    return decorator
+
+
+def create_index(conn: Connection, table, name: str):
+    """Create one of the model's indexes if it does not exist yet"""
+    index = next(i for i in table.__table__.indexes if i.name == name)
+    index.create(conn, checkfirst=True)
+
+
+def add_column(conn: Connection, table, name: str):
+    """Add one of the model's columns to an existing table if it is missing"""
+    table_name = table.__tablename__
+    if name in {c["name"] for c in inspect(conn).get_columns(table_name)}:
+        return
+    column = table.__table__.columns[name]
+    ddl = f"ALTER TABLE {table_name} ADD COLUMN {name} {column.type.compile(dialect=conn.dialect)}"
+    if column.server_default is not None:
+        ddl += f" DEFAULT {column.server_default.arg}"
+    if not column.nullable:
+        ddl += " NOT NULL"
+    conn.execute(text(ddl))
+
+
+# ==================== MIGRATIONS ====================
+
+@migration(1, "Composite indexes for appointment hot paths")
+def add_appointment_indexes(conn: Connection):
+    for name in (
+        "ix_appointments_date_status_doctor",
+        "ix_appointments_doctor_date_status_time",
+        "ix_appointments_phone_date",
+        "ix_appointments_phone_status",
+    ):
+        create_index(conn, Appointment, name)
+
+
+@migration(2, "Google Calendar sync state on appointments")
+def add_calendar_sync_columns(conn: Connection):
+    for name in (
+        "calendar_sync_status",
+        "calendar_sync_attempts",
+        "calendar_sync_next_at",
+        "calendar_sync_error",
+    ):
+        add_column(conn, Appointment, name)
+    create_index(conn, Appointment, "ix_appointments_calendar_sync")
+
+
+@migration(3, "Google Calendar event id on appointments")
+def add_calendar_event_id(conn: Connection):
+    add_column(conn, Appointment, "calendar_event_id")
+
+
+@migration(4, "Unique active booking per doctor slot")
+def add_doctor_slot_unique_index(conn: Connection):
+    # The index can't be built over existing double bookings; make someone resolve them
+    duplicates = conn.execute(text(f"""
+        SELECT doctor_id, date, time, COUNT(*) FROM appointments
+        WHERE doctor_id IS NOT NULL AND {ACTIVE_SLOT_PREDICATE}
+        GROUP BY doctor_id, date, time HAVING COUNT(*) > 1
+        ORDER BY date, time
+    """)).all()
+    if duplicates:
+        listed = "\n".join(f"  doctor {d} on {day} at {t}: {n} bookings" for d, day, t, n in duplicates[:20])
+        more = f"\n  ... and {len(duplicates) - 20} more" if len(duplicates) > 20 else ""
+        raise RuntimeError(
+            f"Cannot add uq_appointments_doctor_slot: {len(duplicates)} doctor slots are double-booked.\n"
+            f"{listed}{more}\n"
+            f"Cancel or move all but one appointment in each slot, then restart."
+        )
+    create_index(conn, Appointment, "uq_appointments_doctor_slot")
+
+
+@migration(5, "Index for keyset pagination of appointments")
+def add_appointment_list_index(conn: Connection):
+    create_index(conn, Appointment, "ix_appointments_date_time_id")
+
+
+@migration(6, "Backfill daily_stats counters from appointments")
+def backfill_daily_stats(conn: Connection):
+    # create_all has just made the table; from here on it is kept current on every write
+    import daily_stats
+    daily_stats.rebuild(conn)
+
+
+# ==================== RUNNER ====================
+
+def run_migrations(bind=engine) -> List[int]:
+    """Apply every pending migration in order. Returns the versions applied."""
+    applied_now = []
+    with bind.begin() as conn:
+        if conn.dialect.name == "postgresql":
+            # Several uvicorn workers may start at once; let one of them migrate
+            conn.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": MIGRATION_LOCK_KEY})
+
+        if not inspect(conn).has_table(SchemaMigration.__tablename__):
+            SchemaMigration.__table__.create(conn)
+
+        applied = set(conn.execute(select(SchemaMigration.version)).scalars())
+        for version, description, apply in sorted(MIGRATIONS, key=lambda m: m[0]):
+            if version in applied:
+                continue
+            print(f"[DB] Applying migration {version}: {description}")
+            apply(conn)
+            conn.execute(SchemaMigration.__table__.insert().values(
+                version=version,
+                description=description,
+                applied_at=datetime.utcnow()
+            ))
+            applied_now.append(version)
+    return applied_now
+
+
+if __name__ == "__main__":
+    versions = run_migrations()
+    print(f"✅ Applied migrations: {versions}" if versions else "✅ Schema is up to date")
@@ -0,0 +1,61 @@
+"""
+Check the daily_stats counters against the appointments they count.
+
+Recomputes every (date, doctor, status) count from the appointments table
+and lists the counters that differ - drift means some write bypassed
+SessionLocal (raw SQL, a script on an engine connection). With --fix the
+differences are applied so the counters match again. Exits 1 if drift was
+found, so it can run from cron and alert. Safe to re-run.
+
+    python reconcile_daily_stats.py                    # every date
+    python reconcile_daily_stats.py --since 2025-01-01 --fix
+"""
+
+import argparse
+import sys
+from datetime import datetime
+
+from database import SessionLocal, init_db
+from daily_stats import apply_deltas, counts_from_appointments, counts_from_stats
+from api.conditional import bump_versions
+
+
+def reconcile(since=None, fix: bool = False) -> dict:
+    """Returns {(date, doctor_id, status): (counted, actual)} for every drifted counter"""
+    db = SessionLocal()
+    try:
+        options = {"isolation_level": "REPEATABLE READ"} if db.bind.dialect.name == "postgresql" else {}
+        conn = db.connection(execution_options=options)  # Both counts from one snapshot
+        actual = counts_from_appointments(conn, since)
+        counted = counts_from_stats(conn, since)
+        drift = {
+            key: (counted.get(key, 0), actual.get(key, 0))
+            for key in set(actual) | set(counted)
+            if counted.get(key, 0) != actual.get(key, 0)
+        }
+        if fix and drift:
+            apply_deltas(conn, {key: real - stored for key, (stored, real) in drift.items()})
+            db.commit()
+            bump_versions(db, ["appointments"])  # Dashboards cached the drifted summary
+            db.commit()
+        return drift
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Check the daily_stats counters against the appointments")
+    parser.add_argument("--since", type=lambda s: datetime.strptime(s, "%Y-%m-%d").date(),
+                        help="first date to check (default: all)")
+    parser.add_argument("--fix", action="store_true", help="correct the drifted counters")
+    args = parser.parse_args()
+
+    init_db()
+    drift = reconcile(args.since, args.fix)
+    for (day, doctor_id, status), (stored, real) in sorted(drift.items()):
+        print(f"  {day} doctor {doctor_id} {status or '(no status)'}: counter {stored}, appointments {real}")
+    if not drift:
+        print("✅ daily_stats matches the appointments")
+        sys.exit(0)
+    print(f"{'Fixed' if args.fix else 'Found'} {len(drift)} drifted counters")
+    sys.exit(0 if args.fix else 1)
@@ -0,0 +1,135 @@
+"""
+Structured, leveled logging that never writes to stdout on the request path.
+
+setup_logging() puts a QueueHandler on the root logger: a log call only
+resolves its message and appends the record to a bounded in-memory queue,
+and a QueueListener thread formats each record as one JSON line and writes
+it to stdout. If stdout falls behind and the queue fills, further records
+are dropped (and counted) rather than blocking the event loop.
+
+    {"ts": "2025-03-01T18:29:59.123+00:00", "level": "INFO", "logger": "api.whatsapp",
+     "msg": "Expired 3 idle WhatsApp sessions"}
+
+Fields passed with `extra={...}` are added to the line. Records are handed
+over by reference, so don't mutate an `extra` value after logging it.
+
+Loggers from get_logger(name, sampled=True) - the endpoints hit on every
+poll or webhook - keep only LOG_SAMPLE_RATE of their DEBUG/INFO records;
+warnings and errors always pass. Settings: LOG_LEVEL, LOG_SAMPLE_RATE,
+LOG_QUEUE_SIZE (medical_backend/settings.py).
+"""
+
+import atexit
+import copy
+import json
+import logging
+import queue
+import random
+import sys
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+from typing import Optional
+
+from medical_backend.settings import LOG_LEVEL, LOG_QUEUE_SIZE, LOG_SAMPLE_RATE
+
+# Attributes every LogRecord has; anything else on a record came from `extra`
+_RECORD_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime"}
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRS and not key.startswith("_"):
+                entry[key] = value
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exc"] = record.exc_text
+        if record.stack_info:
+            entry["stack"] = record.stack_info
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+class SampleFilter(logging.Filter):
+    """Keeps `rate` of the records below WARNING"""
+
+    def __init__(self, rate: float):
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        return record.levelno >= logging.WARNING or random.random() < self.rate
+
+
+class _NonBlockingQueueHandler(QueueHandler):
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Resolve what can't cross threads (args, exc_info); the JSON is built by the listener
+        record = copy.copy(record)
+        record.msg, record.args = record.getMessage(), None
+        if record.exc_info:
+            record.exc_text = _traceback_formatter.formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+_traceback_formatter = logging.Formatter()
+_handler: Optional[_NonBlockingQueueHandler] = None
+_listener: Optional[QueueListener] = None
+
+
+def setup_logging(level: str = None, stream=None):
+    """Route the root logger through the queue to JSON lines on `stream` (stdout). Safe to call again."""
+    global _handler, _listener
+    root = logging.getLogger()
+    root.setLevel(level or LOG_LEVEL)
+    if _listener is not None:
+        return
+
+    output = logging.StreamHandler(stream or sys.stdout)
+    output.setFormatter(JsonFormatter())
+    log_queue = queue.Queue(maxsize=LOG_QUEUE_SIZE)
+    _handler = _NonBlockingQueueHandler(log_queue)
+    _listener = QueueListener(log_queue, output, respect_handler_level=True)
+    _listener.start()
+    root.addHandler(_handler)
+    atexit.register(shutdown_logging)
+
+
+def shutdown_logging():
+    """Write out what is queued and stop the listener thread"""
+    global _handler, _listener
+    if _listener is None:
+        return
+    logging.getLogger().removeHandler(_handler)
+    _listener.stop()
+    _handler = _listener = None
+
+
+def get_logger(name: str, sampled: bool = False) -> logging.Logger:
+    logger = logging.getLogger(name)
+    if sampled and not any(isinstance(f, SampleFilter) for f in logger.filters):
+        logger.addFilter(SampleFilter(LOG_SAMPLE_RATE))
+    return logger
+
+
+def metrics() -> dict:
+    return {
+        "queued": _handler.queue.qsize() if _handler else 0,
+        "dropped": _handler.dropped if _handler else 0,
+    }
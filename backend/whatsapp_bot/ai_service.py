@@ -1,10 +1,14 @@
 from groq import Groq
 from .config import config
 from typing import Dict, Any
-from datetime import datetime
+from clinic_clock import clinic_clock
 from dateutil import parser as date_parser
+from structured_logging import get_logger
 import re
 
+# Every inbound message is parsed here; never log the patient's text
+logger = get_logger("whatsapp_bot.ai_service", sampled=True)
+
 groq_client = None
 if config.GROQ_API_KEY:
     groq_client = Groq(api_key=config.GROQ_API_KEY)
@@ -16,7 +20,7 @@ class AIService:
         try:
             # Common patterns
             text_lower = text.lower().strip()
-            today = datetime.now()
+            today = clinic_clock.local_now()
             
             # Handle relative dates
             if text_lower in ['today', 'now']:
@@ -38,7 +42,8 @@ class AIService:
             return parsed_date.strftime("%Y-%m-%d")
             
         except Exception as e:
-            print(f"Error parsing date '{text}': {e}")
+            # Not the error: it quotes the patient's text
+            logger.debug("Could not parse a date: %s", type(e).__name__)
             return None
     
     @staticmethod
@@ -65,14 +70,14 @@ class AIService:
             return parsed_time.strftime("%H:%M")
             
         except Exception as e:
-            print(f"Error parsing time '{text}': {e}")
+            logger.debug("Could not parse a time: %s", type(e).__name__)
             return None
     
     @staticmethod
     def parse_intent(message: str) -> Dict[str, Any]:
         """Parse user intent using Groq AI with enhanced date/time parsing"""
         if not groq_client:
-            print("Groq SDK not initialized. Returning default intent.")
+            logger.warning("Groq SDK not initialized. Returning default intent.")
             return {"intent": "other", "entities": {}, "response": "I can help you book an appointment. Just say 'Book appointment'."}
         
         try:
@@ -82,8 +87,8 @@ class AIService:
                         "role": "system",
                         "content": f"""You are an assistant for a hospital appointment booking bot. 
 Analyze the user's message and extract the intent and entities.
-Current Date: {datetime.now().strftime("%Y-%m-%d")}
-Current Day: {datetime.now().strftime("%A")}
+Current Date: {clinic_clock.today().strftime("%Y-%m-%d")}
+Current Day: {clinic_clock.today().strftime("%A")}
 
 Intents:
 - book_appointment: User wants to book an appointment
@@ -146,7 +151,7 @@ Return ONLY valid JSON in the following format:
             return result
             
         except Exception as error:
-            print(f"Error parsing intent: {error}")
+            logger.error("Error parsing intent: %s", type(error).__name__)
             return {"intent": "other", "entities": {}, "response": "I can help you book an appointment. Just say 'Book appointment'."}
 
 # Import timedelta for date calculations
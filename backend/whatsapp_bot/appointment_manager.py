@@ -1,39 +1,83 @@
 from sqlalchemy.orm import Session
+from sqlalchemy.exc import IntegrityError
 from database import SessionLocal, Appointment, Doctor
-from datetime import datetime
+from datetime import datetime, timedelta
 import random
 import string
-from typing import Dict, Any, List, Optional
+from typing import Dict, Any, List, Optional, Set, Tuple, Iterable
+from structured_logging import get_logger
+from .session_store import SessionStore, create_session_store
+from .calendar_sync import mark_pending
+from .doctor_service import doctor_service
+from .calendar_mirror import calendar_mirror
+
+logger = get_logger("whatsapp_bot.appointment_manager")
+
+# Days searched for a replacement when a slot turns out to be taken
+NEXT_SLOT_SEARCH_DAYS = 14
+
+class SlotUnavailableError(Exception):
+    """The doctor's slot was booked by someone else first (uq_appointments_doctor_slot).
+    `next_slot` is the nearest free (date, time) after it, if any."""
+
+    def __init__(self, doctor_id, date: str, time: str, next_slot: Optional[Tuple[str, str]] = None):
+        super().__init__(f"{date} {time} is no longer available")
+        self.doctor_id = doctor_id
+        self.date = date
+        self.time = time
+        self.next_slot = next_slot
+
+def is_slot_conflict(error: IntegrityError) -> bool:
+    """True if the insert/update violated the one-booking-per-slot index"""
+    message = str(error.orig)
+    # PostgreSQL names the index; SQLite lists its columns
+    return "uq_appointments_doctor_slot" in message or "appointments.doctor_id, appointments.date, appointments.time" in message
+
+def parse_doctor_id(doctor_id) -> Optional[int]:
+    """Normalize a bot doctor id ("1", 1 or "dr_001") to the integer DB id"""
+    if doctor_id is None:
+        return None
+    value = str(doctor_id).replace("dr_", "")
+    return int(value) if value.isdigit() else None
 
 class AppointmentManager:
-    def __init__(self):
-        self.sessions: Dict[str, Dict[str, Any]] = {}
+    # Attempts at a compare-and-set session update before giving up
+    SESSION_CAS_RETRIES = 5
+
+    def __init__(self, session_store: Optional[SessionStore] = None):
+        self.session_store = session_store or create_session_store()
+
+    @staticmethod
+    def _new_session(user_id: str) -> Dict[str, Any]:
+        return {
+            "userId": user_id,
+            "step": "idle",
+            "tempData": {}
+        }
     
     def get_session(self, user_id: str) -> Dict[str, Any]:
-        """Get or create user session"""
-        if user_id not in self.sessions:
-            self.sessions[user_id] = {
-                "userId": user_id,
-                "step": "idle",
-                "tempData": {}
-            }
-        return self.sessions[user_id]
+        """Get user session (a fresh one if none is stored)"""
+        loaded = self.session_store.load(user_id)
+        return loaded[0] if loaded else self._new_session(user_id)
     
-    def update_session(self, user_id: str, data: Dict[str, Any]):
-        """Update user session"""
-        session = self.get_session(user_id)
-        session.update(data)
-        if "tempData" in data:
-            session["tempData"].update(data["tempData"])
+    def update_session(self, user_id: str, data: Dict[str, Any]) -> Dict[str, Any]:
+        """Update user session with compare-and-set, retrying if another worker wrote first"""
+        for _ in range(self.SESSION_CAS_RETRIES):
+            loaded = self.session_store.load(user_id)
+            session, version = loaded if loaded else (self._new_session(user_id), 0)
+            session.update(data)
+            if self.session_store.compare_and_set(user_id, version, session):
+                return session
+        raise RuntimeError(f"Could not update session for {user_id}: concurrent updates")
     
     def clear_session(self, user_id: str):
         """Clear user session"""
-        if user_id in self.sessions:
-            del self.sessions[user_id]
+        self.session_store.delete(user_id)
     
     def create_appointment(self, user_id: str, user_name: str, doctor_id: str, doctor_name: str, 
-                          specialization: str, date: str, time: str) -> Dict[str, Any]:
-        """Create a new appointment in PostgreSQL"""
+                          specialization: str, date: str, time: str, sync_calendar: bool = False) -> Dict[str, Any]:
+        """Create a new appointment in PostgreSQL. With sync_calendar, the
+        Google Calendar event is queued for the background sync worker."""
         db: Session = SessionLocal()
         try:
             # Create new appointment record
@@ -50,8 +94,17 @@ class AppointmentManager:
                 department=specialization
             )
             
+            if sync_calendar:
+                mark_pending(new_appointment)
+            
             db.add(new_appointment)
-            db.commit()
+            try:
+                db.commit()
+            except IntegrityError as e:
+                db.rollback()
+                if not is_slot_conflict(e):
+                    raise
+                raise SlotUnavailableError(doctor_id, date, time, self.next_free_slot(doctor_id, date, time, user_id)) from e
             db.refresh(new_appointment)
             
             return {
@@ -61,53 +114,98 @@ class AppointmentManager:
                 "time": time,
                 "status": "confirmed"
             }
+        except SlotUnavailableError:
+            raise
         except Exception as e:
-            print(f"Error creating appointment: {e}")
+            # Not the message: the database error carries the patient's name and phone
+            logger.error("Error creating appointment: %s", type(e).__name__)
             db.rollback()
             raise e
         finally:
             db.close()
+
+    def next_free_slot(self, doctor_id, date: str, time: str, user_id: Optional[str] = None) -> Optional[Tuple[str, str]]:
+        """First free slot after `time` on `date`, else the earliest one on a later working day.
+        Slots held for patients other than `user_id` don't count as free.
+        May look up Google Calendar busy time: call it off the event loop."""
+        doctor = doctor_service.get_doctor_by_id(str(doctor_id))
+        if not doctor:
+            return None
+        start = datetime.strptime(date, "%Y-%m-%d")
+        days = [start + timedelta(days=i) for i in range(NEXT_SLOT_SEARCH_DAYS)]
+        days = [d.strftime("%Y-%m-%d") for d in days if d.strftime("%A") in doctor["working_days"]]
+        occupied = self.get_occupied_times_bulk([(str(doctor_id), d) for d in days])
+        # Busy time for every candidate day in one lookup, not one per day
+        calendar_id = doctor.get("google_calendar_id")
+        busy = {}
+        if calendar_id:
+            try:
+                busy = calendar_mirror.busy_intervals([calendar_id], days)
+            except Exception as e:
+                logger.error("Error getting busy times: %r", e)  # Treated as free, like async_calendar
+        for day in days:
+            slots = doctor_service.get_available_slots(
+                str(doctor_id), day, occupied[(str(doctor_id), day)], doctor=doctor,
+                calendar_busy=busy.get((calendar_id, day), []), user_id=user_id
+            )
+            if day == date:
+                slots = [s for s in slots if s > time]
+            if slots:
+                return day, slots[0]
+        return None
     
     def get_slots_for_doctor(self, doctor_id: str, date: str) -> List[Dict[str, Any]]:
-        """Get all appointments for a doctor on a specific date (Renamed)"""
+        """Get all active appointments for a doctor on a specific date"""
+        db_doctor_id = parse_doctor_id(doctor_id)
+        if db_doctor_id is None:
+            return []
+
         db: Session = SessionLocal()
         try:
-            # Helper to check if doctor_id matches (handling int/str mismatch if necessary)
-            # Assuming doctor_id in DB is distinct from the API ID if not strictly integer
-            # But based on api/doctors.py, doctor ID is Integer
-            
-            # If doctor_id comes as "dr_001", we might need to handle it.
-            # However, the existing logic passes "dr_001".
-            # The database.py Doctor model has 'id' as Integer. 
-            # We need to resolve this.
-            
             query_date = datetime.strptime(date, "%Y-%m-%d").date()
-            
-            appointments = db.query(Appointment).filter(
+            rows = db.query(Appointment.time, Appointment.status).filter(
+                Appointment.doctor_id == db_doctor_id,
                 Appointment.date == query_date,
                 Appointment.status != "Cancelled"
             ).all()
-            
-            # Filter in python if doctor_id format doesn't match DB directly
-            # Or better, fetch doctor by ID first?
-            
-            # For now, let's assume we filter by doctor_name or we fix the ID mapping later.
-            # But wait, app.py uses "dr_001" from config. 
-            # frontend/backend/database.py uses Integer IDs.
-            # We need a DoctorService that maps them or we just use IDs.
-            
-            # Let's filter by checking the doctor_id field
-            doctor_appointments = []
-            for apt in appointments:
-                # If we stored doctor_id as integer in create_appointment
-                if str(apt.doctor_id) == str(doctor_id):
-                   doctor_appointments.append({
-                       "date": str(apt.date),
-                       "time": apt.time,
-                       "status": apt.status.lower()
-                   })
-            
-            return doctor_appointments
+            return [{"date": date, "time": apt_time, "status": status.lower()} for apt_time, status in rows]
+        finally:
+            db.close()
+
+    def get_occupied_times(self, doctor_id: str, date: str) -> Set[str]:
+        """Time strings already taken for one doctor on one date.
+        Served entirely from ix_appointments_doctor_date_status_time."""
+        return self.get_occupied_times_bulk([(doctor_id, date)])[(doctor_id, date)]
+
+    def get_occupied_times_bulk(self, pairs: Iterable[Tuple[str, str]]) -> Dict[Tuple[str, str], Set[str]]:
+        """Occupied times for many (doctor_id, date) pairs in a single query"""
+        pairs = list(pairs)
+        result: Dict[Tuple[str, str], Set[str]] = {pair: set() for pair in pairs}
+
+        # Map the DB keys back to the caller's (doctor_id, date) strings
+        wanted: Dict[Tuple[int, Any], List[Tuple[str, str]]] = {}
+        for doctor_id, date in pairs:
+            db_doctor_id = parse_doctor_id(doctor_id)
+            if db_doctor_id is None:
+                continue
+            query_date = datetime.strptime(date, "%Y-%m-%d").date()
+            wanted.setdefault((db_doctor_id, query_date), []).append((doctor_id, date))
+
+        if not wanted:
+            return result
+
+        db: Session = SessionLocal()
+        try:
+            rows = db.query(Appointment.doctor_id, Appointment.date, Appointment.time).filter(
+                Appointment.doctor_id.in_({k[0] for k in wanted}),
+                Appointment.date.in_({k[1] for k in wanted}),
+                Appointment.status != "Cancelled"
+            ).all()
+
+            for db_doctor_id, apt_date, apt_time in rows:
+                for pair in wanted.get((db_doctor_id, apt_date), []):
+                    result[pair].add(apt_time)
+            return result
         finally:
             db.close()
 
@@ -166,7 +264,9 @@ class AppointmentManager:
                 "date": str(apt.date),
                 "time": apt.time,
                 "status": apt.status,
-                "userName": apt.patient_name
+                "userName": apt.patient_name,
+                "calendarEventId": apt.calendar_event_id,
+                "calendarSyncStatus": apt.calendar_sync_status
             } for apt in appointments]
         finally:
             db.close()
@@ -0,0 +1,105 @@
+"""
+Async facade over GoogleCalendarService for the webhook handlers.
+
+googleapiclient is blocking; called straight from a coroutine it stalls
+every other webhook on the event loop for the length of a Google round-trip.
+These wrappers run the calls on a bounded thread pool
+(CALENDAR_MAX_CONCURRENCY threads), give each call a timeout
+(CALENDAR_TIMEOUT_SECONDS) and fan out over several calendars concurrently.
+Each executor thread uses its own HTTP connection (see
+GoogleCalendarService.execute), since httplib2 is not thread-safe.
+
+On a timeout the awaiting coroutine gets asyncio.TimeoutError right away;
+the worker thread finishes on its own, bounded by the socket timeout.
+"""
+
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from structured_logging import get_logger
+from .config import config
+from .calendar_mirror import calendar_mirror
+from .google_calendar_service import google_calendar_service, FREEBUSY_MAX_CALENDARS
+
+logger = get_logger("whatsapp_bot.async_calendar")
+
+
+class AsyncGoogleCalendarService:
+    def __init__(self, calendar_service=google_calendar_service, mirror=calendar_mirror,
+                 max_workers: int = None, timeout: float = None):
+        self.calendar = calendar_service
+        self.mirror = mirror
+        self.timeout = timeout or config.CALENDAR_TIMEOUT_SECONDS
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers or config.CALENDAR_MAX_CONCURRENCY,
+            thread_name_prefix="gcal"
+        )
+
+    @property
+    def service(self):
+        return self.calendar.service
+
+    async def run(self, fn: Callable, *args, timeout: Optional[float] = None, **kwargs) -> Any:
+        """Run a blocking calendar call on the executor, with a timeout"""
+        loop = asyncio.get_running_loop()
+        future = loop.run_in_executor(self._executor, partial(fn, *args, **kwargs))
+        return await asyncio.wait_for(future, timeout=timeout or self.timeout)
+
+    async def fan_out(self, calls: Iterable[Tuple[Callable, tuple]], timeout: Optional[float] = None) -> List[Any]:
+        """Run several calls concurrently. Each result is the call's return value or its exception."""
+        return await asyncio.gather(
+            *(self.run(fn, *args, timeout=timeout) for fn, args in calls),
+            return_exceptions=True
+        )
+
+    # ==================== CALLS ====================
+
+    async def busy_intervals(self, calendar_ids: Iterable[str], dates: Iterable[str]) -> Dict[Tuple[str, str], List[Tuple[int, int]]]:
+        """calendar_mirror.busy_intervals off the loop. Treated as free on timeout or error."""
+        try:
+            return await self.run(self.mirror.busy_intervals, list(calendar_ids), list(dates))
+        except Exception as e:
+            logger.error("Error getting busy times: %r", e)
+            return {}
+
+    async def get_busy_intervals_concurrent(self, calendar_ids: Iterable[str], dates: List[str]) -> Dict[Tuple[str, str], List[Tuple[int, int]]]:
+        """Freebusy for many calendars: one call per FREEBUSY_MAX_CALENDARS, all in flight at once.
+        Calendars whose call failed or timed out are missing from the result."""
+        calendar_ids = sorted(set(calendar_ids))
+        chunks = [calendar_ids[i:i + FREEBUSY_MAX_CALENDARS] for i in range(0, len(calendar_ids), FREEBUSY_MAX_CALENDARS)]
+        results = await self.fan_out((self.calendar.get_busy_intervals_bulk, (chunk, dates)) for chunk in chunks)
+        merged = {}
+        for chunk, result in zip(chunks, results):
+            if isinstance(result, Exception):
+                logger.error("Error getting busy times for %s calendars: %r", len(chunk), result)
+                continue
+            merged.update(result)
+        return merged
+
+    async def available_slots(self, calendar_id: str, date: str, slots: List[str], duration_minutes: int = 30) -> List[str]:
+        try:
+            return await self.run(self.calendar.available_slots, calendar_id, date, slots, duration_minutes)
+        except asyncio.TimeoutError:
+            logger.warning("Timed out checking slots on %s", calendar_id)
+            return list(slots)  # Default to available, as on errors
+
+    async def delete_event_by_id(self, calendar_id: str, event_id: str) -> bool:
+        try:
+            return await self.run(self.calendar.delete_event_by_id, calendar_id, event_id)
+        except asyncio.TimeoutError:
+            logger.warning("Timed out deleting event %s", event_id)
+            return False
+
+    async def delete_event(self, calendar_id: str, date: str, start_time: str) -> bool:
+        try:
+            return await self.run(self.calendar.delete_event, calendar_id, date, start_time)
+        except asyncio.TimeoutError:
+            logger.warning("Timed out deleting event at %s %s", date, start_time)
+            return False
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+async_calendar_service = AsyncGoogleCalendarService()
@@ -0,0 +1,362 @@
+"""
+Local mirror of the doctors' Google Calendars.
+
+Slot lookups used to ask Google (freebusy) while the patient waited. The
+mirror keeps each doctor calendar's busy time in the calendar_busy_intervals
+table instead, so availability is an indexed local query:
+
+- the first sync lists every event and stores the returned syncToken;
+  later syncs fetch only what changed since that token (410 Gone -> full
+  resync)
+- with CALENDAR_WEBHOOK_URL set, an events.watch channel per calendar makes
+  Google POST to /api/calendar/notifications on every change, which queues
+  an incremental sync; channels are renewed before they expire
+- every CALENDAR_MIRROR_POLL_SECONDS all calendars are resynced anyway, so
+  a lost notification (or no webhook at all) only delays the mirror
+
+Calendars that have not completed a first sync fall back to the cached
+freebusy queries of GoogleCalendarService.
+"""
+
+import asyncio
+import math
+import secrets
+import threading
+import uuid
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+from time import monotonic
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from googleapiclient.errors import HttpError
+from sqlalchemy import func
+from sqlalchemy.exc import IntegrityError
+from starlette.concurrency import run_in_threadpool
+
+from clinic_clock import clinic_clock
+from database import SessionLocal, Doctor, CalendarBusyInterval, CalendarMirrorState
+from structured_logging import get_logger
+from .config import config
+from .google_calendar_service import google_calendar_service, merge_intervals, MINUTES_PER_DAY
+
+logger = get_logger("whatsapp_bot.calendar_mirror")
+
+# Renew a watch channel when it has less than this left
+CHANNEL_RENEW_BEFORE = timedelta(hours=12)
+# Intervals further ahead than this are not stored (bounds expanded recurring events)
+MIRROR_MAX_DAYS_AHEAD = 366
+
+
+class CalendarMirror:
+    def __init__(self, calendar_service=google_calendar_service):
+        self.calendar = calendar_service
+        self._dirty: Set[str] = set()
+        self._sync_locks: Dict[str, threading.Lock] = defaultdict(threading.Lock)
+        self._wake_event: Optional[asyncio.Event] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    @property
+    def enabled(self) -> bool:
+        return config.CALENDAR_MIRROR_ENABLED and self.calendar.service is not None
+
+    # ==================== BACKGROUND LOOP ====================
+
+    def notify(self, calendar_id: str):
+        """Queue an incremental sync of one calendar. Safe to call from any thread."""
+        self._dirty.add(calendar_id)
+        if self._loop and self._wake_event:
+            self._loop.call_soon_threadsafe(self._wake_event.set)
+
+    async def run(self):
+        """Background loop - started with the app"""
+        self._loop = asyncio.get_running_loop()
+        self._wake_event = asyncio.Event()
+        next_full_pass = 0.0
+        while True:
+            if self.enabled:
+                try:
+                    if monotonic() >= next_full_pass:
+                        await run_in_threadpool(self.refresh_all)
+                        next_full_pass = monotonic() + config.CALENDAR_MIRROR_POLL_SECONDS
+                    while self._dirty:
+                        await run_in_threadpool(self.sync_calendar, self._dirty.pop())
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    logger.exception("Error in calendar mirror")
+            timeout = max(1.0, next_full_pass - monotonic()) if self.enabled else config.CALENDAR_MIRROR_POLL_SECONDS
+            try:
+                await asyncio.wait_for(self._wake_event.wait(), timeout=timeout)
+            except asyncio.TimeoutError:
+                pass
+            self._wake_event.clear()
+
+    def refresh_all(self):
+        """Resync every doctor calendar, keep push channels alive and prune old intervals"""
+        for calendar_id in self.doctor_calendar_ids():
+            try:
+                self.sync_calendar(calendar_id)
+                if config.CALENDAR_WEBHOOK_URL:
+                    self.ensure_channel(calendar_id)
+            except Exception as e:
+                logger.exception("Error mirroring calendar %s", calendar_id)
+        self.prune()
+
+    def doctor_calendar_ids(self) -> List[str]:
+        db = SessionLocal()
+        try:
+            rows = db.query(Doctor.google_calendar_id).filter(Doctor.google_calendar_id.isnot(None)).distinct()
+            return [calendar_id for (calendar_id,) in rows if calendar_id]
+        finally:
+            db.close()
+
+    # ==================== SYNC ====================
+
+    def sync_calendar(self, calendar_id: str) -> int:
+        """Bring one calendar's mirror up to date. Returns the number of changed events."""
+        with self._sync_locks[calendar_id]:
+            db = SessionLocal()
+            try:
+                state = db.get(CalendarMirrorState, calendar_id)
+                if state is None:
+                    try:
+                        db.add(CalendarMirrorState(calendar_id=calendar_id))
+                        db.commit()
+                    except IntegrityError:
+                        db.rollback()  # Another worker created it first
+                    state = db.get(CalendarMirrorState, calendar_id)
+                previous_token = state.sync_token
+
+                try:
+                    events, next_token = self._list_changes(calendar_id, previous_token)
+                    full_sync = previous_token is None
+                except HttpError as e:
+                    if e.resp.status != 410:
+                        raise
+                    # Sync token expired or invalidated: start over
+                    events, next_token = self._list_changes(calendar_id, None)
+                    full_sync = True
+
+                if full_sync:
+                    db.query(CalendarBusyInterval).filter(
+                        CalendarBusyInterval.calendar_id == calendar_id
+                    ).delete(synchronize_session=False)
+
+                changed_ids = {event['id'] for event in events}
+                if changed_ids and not full_sync:
+                    db.query(CalendarBusyInterval).filter(
+                        CalendarBusyInterval.calendar_id == calendar_id,
+                        CalendarBusyInterval.event_id.in_(changed_ids)
+                    ).delete(synchronize_session=False)
+
+                rows = [
+                    {
+                        "calendar_id": calendar_id,
+                        "event_id": event['id'],
+                        "date": day,
+                        "start_minute": start,
+                        "end_minute": end
+                    }
+                    for event in events
+                    for day, start, end in self.event_intervals(event)
+                ]
+                if rows:
+                    db.execute(CalendarBusyInterval.__table__.insert(), rows)
+
+                # Compare-and-set on the token, so a concurrent sync in another worker can't be overwritten
+                token_filter = (CalendarMirrorState.sync_token == previous_token) if previous_token is not None \
+                    else CalendarMirrorState.sync_token.is_(None)
+                won = db.query(CalendarMirrorState).filter(
+                    CalendarMirrorState.calendar_id == calendar_id, token_filter
+                ).update({"sync_token": next_token, "last_synced_at": datetime.utcnow()}, synchronize_session=False)
+                if not won:
+                    db.rollback()
+                    return 0
+                db.commit()
+                return len(events)
+            except Exception:
+                db.rollback()
+                raise
+            finally:
+                db.close()
+
+    def _list_changes(self, calendar_id: str, sync_token: Optional[str]) -> Tuple[List[dict], Optional[str]]:
+        """Every event (no token) or every change since the token, across all pages"""
+        events = []
+        page_token = None
+        while True:
+            params = {"calendarId": calendar_id, "singleEvents": True, "maxResults": 2500}
+            if sync_token:
+                params["syncToken"] = sync_token
+            if page_token:
+                params["pageToken"] = page_token
+            response = self.calendar.execute(self.calendar.service.events().list(**params))
+            events.extend(response.get('items', []))
+            page_token = response.get('nextPageToken')
+            if not page_token:
+                return events, response.get('nextSyncToken')
+
+    def event_intervals(self, event: dict) -> List[Tuple[date, int, int]]:
+        """An event's busy time as (day, start_minute, end_minute) per clinic-local day"""
+        if event.get('status') == 'cancelled' or event.get('transparency') == 'transparent':
+            return []
+        tz = self.calendar.timezone
+        start, end = self._event_bound(event.get('start', {})), self._event_bound(event.get('end', {}))
+        if start is None or end is None or end <= start:
+            return []
+
+        today = clinic_clock.today()
+        first_day = max(start.date(), today - timedelta(days=config.CALENDAR_MIRROR_PAST_DAYS))
+        last_day = min((end - timedelta(microseconds=1)).date(), today + timedelta(days=MIRROR_MAX_DAYS_AHEAD))
+
+        intervals = []
+        day = first_day
+        while day <= last_day:
+            day_start = tz.localize(datetime.combine(day, datetime.min.time()))
+            start_minute = max(0, int((start - day_start).total_seconds() // 60))
+            end_minute = min(MINUTES_PER_DAY, math.ceil((end - day_start).total_seconds() / 60))
+            if start_minute < end_minute:
+                intervals.append((day, start_minute, end_minute))
+            day += timedelta(days=1)
+        return intervals
+
+    def _event_bound(self, bound: dict) -> Optional[datetime]:
+        tz = self.calendar.timezone
+        if bound.get('dateTime'):
+            return datetime.fromisoformat(bound['dateTime'].replace('Z', '+00:00')).astimezone(tz)
+        if bound.get('date'):
+            # All-day events: midnight in the clinic timezone
+            return tz.localize(datetime.strptime(bound['date'], "%Y-%m-%d"))
+        return None
+
+    def prune(self):
+        """Drop intervals for days that have passed"""
+        cutoff = clinic_clock.today() - timedelta(days=config.CALENDAR_MIRROR_PAST_DAYS)
+        db = SessionLocal()
+        try:
+            db.query(CalendarBusyInterval).filter(CalendarBusyInterval.date < cutoff).delete(synchronize_session=False)
+            db.commit()
+        finally:
+            db.close()
+
+    # ==================== PUSH CHANNELS ====================
+
+    def ensure_channel(self, calendar_id: str):
+        """Open (or renew) the events.watch channel for a calendar"""
+        db = SessionLocal()
+        try:
+            state = db.get(CalendarMirrorState, calendar_id)
+            now = datetime.utcnow()
+            if state is None:
+                return  # Not synced yet; the next pass opens the channel
+            if state.channel_expires_at and state.channel_expires_at - CHANNEL_RENEW_BEFORE > now:
+                return
+
+            channel_id = uuid.uuid4().hex
+            channel_token = secrets.token_urlsafe(24)
+            channel = self.calendar.execute(self.calendar.service.events().watch(calendarId=calendar_id, body={
+                "id": channel_id,
+                "type": "web_hook",
+                "address": config.CALENDAR_WEBHOOK_URL,
+                "token": channel_token,
+                "params": {"ttl": str(config.CALENDAR_WATCH_TTL_SECONDS)}
+            }))
+
+            old_channel = (state.channel_id, state.channel_resource_id)
+            state.channel_id = channel_id
+            state.channel_resource_id = channel.get('resourceId')
+            state.channel_token = channel_token
+            state.channel_expires_at = datetime.utcfromtimestamp(int(channel['expiration']) / 1000) \
+                if channel.get('expiration') else now + timedelta(seconds=config.CALENDAR_WATCH_TTL_SECONDS)
+            db.commit()
+            logger.info("Watching calendar %s until %s", calendar_id, state.channel_expires_at)
+        finally:
+            db.close()
+
+        if old_channel[0]:
+            try:
+                self.calendar.execute(self.calendar.service.channels().stop(body={"id": old_channel[0], "resourceId": old_channel[1]}))
+            except Exception as e:
+                logger.warning("Could not stop old channel for %s: %r", calendar_id, e)
+
+    def handle_notification(self, channel_id: str, channel_token: str, resource_state: str) -> bool:
+        """Validate a push notification and queue the sync. False if the channel is unknown."""
+        db = SessionLocal()
+        try:
+            state = db.query(CalendarMirrorState).filter(CalendarMirrorState.channel_id == channel_id).first()
+            if not state or not secrets.compare_digest(state.channel_token or "", channel_token or ""):
+                return False
+            calendar_id = state.calendar_id
+        finally:
+            db.close()
+        # "sync" is the handshake sent when the channel opens; "exists"/"not_exists" mean changes
+        if resource_state != "sync":
+            self.notify(calendar_id)
+        return True
+
+    # ==================== LOOKUPS ====================
+
+    def busy_intervals(self, calendar_ids: Iterable[str], dates: Iterable[str]) -> Dict[Tuple[str, str], List[Tuple[int, int]]]:
+        """
+        Busy minute intervals per (calendar_id, "YYYY-MM-DD"). Mirrored calendars
+        are answered from the local table in one query; the rest fall back to
+        (cached) freebusy.
+        """
+        calendar_ids = sorted({c for c in calendar_ids if c})
+        dates = sorted(set(dates))
+        result: Dict[Tuple[str, str], List[Tuple[int, int]]] = {}
+        if not calendar_ids or not dates or self.calendar.service is None:
+            return result
+
+        mirrored: Set[str] = set()
+        if config.CALENDAR_MIRROR_ENABLED:
+            db = SessionLocal()
+            try:
+                mirrored = {calendar_id for (calendar_id,) in db.query(CalendarMirrorState.calendar_id).filter(
+                    CalendarMirrorState.calendar_id.in_(calendar_ids),
+                    CalendarMirrorState.sync_token.isnot(None)
+                )}
+                if mirrored:
+                    rows = db.query(
+                        CalendarBusyInterval.calendar_id, CalendarBusyInterval.date,
+                        CalendarBusyInterval.start_minute, CalendarBusyInterval.end_minute
+                    ).filter(
+                        CalendarBusyInterval.calendar_id.in_(mirrored),
+                        CalendarBusyInterval.date.in_([datetime.strptime(d, "%Y-%m-%d").date() for d in dates])
+                    ).all()
+                    grouped = defaultdict(list)
+                    for calendar_id, day, start, end in rows:
+                        grouped[(calendar_id, day.strftime("%Y-%m-%d"))].append((start, end))
+                    for calendar_id in mirrored:
+                        for d in dates:
+                            result[(calendar_id, d)] = merge_intervals(grouped.get((calendar_id, d), []))
+            finally:
+                db.close()
+
+        remaining = [c for c in calendar_ids if c not in mirrored]
+        if remaining:
+            try:
+                result.update(self.calendar.get_busy_intervals_bulk(remaining, dates))
+            except Exception as e:
+                logger.error("Error getting busy times: %r", e)  # Treat as free, like before
+        return result
+
+    def status(self) -> List[dict]:
+        db = SessionLocal()
+        try:
+            counts = dict(db.query(CalendarBusyInterval.calendar_id, func.count(CalendarBusyInterval.id))
+                          .group_by(CalendarBusyInterval.calendar_id).all())
+            return [
+                {
+                    "calendarId": s.calendar_id,
+                    "synced": s.sync_token is not None,
+                    "lastSyncedAt": s.last_synced_at.isoformat() if s.last_synced_at else None,
+                    "channelExpiresAt": s.channel_expires_at.isoformat() if s.channel_expires_at else None,
+                    "busyIntervals": counts.get(s.calendar_id, 0)
+                }
+                for s in db.query(CalendarMirrorState).order_by(CalendarMirrorState.calendar_id)
+            ]
+        finally:
+            db.close()
+
+calendar_mirror = CalendarMirror()
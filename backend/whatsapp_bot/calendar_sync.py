@@ -0,0 +1,233 @@
+"""
+Background Google Calendar sync.
+
+Bookings no longer wait on Google: the booking transaction marks the
+appointment `calendar_sync_status = "pending"` (see `mark_pending`) and
+`CalendarSyncWorker` inserts the events afterwards, grouped per calendar
+into Calendar API batch requests. Failed inserts are retried with
+exponential backoff; after CALENDAR_SYNC_MAX_ATTEMPTS, or on an error
+retrying cannot fix, the appointment is marked "failed" and shows up in
+GET /api/appointments/calendar-sync until retried. The created event's id
+is stored in `calendar_event_id`, so cancellation deletes it directly.
+"""
+
+import asyncio
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+from googleapiclient.errors import HttpError
+from sqlalchemy import or_
+from starlette.concurrency import run_in_threadpool
+
+from database import SessionLocal, Appointment, Doctor
+from structured_logging import get_logger
+from .config import config
+from .google_calendar_service import google_calendar_service
+from .outbox import backoff_seconds
+
+logger = get_logger("whatsapp_bot.calendar_sync")
+
+PENDING = "pending"
+SYNCED = "synced"
+FAILED = "failed"
+
+# While a worker is inserting an event the row's next attempt is pushed out
+# by this much, so other workers skip it; if the worker dies it is retried.
+CLAIM_LEASE = timedelta(minutes=5)
+DEFAULT_CALENDAR_ID = "primary"
+
+
+def resolve_calendar_id(google_calendar_id: Optional[str]) -> str:
+    """Calendar an appointment's event lives in, from its doctor's google_calendar_id"""
+    return google_calendar_id or DEFAULT_CALENDAR_ID
+
+
+def mark_pending(appointment: Appointment):
+    """Queue an appointment for calendar sync. Call before committing the booking."""
+    appointment.calendar_sync_status = PENDING
+    appointment.calendar_sync_attempts = 0
+    appointment.calendar_sync_next_at = datetime.utcnow()
+    appointment.calendar_sync_error = None
+
+
+class CalendarSyncWorker:
+    def __init__(self, calendar_service=google_calendar_service):
+        self.calendar = calendar_service
+        self._wake_event: Optional[asyncio.Event] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def wake(self):
+        """Sync newly committed bookings now instead of at the next poll.
+        Safe to call from request threads."""
+        if self._loop and self._wake_event:
+            self._loop.call_soon_threadsafe(self._wake_event.set)
+
+    async def run(self):
+        """Background loop - started with the app"""
+        self._loop = asyncio.get_running_loop()
+        self._wake_event = asyncio.Event()
+        while True:
+            synced = 0
+            if self.calendar.service:
+                try:
+                    synced = await run_in_threadpool(self.sync_once)
+                except Exception as e:
+                    logger.exception("Error in calendar sync worker")
+            if synced:
+                continue
+            try:
+                await asyncio.wait_for(self._wake_event.wait(), timeout=config.CALENDAR_SYNC_POLL_INTERVAL_SECONDS)
+            except asyncio.TimeoutError:
+                pass
+            self._wake_event.clear()
+
+    def sync_once(self, limit: int = None) -> int:
+        """Claim due appointments and insert their events. Returns how many were attempted."""
+        limit = limit or config.CALENDAR_SYNC_BATCH_SIZE
+        appointment_ids = self._claim(limit)
+        if not appointment_ids:
+            return 0
+
+        # Build the events, then let go of the connection: no transaction stays
+        # open across the Google round-trips (the claim is already committed)
+        db = SessionLocal()
+        try:
+            appointments = db.query(Appointment).filter(Appointment.id.in_(appointment_ids)).all()
+            doctor_ids = {a.doctor_id for a in appointments if a.doctor_id}
+            calendars, durations = {}, {}
+            if doctor_ids:
+                for doctor_id, calendar_id, duration in db.query(
+                    Doctor.id, Doctor.google_calendar_id, Doctor.slot_duration_minutes
+                ).filter(Doctor.id.in_(doctor_ids)):
+                    calendars[doctor_id] = calendar_id
+                    durations[doctor_id] = duration
+
+            by_calendar: Dict[str, Dict[str, dict]] = defaultdict(dict)  # {calendar_id: {appointment id: event}}
+            for a in appointments:
+                by_calendar[resolve_calendar_id(calendars.get(a.doctor_id))][str(a.id)] = \
+                    self.calendar.build_appointment_event(
+                        a.patient_name, a.patient_phone, a.doctor_name,
+                        str(a.date), a.time, durations.get(a.doctor_id) or 30
+                    )
+        finally:
+            db.close()
+
+        results: Dict[int, Tuple[str, Optional[str], Optional[Exception]]] = {}  # {id: (calendar_id, event_id, error)}
+        for calendar_id, events in by_calendar.items():
+            keys = list(events)
+            for start in range(0, len(keys), self.calendar.BATCH_LIMIT):
+                chunk = {key: events[key] for key in keys[start:start + self.calendar.BATCH_LIMIT]}
+                for key, (event_id, error) in self._insert_chunk(calendar_id, chunk).items():
+                    results[int(key)] = (calendar_id, event_id, error)
+
+        # Record the outcomes in one short transaction
+        db = SessionLocal()
+        try:
+            for appointment in db.query(Appointment).filter(Appointment.id.in_(results)):
+                _, event_id, error = results[appointment.id]
+                if error is None:
+                    self._record_success(appointment, event_id)
+                else:
+                    self._record_failure(appointment, error)
+            db.commit()
+        finally:
+            db.close()
+
+        created = {apt_id: (calendar_id, event_id) for apt_id, (calendar_id, event_id, error) in results.items()
+                   if error is None and event_id}
+        self._remove_cancelled_while_syncing(created)
+        return len(appointments)
+
+    def _insert_chunk(self, calendar_id: str, events: Dict[str, dict]) -> Dict[str, Tuple[Optional[str], Optional[Exception]]]:
+        """Insert one batch of events: {key: (event_id, error)} for every key"""
+        try:
+            results = self.calendar.insert_events_batch(calendar_id, events)
+        except Exception as e:
+            # The whole batch request failed (network, auth)
+            results = {key: (None, e) for key in events}
+        return {key: results.get(key, (None, RuntimeError("No response in batch"))) for key in events}
+
+    def _record_success(self, appointment: Appointment, event_id: Optional[str]):
+        appointment.calendar_event_id = event_id
+        appointment.calendar_sync_status = SYNCED
+        appointment.calendar_sync_attempts += 1
+        appointment.calendar_sync_next_at = None
+        appointment.calendar_sync_error = None
+
+    def _record_failure(self, appointment: Appointment, error: Exception):
+        appointment.calendar_sync_attempts += 1
+        appointment.calendar_sync_error = str(error)[:1000]
+        if not _is_retryable(error) or appointment.calendar_sync_attempts >= config.CALENDAR_SYNC_MAX_ATTEMPTS:
+            appointment.calendar_sync_status = FAILED
+            appointment.calendar_sync_next_at = None
+            logger.error("Calendar sync failed for appointment %s: %s", appointment.id, appointment.calendar_sync_error)
+        else:
+            delay = backoff_seconds(
+                appointment.calendar_sync_attempts,
+                base=config.CALENDAR_SYNC_BACKOFF_BASE_SECONDS,
+                cap=config.CALENDAR_SYNC_BACKOFF_MAX_SECONDS
+            )
+            appointment.calendar_sync_next_at = datetime.utcnow() + timedelta(seconds=delay)
+
+    def _remove_cancelled_while_syncing(self, created: Dict[int, Tuple[str, str]]):
+        """An appointment cancelled while its insert was in flight had no event
+        to delete at the time; delete the one just created.
+        created: {appointment_id: (calendar_id, event_id)}"""
+        if not created:
+            return
+        db = SessionLocal()
+        try:
+            cancelled = db.query(Appointment).filter(
+                Appointment.id.in_(created),
+                Appointment.status == "Cancelled"
+            ).all()
+            for appointment in cancelled:
+                if self.calendar.delete_event_by_id(*created[appointment.id]):
+                    appointment.calendar_event_id = None
+            db.commit()
+        finally:
+            db.close()
+
+    def _claim(self, limit: int) -> List[int]:
+        """Lease up to `limit` due appointments to this worker"""
+        db = SessionLocal()
+        try:
+            now = datetime.utcnow()
+            due = db.query(Appointment.id, Appointment.calendar_sync_next_at).filter(
+                Appointment.calendar_sync_status == PENDING,
+                Appointment.calendar_sync_next_at <= now,
+                Appointment.status != "Cancelled"
+            ).order_by(Appointment.calendar_sync_next_at).limit(limit).all()
+
+            claimed = []
+            for appointment_id, next_at in due:
+                won = db.query(Appointment).filter(
+                    Appointment.id == appointment_id,
+                    Appointment.calendar_sync_status == PENDING,
+                    Appointment.calendar_sync_next_at == next_at
+                ).update({"calendar_sync_next_at": now + CLAIM_LEASE}, synchronize_session=False)
+                if won:
+                    claimed.append(appointment_id)
+            db.commit()
+            return claimed
+        finally:
+            db.close()
+
+
+def _is_retryable(error: Exception) -> bool:
+    if isinstance(error, HttpError):
+        status = error.resp.status
+        # 403 covers Calendar's usage-limit errors (rateLimitExceeded)
+        return status in (403, 408, 429) or status >= 500
+    return True  # Network errors
+
+
+def unsynced_query(db):
+    """Active appointments whose calendar event does not exist yet"""
+    return db.query(Appointment).filter(
+        or_(Appointment.calendar_sync_status == PENDING, Appointment.calendar_sync_status == FAILED),
+        Appointment.status != "Cancelled"
+    )
+
+calendar_sync_worker = CalendarSyncWorker()
@@ -1,24 +1,29 @@
-from .whatsapp_client import whatsapp_client
+from .whatsapp_client import async_whatsapp_client
 from .appointment_manager import appointment_manager
 from .google_calendar_service import google_calendar_service
+from .async_calendar import async_calendar_service
+from .calendar_sync import resolve_calendar_id
 from .doctor_service import doctor_service
 from datetime import datetime
+from starlette.concurrency import run_in_threadpool
+from clinic_clock import clinic_clock
 
 # whatsapp_client, etc are already instantiated in their modules, 
 # but imported names conflict with local variable names if not careful.
 # The original file instantiated them. Here we import the instances.
 
-def show_user_appointments(user_id: str):
+async def show_user_appointments(user_id: str):
     """Show user's upcoming appointments"""
-    appointments = appointment_manager.get_user_appointments(user_id)
+    appointments = await run_in_threadpool(appointment_manager.get_user_appointments, user_id)
     
     if not appointments:
-        whatsapp_client.send_message(user_id, "You don't have any appointments to cancel.")
+        await async_whatsapp_client.send_message(user_id, "You don't have any appointments to cancel.")
         return
     
     # Filter upcoming appointments only
-    today = datetime.now().strftime("%Y-%m-%d")
-    current_time = datetime.now().strftime("%H:%M")
+    now = clinic_clock.now()
+    today = now.strftime("%Y-%m-%d")
+    current_time = now.strftime("%H:%M")
     
     upcoming = []
     for apt in appointments:
@@ -30,7 +35,7 @@ def show_user_appointments(user_id: str):
             upcoming.append(apt)
     
     if not upcoming:
-        whatsapp_client.send_message(user_id, "You don't have any upcoming appointments to cancel.")
+        await async_whatsapp_client.send_message(user_id, "You don't have any upcoming appointments to cancel.")
         return
     
     # Create list of appointments
@@ -67,7 +72,7 @@ def show_user_appointments(user_id: str):
     
     sections = [{"title": "Your Appointments", "rows": rows}]
     
-    whatsapp_client.send_interactive_list(
+    await async_whatsapp_client.send_interactive_list(
         user_id,
         "Cancel Appointment",
         "Select an appointment to cancel:",
@@ -75,7 +80,7 @@ def show_user_appointments(user_id: str):
         sections
     )
 
-def cancel_appointment(user_id: str, appointment_id: str):
+async def cancel_appointment(user_id: str, appointment_id: str):
     """Cancel a specific appointment"""
     # The appointment_id comes as "cancel_apt_id" or "cancel_apt_id_index" from interactive list
     # logic in api/whatsapp.py splits by "_" and sends the second part as appointment_id
@@ -88,7 +93,7 @@ def cancel_appointment(user_id: str, appointment_id: str):
         pass 
         
     # Get appointment details
-    appointments = appointment_manager.get_user_appointments(user_id)
+    appointments = await run_in_threadpool(appointment_manager.get_user_appointments, user_id)
     appointment = None
     
     for apt in appointments:
@@ -97,7 +102,7 @@ def cancel_appointment(user_id: str, appointment_id: str):
             break
     
     if not appointment:
-        whatsapp_client.send_message(user_id, "Appointment not found.")
+        await async_whatsapp_client.send_message(user_id, "Appointment not found.")
         return
     
     # Get appointment details for deletion
@@ -107,21 +112,21 @@ def cancel_appointment(user_id: str, appointment_id: str):
     doctor_name = appointment.get('doctorName', 'Unknown Doctor')
     
     # Delete from Google Calendar
-    if doctor_id:
-        doctor = doctor_service.get_doctor_by_id(doctor_id)
-        if doctor and google_calendar_service.service:
-            calendar_id = doctor.get('google_calendar_id')
-            # working_days etc are in doctor dict
-            # We don't have event_id stored in DB yet (Task for later improvement).
-            # The original google_calendar_service.delete_event uses calendar_id, date, and time to find event.
-            if calendar_id:
-                google_calendar_service.delete_event(calendar_id, date, time)
+    if doctor_id and google_calendar_service.service:
+        doctor = await run_in_threadpool(doctor_service.get_doctor_by_id, doctor_id)
+        event_id = appointment.get('calendarEventId')
+        if doctor and event_id:
+            await async_calendar_service.delete_event_by_id(resolve_calendar_id(doctor.get('google_calendar_id')), event_id)
+        elif doctor and doctor.get('google_calendar_id') and appointment.get('calendarSyncStatus') is None:
+            # Booked before event ids were stored (see backfill_calendar_event_ids.py).
+            # A pending sync needs nothing: the worker skips cancelled appointments.
+            await async_calendar_service.delete_event(doctor['google_calendar_id'], date, time)
     
     # Delete from DB
-    success = appointment_manager.cancel_appointment(actual_apt_id)
+    success = await run_in_threadpool(appointment_manager.cancel_appointment, actual_apt_id)
     
     if success:
-        whatsapp_client.send_message(
+        await async_whatsapp_client.send_message(
             user_id,
             f"✅ Appointment cancelled successfully!\n\n"
             f"Doctor: {doctor_name}\n"
@@ -130,4 +135,4 @@ def cancel_appointment(user_id: str, appointment_id: str):
             f"You can book a new appointment anytime."
         )
     else:
-        whatsapp_client.send_message(user_id, "Failed to cancel appointment. Please try again.")
+        await async_whatsapp_client.send_message(user_id, "Failed to cancel appointment. Please try again.")
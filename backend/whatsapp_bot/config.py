@@ -10,7 +10,48 @@ class Config:
     WHATSAPP_ACCESS_TOKEN = os.getenv('WHATSAPP_ACCESS_TOKEN', '')
     WHATSAPP_PHONE_NUMBER_ID = os.getenv('WHATSAPP_PHONE_NUMBER_ID', '')
     WHATSAPP_VERIFY_TOKEN = os.getenv('WHATSAPP_VERIFY_TOKEN', 'my_verify_token_123')
-    WHATSAPP_API_URL = 'https://graph.facebook.com/v21.0'
+    WHATSAPP_API_URL = os.getenv('WHATSAPP_API_URL', 'https://graph.facebook.com/v21.0')
+    WHATSAPP_TIMEOUT_SECONDS = float(os.getenv('WHATSAPP_TIMEOUT_SECONDS', 10))
+    WHATSAPP_POOL_SIZE = int(os.getenv('WHATSAPP_POOL_SIZE', 20))  # Keep-alive connections
+    WHATSAPP_MAX_CONCURRENCY = int(os.getenv('WHATSAPP_MAX_CONCURRENCY', 20))  # In-flight async sends
+
+    # Inbound webhooks: deduplication (Meta redelivers until it gets a 200, for up to 7 days)
+    # and per-sender ordering
+    WEBHOOK_DEDUP_CACHE_SIZE = int(os.getenv('WEBHOOK_DEDUP_CACHE_SIZE', 50000))  # In-memory message ids per worker
+    WEBHOOK_DEDUP_RETENTION_HOURS = int(os.getenv('WEBHOOK_DEDUP_RETENTION_HOURS', 7 * 24))  # Rows kept in the table
+    WHATSAPP_USER_QUEUE_DEPTH = int(os.getenv('WHATSAPP_USER_QUEUE_DEPTH', 10))  # Messages queued per sender
+    # Slots shown to a patient are held for them this long (per worker, in memory)
+    SLOT_HOLD_TTL_SECONDS = float(os.getenv('SLOT_HOLD_TTL_SECONDS', 120))
+    SLOT_HOLD_SHARDS = int(os.getenv('SLOT_HOLD_SHARDS', 16))
+
+    # Outbound message queue (outbox)
+    # Meta's default Cloud API throughput is 80 messages/second per phone number;
+    # with several workers, divide the tier limit between them.
+    WHATSAPP_RATE_LIMIT_PER_SECOND = float(os.getenv('WHATSAPP_RATE_LIMIT_PER_SECOND', 80))
+    OUTBOX_MAX_ATTEMPTS = int(os.getenv('OUTBOX_MAX_ATTEMPTS', 8))
+    OUTBOX_BACKOFF_BASE_SECONDS = float(os.getenv('OUTBOX_BACKOFF_BASE_SECONDS', 2))
+    OUTBOX_BACKOFF_MAX_SECONDS = float(os.getenv('OUTBOX_BACKOFF_MAX_SECONDS', 600))
+    OUTBOX_POLL_INTERVAL_SECONDS = float(os.getenv('OUTBOX_POLL_INTERVAL_SECONDS', 1))
+    OUTBOX_BATCH_SIZE = int(os.getenv('OUTBOX_BATCH_SIZE', 50))
+    
+    # Google Calendar sync worker
+    CALENDAR_SYNC_BATCH_SIZE = int(os.getenv('CALENDAR_SYNC_BATCH_SIZE', 50))  # Events per batch request (max 50)
+    CALENDAR_SYNC_MAX_ATTEMPTS = int(os.getenv('CALENDAR_SYNC_MAX_ATTEMPTS', 8))
+    CALENDAR_SYNC_BACKOFF_BASE_SECONDS = float(os.getenv('CALENDAR_SYNC_BACKOFF_BASE_SECONDS', 5))
+    CALENDAR_SYNC_BACKOFF_MAX_SECONDS = float(os.getenv('CALENDAR_SYNC_BACKOFF_MAX_SECONDS', 1800))
+    CALENDAR_SYNC_POLL_INTERVAL_SECONDS = float(os.getenv('CALENDAR_SYNC_POLL_INTERVAL_SECONDS', 5))
+    CALENDAR_TIMEOUT_SECONDS = float(os.getenv('CALENDAR_TIMEOUT_SECONDS', 10))  # Per Google Calendar API call
+    CALENDAR_MAX_CONCURRENCY = int(os.getenv('CALENDAR_MAX_CONCURRENCY', 16))  # Executor threads for async calls
+    CALENDAR_FREEBUSY_TTL_SECONDS = float(os.getenv('CALENDAR_FREEBUSY_TTL_SECONDS', 60))  # Cached busy times per calendar-day
+
+    # Local mirror of doctors' calendars (push notifications + incremental sync)
+    CALENDAR_MIRROR_ENABLED = os.getenv('CALENDAR_MIRROR_ENABLED', 'true').lower() == 'true'
+    # Public HTTPS URL of /api/calendar/notifications; without it the mirror polls instead of watching
+    CALENDAR_WEBHOOK_URL = os.getenv('CALENDAR_WEBHOOK_URL', '')
+    CALENDAR_MIRROR_POLL_SECONDS = float(os.getenv('CALENDAR_MIRROR_POLL_SECONDS', 300))  # Safety-net resync
+    CALENDAR_WATCH_TTL_SECONDS = int(os.getenv('CALENDAR_WATCH_TTL_SECONDS', 7 * 24 * 3600))
+    CALENDAR_MIRROR_PAST_DAYS = int(os.getenv('CALENDAR_MIRROR_PAST_DAYS', 1))  # Older intervals are pruned
+    GOOGLE_CALENDAR_API_URL = os.getenv('GOOGLE_CALENDAR_API_URL', '')  # Override for a local stand-in
     
     # Groq Configuration
     GROQ_API_KEY = os.getenv('GROQ_API_KEY', '')
@@ -18,4 +59,12 @@ class Config:
     # App Configuration
     TIMEZONE = os.getenv('TIMEZONE', 'Asia/Kolkata')
 
+    # Conversation Sessions
+    # memory: per-process (single worker) | sql: shared via the database | file: shared directory
+    SESSION_STORE = os.getenv('SESSION_STORE', 'memory')
+    SESSION_TTL_SECONDS = int(os.getenv('SESSION_TTL_SECONDS', 3600))  # Idle timeout
+    SESSION_MAX_SIZE = int(os.getenv('SESSION_MAX_SIZE', 10000))  # memory store only
+    SESSION_SWEEP_INTERVAL_SECONDS = int(os.getenv('SESSION_SWEEP_INTERVAL_SECONDS', 60))
+    SESSION_FILE_DIR = os.getenv('SESSION_FILE_DIR', os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'sessions'))
+
 config = Config()
@@ -1,8 +1,22 @@
 from sqlalchemy.orm import Session
 from database import SessionLocal, Doctor
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Iterable, NamedTuple, Tuple
+from clinic_clock import clinic_clock
+from .calendar_mirror import calendar_mirror
+from .google_calendar_service import free_slots
+from .slot_holds import slot_holds
+
+class SlotTemplate(NamedTuple):
+    """A doctor's daily slot grid"""
+    minutes: Tuple[int, ...]     # slot starts as minute-of-day, ascending
+    labels: Tuple[str, ...]      # the same slots as "HH:MM"
+    minute_of: Dict[str, int]    # "HH:MM" -> minute-of-day
 
 class DoctorService:
+    def __init__(self):
+        # (doctor_id, working_hours_start, working_hours_end, slot_duration_minutes) -> SlotTemplate
+        self._slot_templates: Dict[Tuple[str, str, str, int], SlotTemplate] = {}
+
     def get_all_doctors(self) -> List[Dict[str, Any]]:
         """Get all doctors from DB formatted for WhatsApp Bot"""
         db: Session = SessionLocal()
@@ -48,44 +62,81 @@ class DoctorService:
         finally:
             db.close()
 
-    def get_available_slots(self, doctor_id: str, date: str, booked_appointments: List = None) -> List[str]:
-        """Calculate available slots for a doctor"""
-        doctor = self.get_doctor_by_id(doctor_id)
+    def get_slot_template(self, doctor: Dict[str, Any]) -> SlotTemplate:
+        """Slot grid for a doctor's working hours, built once and cached"""
+        key = (
+            doctor["id"],
+            doctor["working_hours"]["start"],
+            doctor["working_hours"]["end"],
+            doctor["slot_duration_minutes"]
+        )
+        template = self._slot_templates.get(key)
+        if template is None:
+            template = self._build_slot_template(*key[1:])
+            self._slot_templates[key] = template
+        return template
+
+    def invalidate_slot_templates(self, doctor_id=None):
+        """Drop cached slot grids for one doctor (or all doctors)"""
+        if doctor_id is None:
+            self._slot_templates.clear()
+            return
+        for key in [k for k in self._slot_templates if k[0] == str(doctor_id)]:
+            self._slot_templates.pop(key, None)
+
+    def get_available_slots(self, doctor_id: str, date: str, booked_times: Iterable[str] = None,
+                            doctor: Optional[Dict[str, Any]] = None,
+                            calendar_busy: Optional[List[Tuple[int, int]]] = None,
+                            user_id: Optional[str] = None) -> List[str]:
+        """Calculate available slots for a doctor, given the already occupied times.
+        Pass `doctor` when the caller already has it to skip the DB lookup.
+        Slots overlapping the doctor's Google Calendar busy time are left out;
+        callers working over many days pass `calendar_busy` (minute intervals
+        from calendar_mirror.busy_intervals) to avoid a lookup per day.
+        Slots held for other patients (slot_holds) are left out too; `user_id`
+        keeps the caller's own holds in the list."""
+        if doctor is None:
+            doctor = self.get_doctor_by_id(doctor_id)
         if not doctor:
             return []
-            
-        start_time = doctor["working_hours"]["start"]
-        end_time = doctor["working_hours"]["end"]
-        slot_duration = doctor["slot_duration_minutes"]
-        
-        # Generate all slots
-        time_slots = []
-        from datetime import datetime, timedelta
-        
-        current = datetime.strptime(start_time, "%H:%M")
-        end = datetime.strptime(end_time, "%H:%M")
-        
-        while current < end:
-            time_slots.append(current.strftime("%H:%M"))
-            current += timedelta(minutes=slot_duration)
-            
-        # Filter booked slots
-        if booked_appointments:
-            booked_times = {apt['time'] for apt in booked_appointments}
-            time_slots = [t for t in time_slots if t not in booked_times]
-            
+
+        template = self.get_slot_template(doctor)
+
+        # Booked and held minutes via the template's label index - no time parsing
+        taken = set()
+        held = slot_holds.held_by_others(doctor["id"], date, user_id)
+        if booked_times or held:
+            minute_of = template.minute_of
+            taken = {minute_of[t] for t in (booked_times or ()) if t in minute_of}
+            taken.update(minute_of[t] for t in held if t in minute_of)
+
         # Filter past slots if date is today
-        import pytz
-        from .config import config
-        tz = pytz.timezone(config.TIMEZONE)
-        today = datetime.now(tz).date()
-        date_obj = datetime.strptime(date, "%Y-%m-%d").date()
-        
-        if date_obj == today:
-            current_time = datetime.now(tz).strftime("%H:%M")
-            time_slots = [t for t in time_slots if t > current_time]
-            
-        return time_slots
+        now = clinic_clock.now()
+        cutoff = now.hour * 60 + now.minute if date == now.strftime("%Y-%m-%d") else -1
+
+        labels = template.labels
+        slots = [
+            labels[i] for i, minute in enumerate(template.minutes)
+            if minute > cutoff and minute not in taken
+        ]
+
+        calendar_id = doctor.get("google_calendar_id")
+        if calendar_busy is None and calendar_id and slots:
+            calendar_busy = calendar_mirror.busy_intervals([calendar_id], [date]).get((calendar_id, date))
+        if calendar_busy:
+            slots = free_slots(slots, calendar_busy, doctor["slot_duration_minutes"])
+        return slots
+
+    @staticmethod
+    def _build_slot_template(start_time: str, end_time: str, slot_duration: int) -> SlotTemplate:
+        """Expand working hours into minute-of-day slot starts"""
+        start_h, start_m = map(int, start_time.split(":"))
+        end_h, end_m = map(int, end_time.split(":"))
+        step = max(int(slot_duration or 30), 1)
+
+        minutes = tuple(range(start_h * 60 + start_m, end_h * 60 + end_m, step))
+        labels = tuple(f"{m // 60:02d}:{m % 60:02d}" for m in minutes)
+        return SlotTemplate(minutes, labels, dict(zip(labels, minutes)))
 
     def _format_doctor(self, doctor_db: Doctor) -> Dict[str, Any]:
         """Format DB model to dictionary expected by Bot"""
@@ -1,18 +1,66 @@
 from google.oauth2 import service_account
 from googleapiclient.discovery import build
+from googleapiclient.errors import HttpError
+import google_auth_httplib2
+import httplib2
 from datetime import datetime, timedelta
 import os
-from typing import List, Dict, Optional
+import threading
+from time import monotonic
+from typing import List, Dict, Optional, Tuple
 import pytz
 from .config import config
+from structured_logging import get_logger
+
+logger = get_logger("whatsapp_bot.google_calendar_service")
 
 # Path to your service account credentials JSON file
 CREDENTIALS_FILE = 'credentials.json'
 
+MINUTES_PER_DAY = 24 * 60
+FREEBUSY_CACHE_MAX_ENTRIES = 4096  # Expired entries are dropped once this many are cached
+FREEBUSY_MAX_CALENDARS = 50  # Calendars per freebusy query (calendarExpansionMax)
+
+def merge_intervals(intervals) -> List[Tuple[int, int]]:
+    """Sort (start, end) intervals and merge the overlapping or touching ones"""
+    merged = []
+    for start_minute, end_minute in sorted(intervals):
+        if merged and start_minute <= merged[-1][1]:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end_minute))
+        else:
+            merged.append((start_minute, end_minute))
+    return merged
+
+def free_slots(slots: List[str], busy: List[Tuple[int, int]], duration_minutes: int = 30) -> List[str]:
+    """
+    The slots ("HH:MM") that overlap none of the sorted, merged busy minute
+    intervals, in their original order. One sweep over both sorted lists.
+    """
+    free = set()
+    i = 0
+    for slot_start, slot in sorted((int(s[:2]) * 60 + int(s[3:5]), s) for s in slots):
+        slot_end = slot_start + duration_minutes
+        # Busy intervals ending before this slot can't overlap any later slot either
+        while i < len(busy) and busy[i][1] <= slot_start:
+            i += 1
+        if i == len(busy) or busy[i][0] >= slot_end:
+            free.add(slot)
+    return [s for s in slots if s in free]
+
+def _minutes_to_time(minutes: int) -> str:
+    return f"{minutes // 60:02d}:{minutes % 60:02d}" if minutes < MINUTES_PER_DAY else "24:00"
+
 class GoogleCalendarService:
+    BATCH_LIMIT = 50  # Calendar API maximum calls per batch request
+    
     def __init__(self):
         self.service = None
         self.timezone = pytz.timezone(config.TIMEZONE)
+        # (calendar_id, date) -> (expires_at monotonic, busy minute intervals)
+        self._busy_cache: Dict[Tuple[str, str], Tuple[float, List[Tuple[int, int]]]] = {}
+        self._busy_lock = threading.Lock()
+        self.credentials = None
+        self._thread_local = threading.local()
         self.initialize_service()
     
     def initialize_service(self):
@@ -20,6 +68,15 @@ class GoogleCalendarService:
         try:
             credentials = None
             
+            # Local stand-in for the Calendar API (benchmarks/fake_calendar_api.py), no auth
+            if config.GOOGLE_CALENDAR_API_URL:
+                self.service = build(
+                    'calendar', 'v3', http=httplib2.Http(timeout=config.CALENDAR_TIMEOUT_SECONDS), static_discovery=True,
+                    client_options={"api_endpoint": config.GOOGLE_CALENDAR_API_URL}
+                )
+                logger.info("Google Calendar service using %s", config.GOOGLE_CALENDAR_API_URL)
+                return
+            
             # Try to load from environment variable first (for cloud deployment)
             google_creds_json = os.environ.get('GOOGLE_CREDENTIALS')
             if google_creds_json:
@@ -29,7 +86,7 @@ class GoogleCalendarService:
                     creds_dict,
                     scopes=['https://www.googleapis.com/auth/calendar']
                 )
-                print("Google Calendar credentials loaded from environment variable")
+                logger.info("Google Calendar credentials loaded from environment variable")
             
             # Fall back to credentials.json file (for local development)
             elif os.path.exists(CREDENTIALS_FILE):
@@ -37,149 +94,245 @@ class GoogleCalendarService:
                     CREDENTIALS_FILE,
                     scopes=['https://www.googleapis.com/auth/calendar']
                 )
-                print("Google Calendar credentials loaded from file")
+                logger.info("Google Calendar credentials loaded from file")
             
             else:
-                print(f"WARNING: {CREDENTIALS_FILE} not found. Google Calendar integration disabled.")
-                print("To enable Google Calendar:")
-                print("1. Go to https://console.cloud.google.com/")
-                print("2. Create a project and enable Google Calendar API")
-                print("3. Create a service account")
-                print("4. Download credentials.json and place it in the project root")
-                print("   OR set GOOGLE_CREDENTIALS environment variable with the JSON content")
+                logger.warning(
+                    "%s not found and GOOGLE_CREDENTIALS is not set. Google Calendar integration disabled. "
+                    "To enable it, create a service account with the Google Calendar API enabled "
+                    "(https://console.cloud.google.com/) and put its credentials.json in the project root "
+                    "or its JSON content in GOOGLE_CREDENTIALS.", CREDENTIALS_FILE
+                )
                 return
             
+            self.credentials = credentials
             self.service = build('calendar', 'v3', credentials=credentials)
-            print("Google Calendar service initialized successfully")
+            logger.info("Google Calendar service initialized")
             
         except Exception as e:
-            print(f"Error initializing Google Calendar service: {e}")
+            logger.exception("Error initializing Google Calendar service")
             self.service = None
     
+    def _http(self):
+        """This thread's HTTP connection. httplib2.Http is not thread-safe, so requests
+        from the async facade's executor threads must not share the service's own."""
+        http = getattr(self._thread_local, 'http', None)
+        if http is None:
+            http = httplib2.Http(timeout=config.CALENDAR_TIMEOUT_SECONDS)
+            if self.credentials is not None:
+                http = google_auth_httplib2.AuthorizedHttp(self.credentials, http=http)
+            self._thread_local.http = http
+        return http
+    
+    def execute(self, request):
+        """Execute an API request (or batch) on this thread's HTTP connection"""
+        return request.execute(http=self._http())
+    
+    # ==================== FREEBUSY (cached) ====================
+    
+    def _day_bounds(self, date: str) -> Tuple[datetime, datetime]:
+        """Start and end of a clinic-local day"""
+        date_obj = datetime.strptime(date, "%Y-%m-%d")
+        time_min = self.timezone.localize(datetime.combine(date_obj, datetime.min.time()))
+        return time_min, time_min + timedelta(days=1)
+    
+    def _to_day_minutes(self, busy_periods: List[Dict], day_start: datetime) -> List[Tuple[int, int]]:
+        """Freebusy periods -> sorted, merged (start, end) minute-of-day intervals clipped to the day"""
+        intervals = []
+        for busy_period in busy_periods:
+            start = datetime.fromisoformat(busy_period['start'].replace('Z', '+00:00'))
+            end = datetime.fromisoformat(busy_period['end'].replace('Z', '+00:00'))
+            start_minute = max(0, int((start - day_start).total_seconds() // 60))
+            end_minute = min(MINUTES_PER_DAY, int(-(-(end - day_start).total_seconds() // 60)))
+            if start_minute < end_minute:
+                intervals.append((start_minute, end_minute))
+        
+        return merge_intervals(intervals)
+    
+    def get_busy_intervals(self, calendar_id: str, date: str) -> List[Tuple[int, int]]:
+        """
+        Busy (start, end) minute-of-day intervals for one calendar-day, sorted and merged.
+        Served from a cache for CALENDAR_FREEBUSY_TTL_SECONDS; our own inserts and
+        deletes invalidate it. Raises on API errors.
+        """
+        return self.get_busy_intervals_bulk([calendar_id], [date])[(calendar_id, date)]
+    
+    def get_busy_intervals_bulk(self, calendar_ids: List[str], dates: List[str]) -> Dict[Tuple[str, str], List[Tuple[int, int]]]:
+        """
+        Busy intervals for every (calendar_id, date) combination. Cache misses are
+        fetched with one freebusy query per FREEBUSY_MAX_CALENDARS calendars,
+        spanning all the requested dates. Raises on API errors.
+        """
+        now = monotonic()
+        result = {}
+        missing_calendars = set()
+        with self._busy_lock:
+            for calendar_id in calendar_ids:
+                for date in dates:
+                    cached = self._busy_cache.get((calendar_id, date))
+                    if cached and cached[0] > now:
+                        result[(calendar_id, date)] = cached[1]
+                    else:
+                        missing_calendars.add(calendar_id)
+        if not missing_calendars:
+            return result
+        
+        day_starts = {date: self._day_bounds(date)[0] for date in dates}
+        time_min = min(day_starts.values())
+        time_max = max(day_starts.values()) + timedelta(days=1)
+        missing = sorted(missing_calendars)
+        fetched = {}
+        for start in range(0, len(missing), FREEBUSY_MAX_CALENDARS):
+            chunk = missing[start:start + FREEBUSY_MAX_CALENDARS]
+            body = {
+                "timeMin": time_min.isoformat(),
+                "timeMax": time_max.isoformat(),
+                "timeZone": str(self.timezone),
+                "items": [{"id": calendar_id} for calendar_id in chunk]
+            }
+            freebusy_result = self.execute(self.service.freebusy().query(body=body))
+            calendars = freebusy_result.get('calendars', {})
+            for calendar_id in chunk:
+                calendar = calendars.get(calendar_id, {})
+                if calendar.get('errors'):
+                    # e.g. notFound - treat as free, but don't cache it
+                    logger.warning("Freebusy error for %s: %s", calendar_id, calendar['errors'])
+                    for date in dates:
+                        result[(calendar_id, date)] = []
+                    continue
+                for date, day_start in day_starts.items():
+                    fetched[(calendar_id, date)] = self._to_day_minutes(calendar.get('busy', []), day_start)
+        
+        result.update(fetched)
+        with self._busy_lock:
+            if len(self._busy_cache) + len(fetched) > FREEBUSY_CACHE_MAX_ENTRIES:
+                self._busy_cache = {k: v for k, v in self._busy_cache.items() if v[0] > now}
+            expires_at = now + config.CALENDAR_FREEBUSY_TTL_SECONDS
+            for key, intervals in fetched.items():
+                self._busy_cache[key] = (expires_at, intervals)
+        return result
+    
+    def invalidate_busy_cache(self, calendar_id: str, date: Optional[str] = None):
+        """Drop cached freebusy for one calendar-day, or every day of a calendar"""
+        with self._busy_lock:
+            if date is not None:
+                self._busy_cache.pop((calendar_id, date), None)
+            else:
+                for key in [k for k in self._busy_cache if k[0] == calendar_id]:
+                    del self._busy_cache[key]
+    
     def get_busy_times(self, calendar_id: str, date: str) -> List[Dict]:
         """Get busy time slots for a calendar on a specific date"""
         if not self.service:
             return []
         
         try:
-            # Parse date and create time range for the day
-            date_obj = datetime.strptime(date, "%Y-%m-%d")
-            time_min = self.timezone.localize(datetime.combine(date_obj, datetime.min.time()))
-            time_max = time_min + timedelta(days=1)
-            
-            # Query freebusy
-            body = {
-                "timeMin": time_min.isoformat(),
-                "timeMax": time_max.isoformat(),
-                "items": [{"id": calendar_id}]
-            }
-            
-            freebusy_result = self.service.freebusy().query(body=body).execute()
-            
-            busy_times = []
-            calendar_busy = freebusy_result.get('calendars', {}).get(calendar_id, {}).get('busy', [])
-            
-            for busy_period in calendar_busy:
-                start = datetime.fromisoformat(busy_period['start'].replace('Z', '+00:00'))
-                end = datetime.fromisoformat(busy_period['end'].replace('Z', '+00:00'))
-                
-                # Convert to local timezone
-                start_local = start.astimezone(self.timezone)
-                end_local = end.astimezone(self.timezone)
-                
-                busy_times.append({
-                    'start': start_local.strftime("%H:%M"),
-                    'end': end_local.strftime("%H:%M")
-                })
-            
-            return busy_times
-            
+            return [
+                {'start': _minutes_to_time(start), 'end': _minutes_to_time(end)}
+                for start, end in self.get_busy_intervals(calendar_id, date)
+            ]
         except Exception as e:
-            print(f"Error getting busy times: {e}")
+            logger.error("Error getting busy times: %r", e)
             return []
     
-    def is_slot_available(self, calendar_id: str, date: str, time: str, duration_minutes: int = 30) -> bool:
-        """Check if a specific time slot is available"""
-        if not self.service:
-            # If calendar service not available, assume slot is available
-            return True
+    def available_slots(self, calendar_id: str, date: str, slots: List[str], duration_minutes: int = 30) -> List[str]:
+        """
+        The slots ("HH:MM") that do not overlap a busy period, in their original order.
+        One (cached) freebusy lookup and a single sweep over the sorted slots and
+        busy intervals, instead of a freebusy query per slot.
+        """
+        if not self.service or not slots:
+            # If calendar service not available, assume slots are available
+            return list(slots)
         
         try:
-            # Create datetime for the slot
-            date_obj = datetime.strptime(f"{date} {time}", "%Y-%m-%d %H:%M")
-            slot_start = self.timezone.localize(date_obj)
-            slot_end = slot_start + timedelta(minutes=duration_minutes)
-            
-            # Get busy times
-            busy_times = self.get_busy_times(calendar_id, date)
-            
-            # Check if slot overlaps with any busy period
-            for busy in busy_times:
-                busy_start = datetime.strptime(f"{date} {busy['start']}", "%Y-%m-%d %H:%M")
-                busy_end = datetime.strptime(f"{date} {busy['end']}", "%Y-%m-%d %H:%M")
-                busy_start = self.timezone.localize(busy_start)
-                busy_end = self.timezone.localize(busy_end)
-                
-                # Check for overlap
-                if slot_start < busy_end and slot_end > busy_start:
-                    return False
-            
-            return True
-            
+            busy = self.get_busy_intervals(calendar_id, date)
         except Exception as e:
-            print(f"Error checking slot availability: {e}")
-            return True  # Default to available if error
+            logger.error("Error checking slot availability: %r", e)
+            return list(slots)  # Default to available if error
+        
+        return free_slots(slots, busy, duration_minutes)
+    
+    def is_slot_available(self, calendar_id: str, date: str, time: str, duration_minutes: int = 30) -> bool:
+        """Check if a specific time slot is available"""
+        return bool(self.available_slots(calendar_id, date, [time], duration_minutes))
     
     def create_appointment(self, calendar_id: str, patient_name: str, patient_phone: str,
                           doctor_name: str, date: str, time: str, duration_minutes: int = 30) -> Optional[str]:
         """Create a calendar event for an appointment"""
         if not self.service:
-            print("Calendar service not available. Appointment not added to calendar.")
+            logger.warning("Calendar service not available. Appointment not added to calendar.")
             return None
         
         try:
-            # Create datetime for the appointment
-            date_obj = datetime.strptime(f"{date} {time}", "%Y-%m-%d %H:%M")
-            start_time = self.timezone.localize(date_obj)
-            end_time = start_time + timedelta(minutes=duration_minutes)
+            event = self.build_appointment_event(patient_name, patient_phone, doctor_name, date, time, duration_minutes)
+            created_event = self.execute(self.service.events().insert(calendarId=calendar_id, body=event))
+            self.invalidate_busy_cache(calendar_id, date)
             
-            event = {
-                'summary': f"Appointment: {patient_name}",
-                'description': f"Patient: {patient_name}\nPhone: {patient_phone}\nDoctor: {doctor_name}",
-                'start': {
-                    'dateTime': start_time.isoformat(),
-                    'timeZone': str(self.timezone),
-                },
-                'end': {
-                    'dateTime': end_time.isoformat(),
-                    'timeZone': str(self.timezone),
-                },
-                'attendees': [
-                    # Add patient email if available
-                    # {'email': patient_email}
-                ],
-                'reminders': {
-                    'useDefault': False,
-                    'overrides': [
-                        {'method': 'popup', 'minutes': 60},
-                        {'method': 'popup', 'minutes': 10},
-                    ],
-                },
-            }
-            
-            created_event = self.service.events().insert(calendarId=calendar_id, body=event).execute()
-            
-            print(f"Calendar event created: {created_event.get('htmlLink')}")
+            logger.debug("Calendar event created", extra={"event_id": created_event.get('id')})
             return created_event.get('id')
             
         except Exception as e:
-            print(f"Error creating calendar event: {e}")
+            logger.error("Error creating calendar event: %r", e)
             return None
     
+    def build_appointment_event(self, patient_name: str, patient_phone: str, doctor_name: str,
+                                date: str, time: str, duration_minutes: int = 30) -> dict:
+        """Calendar event body for an appointment"""
+        date_obj = datetime.strptime(f"{date} {time}", "%Y-%m-%d %H:%M")
+        start_time = self.timezone.localize(date_obj)
+        end_time = start_time + timedelta(minutes=duration_minutes)
+        
+        return {
+            'summary': f"Appointment: {patient_name}",
+            'description': f"Patient: {patient_name}\nPhone: {patient_phone}\nDoctor: {doctor_name}",
+            'start': {
+                'dateTime': start_time.isoformat(),
+                'timeZone': str(self.timezone),
+            },
+            'end': {
+                'dateTime': end_time.isoformat(),
+                'timeZone': str(self.timezone),
+            },
+            'attendees': [
+                # Add patient email if available
+                # {'email': patient_email}
+            ],
+            'reminders': {
+                'useDefault': False,
+                'overrides': [
+                    {'method': 'popup', 'minutes': 60},
+                    {'method': 'popup', 'minutes': 10},
+                ],
+            },
+        }
+    
+    def insert_events_batch(self, calendar_id: str, events: Dict[str, dict]) -> Dict[str, Tuple[Optional[str], Optional[Exception]]]:
+        """
+        Insert several events into one calendar with a single batch HTTP request.
+        
+        events: {key: event body}, at most BATCH_LIMIT entries
+        Returns {key: (event_id, None)} on success or {key: (None, error)} per failed insert
+        """
+        results = {}
+        
+        def on_response(request_id, response, exception):
+            results[request_id] = (None, exception) if exception else (response.get('id'), None)
+        
+        batch = self.service.new_batch_http_request(callback=on_response)
+        for key, event in events.items():
+            batch.add(self.service.events().insert(calendarId=calendar_id, body=event), request_id=key)
+        try:
+            self.execute(batch)
+        finally:
+            for event in events.values():
+                self.invalidate_busy_cache(calendar_id, event['start']['dateTime'][:10])
+        return results
+    
     def create_event(self, calendar_id: str, summary: str, description: str, start_time: str, end_time: str, date: str) -> dict:
         """Create a calendar event"""
         if not self.service:
-            print("Google Calendar service not initialized")
+            logger.warning("Google Calendar service not initialized")
             return None
         
         try:
@@ -203,49 +356,90 @@ class GoogleCalendarService:
                 },
             }
             
-            created_event = self.service.events().insert(calendarId=calendar_id, body=event).execute()
-            print(f"Event created: {created_event.get('htmlLink')}")
+            created_event = self.execute(self.service.events().insert(calendarId=calendar_id, body=event))
+            self.invalidate_busy_cache(calendar_id, date)
+            logger.debug("Event created", extra={"event_id": created_event.get('id')})
             return created_event
             
         except Exception as e:
-            print(f"Error creating event: {e}")
+            logger.error("Error creating event: %r", e)
+            return None
+    
+    def list_day_events(self, calendar_id: str, date: str) -> List[dict]:
+        """All events on a calendar for one day in the clinic timezone"""
+        date_obj = datetime.strptime(date, "%Y-%m-%d")
+        time_min = self.timezone.localize(datetime.combine(date_obj, datetime.min.time()))
+        time_max = time_min + timedelta(days=1)
+        
+        events = []
+        page_token = None
+        while True:
+            events_result = self.execute(self.service.events().list(
+                calendarId=calendar_id,
+                timeMin=time_min.isoformat(),
+                timeMax=time_max.isoformat(),
+                singleEvents=True,
+                orderBy='startTime',
+                pageToken=page_token
+            ))
+            events.extend(events_result.get('items', []))
+            page_token = events_result.get('nextPageToken')
+            if not page_token:
+                return events
+    
+    def local_start_time(self, event: dict) -> Optional[str]:
+        """An event's start as HH:MM in the clinic timezone (None for all-day events)"""
+        start = event.get('start', {}).get('dateTime')
+        if not start:
             return None
+        return datetime.fromisoformat(start.replace('Z', '+00:00')).astimezone(self.timezone).strftime("%H:%M")
+    
+    def delete_event_by_id(self, calendar_id: str, event_id: str) -> bool:
+        """Delete a calendar event by its id. An event that is already gone counts as deleted."""
+        if not self.service:
+            logger.warning("Google Calendar service not initialized")
+            return False
+        
+        try:
+            self.execute(self.service.events().delete(calendarId=calendar_id, eventId=event_id))
+            # The event's date isn't known here
+            self.invalidate_busy_cache(calendar_id)
+            logger.debug("Event deleted", extra={"event_id": event_id})
+            return True
+        except HttpError as e:
+            if e.resp.status in (404, 410):
+                return True
+            logger.error("Error deleting event %s: %r", event_id, e)
+            return False
+        except Exception as e:
+            logger.error("Error deleting event %s: %r", event_id, e)
+            return False
     
     def delete_event(self, calendar_id: str, date: str, start_time: str) -> bool:
-        """Delete a calendar event by finding it with date and time"""
+        """
+        Delete a calendar event by finding it with date and time.
+        Only for appointments booked before event ids were stored - use
+        delete_event_by_id otherwise.
+        """
         if not self.service:
-            print("Google Calendar service not initialized")
+            logger.warning("Google Calendar service not initialized")
             return False
         
         try:
-            # Find the event by searching for events on that date
-            time_min = f'{date}T00:00:00Z'
-            time_max = f'{date}T23:59:59Z'
-            
-            events_result = self.service.events().list(
-                calendarId=calendar_id,
-                timeMin=time_min,
-                timeMax=time_max,
-                singleEvents=True,
-                orderBy='startTime'
-            ).execute()
-            
-            events = events_result.get('items', [])
-            
-            # Find event matching the start time
-            for event in events:
-                event_start = event['start'].get('dateTime', event['start'].get('date'))
-                if start_time in event_start:
+            # Find the event among that day's events (clinic-local day)
+            for event in self.list_day_events(calendar_id, date):
+                if self.local_start_time(event) == start_time:
                     # Delete the event
-                    self.service.events().delete(calendarId=calendar_id, eventId=event['id']).execute()
-                    print(f"Event deleted: {event.get('summary')} at {start_time}")
+                    self.execute(self.service.events().delete(calendarId=calendar_id, eventId=event['id']))
+                    self.invalidate_busy_cache(calendar_id, date)
+                    logger.debug("Event deleted", extra={"event_id": event['id']})
                     return True
             
-            print(f"No event found at {date} {start_time}")
+            logger.warning("No event found at %s %s", date, start_time)
             return False
             
         except Exception as e:
-            print(f"Error deleting event: {e}")
+            logger.error("Error deleting event: %r", e)
             return False
 
 # Singleton instance
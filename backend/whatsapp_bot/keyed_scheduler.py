@@ -0,0 +1,94 @@
+"""
+Keyed async work scheduler: one job at a time per key, keys in parallel.
+
+The webhook hands every inbound message to `message_scheduler` keyed by the
+sender's number. A patient's messages are then handled strictly one after
+another, in arrival order, so two quick taps can't both read the same
+session or both pass the booking checks. Different patients don't wait on
+each other.
+
+Each key has a FIFO of at most `max_depth` jobs (the running one included)
+and a worker task that exists only while the FIFO is non-empty. Jobs beyond
+the depth are refused - that's a patient hammering buttons, not traffic
+worth queueing. Everything runs on the event loop; submit() must be called
+from it.
+"""
+
+import asyncio
+import contextvars
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, Tuple
+
+from clinic_clock import clinic_clock
+from structured_logging import get_logger
+from .config import config
+
+logger = get_logger("whatsapp_bot.keyed_scheduler")
+
+Job = Tuple[Callable[..., Awaitable[Any]], tuple]
+
+
+class KeyedScheduler:
+    def __init__(self, max_depth: int = None):
+        self.max_depth = max_depth or config.WHATSAPP_USER_QUEUE_DEPTH
+        self._queues: Dict[str, Deque[Job]] = {}
+        self._workers: Dict[str, asyncio.Task] = {}
+        self.stats = {"submitted": 0, "completed": 0, "failed": 0, "rejected": 0}
+
+    def submit(self, key: str, fn: Callable[..., Awaitable[Any]], *args) -> bool:
+        """Queue `await fn(*args)` behind the key's earlier jobs. False if the key's queue is full."""
+        queue = self._queues.get(key)
+        if queue is None:
+            queue = self._queues[key] = deque()
+        elif len(queue) >= self.max_depth:
+            self.stats["rejected"] += 1
+            return False
+        queue.append((fn, args))
+        self.stats["submitted"] += 1
+        if key not in self._workers:
+            # A fresh context: the worker outlives the webhook request that started it,
+            # and must not keep that request's pinned clinic time
+            self._workers[key] = asyncio.get_running_loop().create_task(
+                self._run(key, queue), context=contextvars.Context())
+        return True
+
+    async def _run(self, key: str, queue: Deque[Job]):
+        try:
+            while queue:
+                fn, args = queue[0]  # Stays queued while running, so it counts towards the depth
+                try:
+                    with clinic_clock.pinned():  # One "now" per message, like a request
+                        await fn(*args)
+                    self.stats["completed"] += 1
+                except Exception as e:
+                    self.stats["failed"] += 1
+                    logger.exception("Error in scheduled job for %s: %r", key, e)
+                finally:
+                    queue.popleft()
+        finally:
+            # No await since the last check: nothing can have been queued in between
+            del self._queues[key]
+            del self._workers[key]
+
+    def depth(self, key: str) -> int:
+        queue = self._queues.get(key)
+        return len(queue) if queue else 0
+
+    async def join(self):
+        """Wait until every queued job has run"""
+        while self._workers:
+            await asyncio.gather(*list(self._workers.values()), return_exceptions=True)
+
+    def cancel_all(self):
+        for task in list(self._workers.values()):
+            task.cancel()
+
+    def metrics(self) -> Dict[str, Any]:
+        return {
+            **self.stats,
+            "activeKeys": len(self._workers),
+            "queued": sum(len(q) for q in self._queues.values()),
+            "maxDepth": self.max_depth
+        }
+
+message_scheduler = KeyedScheduler()
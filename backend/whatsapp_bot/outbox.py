@@ -0,0 +1,288 @@
+"""
+Durable outbound message queue (transactional outbox) for WhatsApp sends.
+
+Request handlers call `enqueue_*` with their own DB session, so the message
+row commits atomically with the appointment it is about, and the request
+returns without waiting on Meta. `OutboxDispatcher` runs as a background task
+and delivers rows:
+
+- per-recipient ordering: only the oldest undelivered message of each
+  recipient is eligible, so a retrying message holds back the ones after it
+- global token-bucket rate limit (WHATSAPP_RATE_LIMIT_PER_SECOND)
+- exponential backoff with jitter on 429/5xx/network errors; other 4xx errors
+  and messages past OUTBOX_MAX_ATTEMPTS are dead-lettered (status "dead")
+- claims are conditional updates, so several workers can dispatch safely
+"""
+
+import asyncio
+import json
+import random
+import time
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+import httpx
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+from database import SessionLocal, OutboundMessage
+from structured_logging import get_logger
+from .config import config
+from .whatsapp_client import async_whatsapp_client
+
+logger = get_logger("whatsapp_bot.outbox")
+
+PENDING = "pending"
+SENDING = "sending"
+SENT = "sent"
+DEAD = "dead"
+
+# A "sending" row older than this belonged to a worker that died mid-send
+STALE_CLAIM_AFTER = timedelta(minutes=5)
+# Delivered rows are kept this long for auditing, then pruned
+SENT_RETENTION = timedelta(days=7)
+MAINTENANCE_INTERVAL_SECONDS = 60
+
+
+# ==================== ENQUEUE ====================
+
+def enqueue(db: Session, payload: Dict[str, Any]) -> OutboundMessage:
+    """Add a Graph API payload to the outbox. The caller commits (together
+    with its own changes) and may then call outbox_dispatcher.wake()."""
+    message = OutboundMessage(
+        recipient=payload["to"],
+        payload=json.dumps(payload),
+        status=PENDING,
+        attempts=0,
+        next_attempt_at=datetime.utcnow()
+    )
+    db.add(message)
+    return message
+
+def enqueue_template(db: Session, to: str, template_name: str, components: list = None,
+                     language_code: str = "en_US") -> OutboundMessage:
+    """Queue a WhatsApp template message"""
+    payload = async_whatsapp_client._template_payload(to, template_name, language_code, components)
+    return enqueue(db, payload)
+
+def enqueue_text(db: Session, to: str, message: str) -> OutboundMessage:
+    """Queue a plain text message"""
+    return enqueue(db, async_whatsapp_client._text_payload(to, message))
+
+
+# ==================== RATE LIMIT ====================
+
+class TokenBucket:
+    """Async token bucket: `rate` tokens/second, bursts up to `capacity`"""
+
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        self.rate = rate
+        self.capacity = capacity or rate
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+# ==================== DISPATCHER ====================
+
+class OutboxDispatcher:
+    def __init__(self, client=async_whatsapp_client):
+        self.client = client
+        self.bucket = TokenBucket(config.WHATSAPP_RATE_LIMIT_PER_SECOND)
+        self._wake_event: Optional[asyncio.Event] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._last_maintenance = 0.0
+
+    def wake(self):
+        """Deliver newly committed messages now instead of at the next poll.
+        Safe to call from request threads."""
+        if self._loop and self._wake_event:
+            self._loop.call_soon_threadsafe(self._wake_event.set)
+
+    async def run(self):
+        """Background loop - started with the app"""
+        self._loop = asyncio.get_running_loop()
+        self._wake_event = asyncio.Event()
+        while True:
+            try:
+                if time.monotonic() - self._last_maintenance > MAINTENANCE_INTERVAL_SECONDS:
+                    await run_in_threadpool(self._maintenance)
+                    self._last_maintenance = time.monotonic()
+                delivered = await self.dispatch_once()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.exception("Error in outbox dispatcher")
+                delivered = 0
+            if delivered:
+                continue  # More may be waiting behind the ones just sent
+            try:
+                await asyncio.wait_for(self._wake_event.wait(), timeout=config.OUTBOX_POLL_INTERVAL_SECONDS)
+            except asyncio.TimeoutError:
+                pass
+            self._wake_event.clear()
+
+    async def dispatch_once(self) -> int:
+        """Claim one batch of due messages and send them. Returns how many were attempted."""
+        claimed = await run_in_threadpool(self._claim_batch, config.OUTBOX_BATCH_SIZE)
+        if claimed:
+            # One message per recipient per batch, so sending them concurrently keeps order
+            results = await asyncio.gather(
+                *(self._deliver(message_id, payload) for message_id, payload in claimed), return_exceptions=True
+            )
+            for (message_id, _), result in zip(claimed, results):
+                if isinstance(result, Exception):
+                    # Recording failed: the stale-claim release retries it later
+                    logger.error("Error recording outbox message %s", message_id, exc_info=result)
+        return len(claimed)
+
+    async def _deliver(self, message_id: int, payload: Dict[str, Any]):
+        await self.bucket.acquire()
+        try:
+            response = await self.client.send_payload(payload)
+        except Exception as error:
+            await run_in_threadpool(self._record_failure, message_id, error)
+            return
+        provider_id = None
+        if isinstance(response, dict) and response.get("messages"):
+            provider_id = response["messages"][0].get("id")
+        await run_in_threadpool(self._record_success, message_id, provider_id)
+
+    # ---------- DB work (runs in the threadpool) ----------
+
+    def _claim_batch(self, limit: int) -> List[tuple]:
+        db = SessionLocal()
+        try:
+            now = datetime.utcnow()
+            # Oldest undelivered message per recipient
+            heads = db.query(func.min(OutboundMessage.id)).filter(
+                OutboundMessage.status.in_([PENDING, SENDING])
+            ).group_by(OutboundMessage.recipient)
+            candidates = db.query(OutboundMessage.id, OutboundMessage.payload).filter(
+                OutboundMessage.id.in_(heads),
+                OutboundMessage.status == PENDING,
+                OutboundMessage.next_attempt_at <= now
+            ).order_by(OutboundMessage.id).limit(limit).all()
+
+            claimed = []
+            for message_id, payload in candidates:
+                won = db.query(OutboundMessage).filter(
+                    OutboundMessage.id == message_id,
+                    OutboundMessage.status == PENDING
+                ).update({"status": SENDING, "updated_at": now}, synchronize_session=False)
+                if won:
+                    claimed.append((message_id, json.loads(payload)))
+            db.commit()
+            return claimed
+        finally:
+            db.close()
+
+    def _record_success(self, message_id: int, provider_id: Optional[str]):
+        db = SessionLocal()
+        try:
+            db.query(OutboundMessage).filter(OutboundMessage.id == message_id).update({
+                "status": SENT,
+                "attempts": OutboundMessage.attempts + 1,
+                "provider_message_id": provider_id,
+                "last_error": None,
+                "updated_at": datetime.utcnow()
+            }, synchronize_session=False)
+            db.commit()
+        finally:
+            db.close()
+
+    def _record_failure(self, message_id: int, error: Exception):
+        db = SessionLocal()
+        try:
+            message = db.query(OutboundMessage).filter(OutboundMessage.id == message_id).first()
+            if not message:
+                return
+            message.attempts += 1
+            message.last_error = _describe(error)
+            if not _is_retryable(error) or message.attempts >= config.OUTBOX_MAX_ATTEMPTS:
+                message.status = DEAD
+                logger.error("Outbox message %s dead-lettered after %s attempts: %s", message_id, message.attempts, message.last_error)
+            else:
+                message.status = PENDING
+                message.next_attempt_at = datetime.utcnow() + timedelta(seconds=backoff_seconds(message.attempts))
+            db.commit()
+        finally:
+            db.close()
+
+    def _maintenance(self):
+        """Release claims of crashed workers and prune old delivered rows"""
+        db = SessionLocal()
+        try:
+            now = datetime.utcnow()
+            db.query(OutboundMessage).filter(
+                OutboundMessage.status == SENDING,
+                OutboundMessage.updated_at < now - STALE_CLAIM_AFTER
+            ).update({"status": PENDING, "updated_at": now}, synchronize_session=False)
+            db.query(OutboundMessage).filter(
+                OutboundMessage.status == SENT,
+                OutboundMessage.updated_at < now - SENT_RETENTION
+            ).delete(synchronize_session=False)
+            db.commit()
+        finally:
+            db.close()
+
+
+def backoff_seconds(attempts: int, base: float = None, cap: float = None) -> float:
+    """Exponential backoff with jitter: base * 2^(attempts-1), capped.
+    Defaults to the outbox settings."""
+    base = config.OUTBOX_BACKOFF_BASE_SECONDS if base is None else base
+    cap = config.OUTBOX_BACKOFF_MAX_SECONDS if cap is None else cap
+    delay = min(base * (2 ** (attempts - 1)), cap)
+    return delay + random.uniform(0, base)
+
+def _is_retryable(error: Exception) -> bool:
+    if isinstance(error, httpx.HTTPStatusError):
+        status = error.response.status_code
+        return status in (408, 429) or status >= 500
+    if isinstance(error, (httpx.HTTPError, OSError)):
+        return True  # Timeouts, connection errors
+    # Anything else (e.g. an unreadable body on a 2xx) may come after Meta accepted the message
+    return False
+
+def _describe(error: Exception) -> str:
+    if isinstance(error, httpx.HTTPStatusError):
+        return f"HTTP {error.response.status_code}: {error.response.text[:500]}"
+    return repr(error)[:500]
+
+
+# ==================== QUERIES ====================
+
+def outbox_stats() -> Dict[str, int]:
+    """Message counts by status"""
+    db = SessionLocal()
+    try:
+        rows = db.query(OutboundMessage.status, func.count(OutboundMessage.id)).group_by(OutboundMessage.status).all()
+        return {status: count for status, count in rows}
+    finally:
+        db.close()
+
+def format_message(message: OutboundMessage) -> Dict[str, Any]:
+    return {
+        "id": message.id,
+        "recipient": message.recipient,
+        "payload": json.loads(message.payload),
+        "status": message.status,
+        "attempts": message.attempts,
+        "lastError": message.last_error,
+        "createdAt": message.created_at.isoformat() if message.created_at else None,
+        "updatedAt": message.updated_at.isoformat() if message.updated_at else None
+    }
+
+outbox_dispatcher = OutboxDispatcher()
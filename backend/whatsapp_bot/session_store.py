@@ -0,0 +1,406 @@
+"""
+Conversation session storage for the WhatsApp bot.
+
+A session is a small JSON-able dict per sender. Every store keeps a version
+number per user so updates can be applied with compare-and-set, and expires
+sessions that have not been written for longer than the TTL. Expired (and,
+for the memory store, capacity-evicted) sessions are reported through the
+store's `on_evict(user_id, data, reason)` callback.
+
+    memory - in-process LRU bounded by SESSION_MAX_SIZE (single worker only)
+    sql    - `whatsapp_sessions` table, shared by every worker and node
+    file   - one JSON file per user in a shared directory
+"""
+
+import json
+import os
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from sqlalchemy import func
+from sqlalchemy.exc import IntegrityError
+
+from database import SessionLocal, WhatsAppSession
+from structured_logging import get_logger
+from .config import config
+
+logger = get_logger("whatsapp_bot.session_store")
+
+# (session data, version) - version 0 means "no stored session"
+Loaded = Tuple[Dict[str, Any], int]
+
+# Eviction reasons passed to on_evict
+EXPIRED = "expired"
+CAPACITY = "capacity"
+
+
+class SessionStore(ABC):
+    """Interface implemented by every session backend"""
+
+    def __init__(self, ttl_seconds: int):
+        self.ttl_seconds = ttl_seconds
+        self.on_evict: Optional[Callable[[str, Dict[str, Any], str], None]] = None
+        self.evictions = {EXPIRED: 0, CAPACITY: 0}
+
+    def _evicted(self, evicted: List[Tuple[str, Dict[str, Any], str]]):
+        """Count evictions and report them - always called outside any lock"""
+        for user_id, data, reason in evicted:
+            self.evictions[reason] += 1
+            if self.on_evict:
+                try:
+                    self.on_evict(user_id, data, reason)
+                except Exception as e:
+                    logger.exception("Error in session eviction callback")
+
+    @abstractmethod
+    def load(self, user_id: str) -> Optional[Loaded]:
+        """Return (data, version), or None if missing or expired"""
+        raise NotImplementedError
+
+    @abstractmethod
+    def compare_and_set(self, user_id: str, expected_version: int, data: Dict[str, Any]) -> bool:
+        """Write `data` only if the stored version still equals `expected_version`
+        (0 = create). Refreshes the TTL. Returns False on a lost race."""
+        raise NotImplementedError
+
+    @abstractmethod
+    def delete(self, user_id: str):
+        raise NotImplementedError
+
+    @abstractmethod
+    def purge_expired(self) -> List[str]:
+        """Remove expired sessions. Returns the user ids that were removed."""
+        raise NotImplementedError
+
+    @abstractmethod
+    def metrics(self) -> Dict[str, Any]:
+        """Live session count, evictions and approximate memory/storage footprint"""
+        raise NotImplementedError
+
+
+class MemorySessionStore(SessionStore):
+    """Process-local LRU + TTL store. Fast and bounded, but lost on restart and
+    not shared between workers. Entries are kept in write order, which is also
+    expiry order, so sweeping and capacity eviction both pop from the front."""
+
+    def __init__(self, ttl_seconds: int, max_size: int):
+        super().__init__(ttl_seconds)
+        self.max_size = max_size
+        self._lock = threading.Lock()
+        # user_id -> (serialized data, version, expires_at monotonic), oldest write first
+        self._sessions: "OrderedDict[str, Tuple[str, int, float]]" = OrderedDict()
+        self._bytes = 0
+
+    def _pop(self, user_id: str) -> Tuple[str, int, float]:
+        entry = self._sessions.pop(user_id)
+        self._bytes -= len(entry[0])
+        return entry
+
+    def load(self, user_id: str) -> Optional[Loaded]:
+        evicted = []
+        with self._lock:
+            entry = self._sessions.get(user_id)
+            if entry is None:
+                return None
+            if entry[2] <= time.monotonic():
+                self._pop(user_id)
+                evicted.append((user_id, json.loads(entry[0]), EXPIRED))
+                entry = None
+        if entry is None:
+            self._evicted(evicted)
+            return None
+        return json.loads(entry[0]), entry[1]
+
+    def compare_and_set(self, user_id: str, expected_version: int, data: Dict[str, Any]) -> bool:
+        serialized = json.dumps(data)
+        evicted = []
+        with self._lock:
+            entry = self._sessions.get(user_id)
+            now = time.monotonic()
+            current = entry[1] if entry and entry[2] > now else 0
+            if current != expected_version:
+                return False
+            if entry:
+                self._pop(user_id)
+            # Make room by evicting the least recently written session
+            while len(self._sessions) >= self.max_size:
+                old_id, old_entry = next(iter(self._sessions.items()))
+                self._pop(old_id)
+                reason = EXPIRED if old_entry[2] <= now else CAPACITY
+                evicted.append((old_id, json.loads(old_entry[0]), reason))
+            self._sessions[user_id] = (serialized, current + 1, now + self.ttl_seconds)
+            self._bytes += len(serialized)
+        self._evicted(evicted)
+        return True
+
+    def delete(self, user_id: str):
+        with self._lock:
+            if user_id in self._sessions:
+                self._pop(user_id)
+
+    def purge_expired(self) -> List[str]:
+        now = time.monotonic()
+        evicted = []
+        with self._lock:
+            while self._sessions:
+                user_id, entry = next(iter(self._sessions.items()))
+                if entry[2] > now:
+                    break
+                self._pop(user_id)
+                evicted.append((user_id, json.loads(entry[0]), EXPIRED))
+        self._evicted(evicted)
+        return [user_id for user_id, _, _ in evicted]
+
+    def metrics(self) -> Dict[str, Any]:
+        with self._lock:
+            live = len(self._sessions)
+            data_bytes = self._bytes
+        return {
+            "store": "memory",
+            "live": live,
+            "maxSize": self.max_size,
+            "evictions": dict(self.evictions),
+            # Serialized payload plus a rough per-entry dict/tuple overhead
+            "approxBytes": data_bytes + live * 200
+        }
+
+
+class SQLSessionStore(SessionStore):
+    """Sessions in the `whatsapp_sessions` table - survives restarts and scales across nodes"""
+
+    def load(self, user_id: str) -> Optional[Loaded]:
+        db = SessionLocal()
+        try:
+            row = db.query(WhatsAppSession.data, WhatsAppSession.version).filter(
+                WhatsAppSession.user_id == user_id,
+                WhatsAppSession.expires_at > datetime.utcnow()
+            ).first()
+            return (json.loads(row.data), row.version) if row else None
+        finally:
+            db.close()
+
+    def compare_and_set(self, user_id: str, expected_version: int, data: Dict[str, Any]) -> bool:
+        now = datetime.utcnow()
+        values = {
+            "data": json.dumps(data),
+            "expires_at": now + timedelta(seconds=self.ttl_seconds),
+            "updated_at": now
+        }
+        db = SessionLocal()
+        try:
+            query = db.query(WhatsAppSession).filter(WhatsAppSession.user_id == user_id)
+            if expected_version:
+                updated = query.filter(
+                    WhatsAppSession.version == expected_version,
+                    WhatsAppSession.expires_at > now
+                ).update({**values, "version": expected_version + 1}, synchronize_session=False)
+            else:
+                # Creating: take over an expired row if one is still lying around
+                updated = query.filter(
+                    WhatsAppSession.expires_at <= now
+                ).update({**values, "version": 1}, synchronize_session=False)
+                if not updated:
+                    db.add(WhatsAppSession(user_id=user_id, version=1, **values))
+                    db.flush()
+                    updated = 1
+            db.commit()
+            return updated == 1
+        except IntegrityError:
+            # Another worker created the session first
+            db.rollback()
+            return False
+        finally:
+            db.close()
+
+    def delete(self, user_id: str):
+        db = SessionLocal()
+        try:
+            db.query(WhatsAppSession).filter(WhatsAppSession.user_id == user_id).delete(synchronize_session=False)
+            db.commit()
+        finally:
+            db.close()
+
+    def purge_expired(self) -> List[str]:
+        now = datetime.utcnow()
+        evicted = []
+        db = SessionLocal()
+        try:
+            rows = db.query(WhatsAppSession.user_id, WhatsAppSession.data).filter(
+                WhatsAppSession.expires_at <= now
+            ).all()
+            for user_id, data in rows:
+                # Every worker sweeps; only the one whose delete lands reports it
+                deleted = db.query(WhatsAppSession).filter(
+                    WhatsAppSession.user_id == user_id,
+                    WhatsAppSession.expires_at <= now
+                ).delete(synchronize_session=False)
+                db.commit()
+                if deleted:
+                    evicted.append((user_id, json.loads(data), EXPIRED))
+        finally:
+            db.close()
+        self._evicted(evicted)
+        return [user_id for user_id, _, _ in evicted]
+
+    def metrics(self) -> Dict[str, Any]:
+        db = SessionLocal()
+        try:
+            live, data_bytes = db.query(
+                func.count(WhatsAppSession.user_id),
+                func.coalesce(func.sum(func.length(WhatsAppSession.data)), 0)
+            ).filter(WhatsAppSession.expires_at > datetime.utcnow()).one()
+        finally:
+            db.close()
+        return {"store": "sql", "live": live, "evictions": dict(self.evictions), "approxBytes": int(data_bytes)}
+
+
+class FileSessionStore(SessionStore):
+    """One JSON file per user in a shared directory, guarded by an OS file lock.
+    Works across worker processes on one host (or a shared volume)."""
+
+    def __init__(self, ttl_seconds: int, directory: str):
+        super().__init__(ttl_seconds)
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, user_id: str) -> str:
+        safe_id = "".join(c for c in user_id if c.isalnum() or c in "-_") or "_"
+        return os.path.join(self.directory, f"{safe_id}.json")
+
+    def _locked(self, user_id: str):
+        return _FileLock(self._path(user_id) + ".lock")
+
+    def _read_raw(self, path: str) -> Optional[Dict[str, Any]]:
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def _read(self, path: str) -> Optional[Dict[str, Any]]:
+        record = self._read_raw(path)
+        return record if record and record["expires_at"] > time.time() else None
+
+    def load(self, user_id: str) -> Optional[Loaded]:
+        record = self._read(self._path(user_id))
+        return (record["data"], record["version"]) if record else None
+
+    def compare_and_set(self, user_id: str, expected_version: int, data: Dict[str, Any]) -> bool:
+        path = self._path(user_id)
+        with self._locked(user_id):
+            record = self._read(path)
+            if (record["version"] if record else 0) != expected_version:
+                return False
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump({
+                    "data": data,
+                    "version": expected_version + 1,
+                    "expires_at": time.time() + self.ttl_seconds
+                }, f)
+            os.replace(tmp_path, path)
+            return True
+
+    def delete(self, user_id: str):
+        with self._locked(user_id) as lock:
+            try:
+                os.remove(self._path(user_id))
+            except FileNotFoundError:
+                pass
+            lock.unlink()
+
+    def _session_files(self):
+        return [name for name in os.listdir(self.directory) if name.endswith(".json")]
+
+    def purge_expired(self) -> List[str]:
+        evicted = []
+        now = time.time()
+        for name in self._session_files():
+            user_id = name[:-len(".json")]
+            with self._locked(user_id) as lock:
+                path = self._path(user_id)
+                record = self._read_raw(path)
+                if record and record["expires_at"] <= now:
+                    os.remove(path)
+                    lock.unlink()
+                    evicted.append((user_id, record["data"], EXPIRED))
+        # Lock files left without a session (a crash between the two removals)
+        sessions = set(self._session_files())
+        for name in os.listdir(self.directory):
+            if name.endswith(".json.lock") and name[:-len(".lock")] not in sessions:
+                with self._locked(name[:-len(".json.lock")]) as lock:
+                    if not os.path.exists(self._path(name[:-len(".json.lock")])):
+                        lock.unlink()
+        self._evicted(evicted)
+        return [user_id for user_id, _, _ in evicted]
+
+    def metrics(self) -> Dict[str, Any]:
+        files = self._session_files()
+        data_bytes = 0
+        for name in files:
+            try:
+                data_bytes += os.path.getsize(os.path.join(self.directory, name))
+            except OSError:
+                pass
+        # Includes not-yet-swept expired files
+        return {"store": "file", "live": len(files), "evictions": dict(self.evictions), "approxBytes": data_bytes}
+
+
+class _FileLock:
+    """Exclusive inter-process lock on a lock file. The holder may unlink() the
+    file; whoever was waiting on it notices and locks the new one instead."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._fd = None
+
+    def __enter__(self):
+        while True:
+            self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT)
+            if os.name == "nt":
+                import msvcrt
+                msvcrt.locking(self._fd, msvcrt.LK_LOCK, 1)
+                return self
+            import fcntl
+            fcntl.flock(self._fd, fcntl.LOCK_EX)
+            try:
+                if os.stat(self.path).st_ino == os.fstat(self._fd).st_ino:
+                    return self
+            except FileNotFoundError:
+                pass
+            # Unlinked while we waited: the lock we hold guards nothing
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+            os.close(self._fd)
+
+    def unlink(self):
+        """Remove the lock file while holding it (kept on Windows, which can't remove open files)"""
+        if os.name != "nt":
+            try:
+                os.remove(self.path)
+            except FileNotFoundError:
+                pass
+
+    def __exit__(self, *exc):
+        if os.name == "nt":
+            import msvcrt
+            msvcrt.locking(self._fd, msvcrt.LK_UNLCK, 1)
+        else:
+            import fcntl
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+        os.close(self._fd)
+
+
+def create_session_store() -> SessionStore:
+    """Build the store selected by SESSION_STORE"""
+    kind = config.SESSION_STORE.lower()
+    if kind == "sql":
+        return SQLSessionStore(config.SESSION_TTL_SECONDS)
+    if kind == "file":
+        return FileSessionStore(config.SESSION_TTL_SECONDS, config.SESSION_FILE_DIR)
+    if kind != "memory":
+        logger.warning("Unknown SESSION_STORE %r, using memory", config.SESSION_STORE)
+    return MemorySessionStore(config.SESSION_TTL_SECONDS, config.SESSION_MAX_SIZE)
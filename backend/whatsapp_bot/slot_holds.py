@@ -0,0 +1,131 @@
+"""
+Short-lived holds on appointment slots during the WhatsApp booking funnel.
+
+When a patient is shown a list of times, those slots are held for them for
+SLOT_HOLD_TTL_SECONDS: other patients' slot lists leave them out, and a
+tap on a slot someone else holds is answered like a taken slot. Tapping a
+time narrows the patient's hold to that one slot until the booking is
+written; booking (or the TTL running out) releases it. A patient has at
+most one set of holds - showing them a new list replaces the old one.
+
+Holds are a courtesy, not the guarantee: they live in this process's
+memory (each worker sees its own), and the uq_appointments_doctor_slot
+index still arbitrates the actual booking.
+
+The registry is split into SLOT_HOLD_SHARDS shards, each with its own
+lock, keyed by (doctor, date) for slot holds and by patient for the
+patient -> holds index, so lookups for busy doctors don't contend with
+each other. Every operation holds one shard lock at a time, briefly.
+"""
+
+import threading
+import time as clock
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from .config import config
+
+DayKey = Tuple[str, str]  # (doctor_id, "YYYY-MM-DD")
+
+
+class _Shard:
+    __slots__ = ("lock", "slots", "users")
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.slots: Dict[DayKey, Dict[str, Tuple[str, float]]] = {}  # day -> time -> (user_id, expires)
+        self.users: Dict[str, Tuple[DayKey, Tuple[str, ...], float]] = {}  # user_id -> (day, times, expires)
+
+
+class SlotHolds:
+    def __init__(self, ttl_seconds: float = None, shards: int = None):
+        self.ttl_seconds = ttl_seconds or config.SLOT_HOLD_TTL_SECONDS
+        self._shards = [_Shard() for _ in range(shards or config.SLOT_HOLD_SHARDS)]
+
+    def _shard(self, key) -> _Shard:
+        return self._shards[hash(key) % len(self._shards)]
+
+    def hold(self, user_id: str, doctor_id, date: str, times: Iterable[str]) -> List[str]:
+        """Hold `times` for the user, replacing their previous holds.
+        Returns the times actually held (those not held by someone else)."""
+        day = (str(doctor_id), date)
+        now = clock.monotonic()
+        expires = now + self.ttl_seconds
+        self.release(user_id)
+
+        held = []
+        shard = self._shard(day)
+        with shard.lock:
+            slots = shard.slots.setdefault(day, {})
+            for slot in times:
+                holder = slots.get(slot)
+                if holder and holder[0] != user_id and holder[1] > now:
+                    continue
+                slots[slot] = (user_id, expires)
+                held.append(slot)
+
+        user_shard = self._shard(user_id)
+        with user_shard.lock:
+            user_shard.users[user_id] = (day, tuple(held), expires)
+        return held
+
+    def release(self, user_id: str):
+        """Drop all of a user's holds"""
+        user_shard = self._shard(user_id)
+        with user_shard.lock:
+            entry = user_shard.users.pop(user_id, None)
+        if not entry:
+            return
+        day, times, _ = entry
+        shard = self._shard(day)
+        with shard.lock:
+            slots = shard.slots.get(day)
+            if slots is None:
+                return
+            for slot in times:
+                holder = slots.get(slot)
+                if holder and holder[0] == user_id:
+                    del slots[slot]
+            if not slots:
+                del shard.slots[day]
+
+    def held_by_others(self, doctor_id, date: str, user_id: Optional[str] = None) -> Set[str]:
+        """Times on the doctor's day held by anyone but `user_id` (everyone, if None)"""
+        day = (str(doctor_id), date)
+        shard = self._shard(day)
+        with shard.lock:
+            slots = shard.slots.get(day)
+            if not slots:
+                return set()
+            now = clock.monotonic()
+            return {slot for slot, (holder, expires) in slots.items() if holder != user_id and expires > now}
+
+    def is_held_by_other(self, user_id: str, doctor_id, date: str, time: str) -> bool:
+        return time in self.held_by_others(doctor_id, date, user_id)
+
+    def purge_expired(self) -> int:
+        """Forget expired holds. Returns how many slot holds were dropped."""
+        now = clock.monotonic()
+        dropped = 0
+        for shard in self._shards:
+            with shard.lock:
+                for day in list(shard.slots):
+                    slots = shard.slots[day]
+                    for slot in [s for s, (_, expires) in slots.items() if expires <= now]:
+                        del slots[slot]
+                        dropped += 1
+                    if not slots:
+                        del shard.slots[day]
+                for user_id in [u for u, entry in shard.users.items() if entry[2] <= now]:
+                    del shard.users[user_id]
+        return dropped
+
+    def metrics(self) -> Dict[str, int]:
+        now = clock.monotonic()
+        holds = users = 0
+        for shard in self._shards:
+            with shard.lock:
+                holds += sum(1 for slots in shard.slots.values() for _, expires in slots.values() if expires > now)
+                users += sum(1 for entry in shard.users.values() if entry[2] > now)
+        return {"holds": holds, "patients": users, "ttlSeconds": self.ttl_seconds}
+
+slot_holds = SlotHolds()
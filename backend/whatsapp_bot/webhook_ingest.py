@@ -0,0 +1,114 @@
+"""
+Ingestion stage for WhatsApp webhooks: unpacking and deduplication.
+
+Meta redelivers a webhook until it gets a 200 back (and occasionally even
+after), so the same message id can arrive several times, from the same or
+another worker. Each message is checked twice:
+
+    1. in memory, on the event loop, before the 200 is sent - an LRU of
+       recently seen ids (WEBHOOK_DEDUP_CACHE_SIZE), O(1) per message;
+    2. in the `whatsapp_processed_messages` table, in the background task -
+       the primary key makes the insert the claim, so only one worker (and
+       only one delivery after a restart) handles a message.
+
+Rows older than WEBHOOK_DEDUP_RETENTION_HOURS are pruned by prune().
+"""
+
+import threading
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterator, Optional, Tuple
+
+from sqlalchemy.exc import IntegrityError
+
+from database import SessionLocal, ProcessedMessage
+from structured_logging import get_logger
+from .config import config
+
+logger = get_logger("whatsapp_bot.webhook_ingest")
+
+
+def iter_messages(data: Dict[str, Any]) -> Iterator[Tuple[Dict[str, Any], Dict[str, Any]]]:
+    """Yield (message, value) for every inbound message in a webhook body"""
+    if data.get('object') != 'whatsapp_business_account':
+        return
+    for entry in data.get('entry', []):
+        for change in entry.get('changes', []):
+            value = change.get('value', {})
+            for message in value.get('messages', []):
+                yield message, value
+
+
+class WebhookDeduplicator:
+    def __init__(self, max_size: int = None, retention_hours: int = None):
+        self.max_size = max_size or config.WEBHOOK_DEDUP_CACHE_SIZE
+        self.retention = timedelta(hours=retention_hours or config.WEBHOOK_DEDUP_RETENTION_HOURS)
+        self._lock = threading.Lock()
+        self._seen: "OrderedDict[str, None]" = OrderedDict()  # Least recently seen first
+        self.stats = {"received": 0, "duplicates": 0, "redelivered": 0, "processed": 0}
+
+    def seen(self, message_id: Optional[str]) -> bool:
+        """Record a message id in memory. True if it was already there (drop it).
+        Messages without an id are never treated as duplicates."""
+        with self._lock:
+            self.stats["received"] += 1
+            if not message_id:
+                return False
+            if message_id in self._seen:
+                self._seen.move_to_end(message_id)
+                self.stats["duplicates"] += 1
+                return True
+            self._seen[message_id] = None
+            if len(self._seen) > self.max_size:
+                self._seen.popitem(last=False)
+            return False
+
+    def forget(self, message_id: Optional[str]):
+        """Undo seen() for a message that wasn't taken on, so Meta's redelivery is handled"""
+        with self._lock:
+            self._seen.pop(message_id, None)
+
+    def claim(self, message_id: Optional[str], sender: Optional[str] = None) -> bool:
+        """Durably claim a message id. False if another delivery already claimed it.
+        Blocking - call from a worker thread. A database error lets the message
+        through: answering twice beats not answering."""
+        if not message_id:
+            return True
+        db = SessionLocal()
+        try:
+            db.add(ProcessedMessage(message_id=message_id, sender=sender, received_at=datetime.utcnow()))
+            db.commit()
+            return True
+        except IntegrityError:
+            db.rollback()
+            with self._lock:
+                self.stats["redelivered"] += 1
+            return False
+        except Exception as e:
+            db.rollback()
+            logger.exception("Error recording webhook message %s", message_id)
+            return True
+        finally:
+            db.close()
+
+    def processed(self):
+        with self._lock:
+            self.stats["processed"] += 1
+
+    def prune(self) -> int:
+        """Delete claimed ids older than the retention window"""
+        db = SessionLocal()
+        try:
+            deleted = db.query(ProcessedMessage).filter(
+                ProcessedMessage.received_at < datetime.utcnow() - self.retention
+            ).delete(synchronize_session=False)
+            db.commit()
+            return deleted
+        finally:
+            db.close()
+
+    def metrics(self) -> Dict[str, Any]:
+        with self._lock:
+            return {**self.stats, "cached": len(self._seen), "maxSize": self.max_size}
+
+webhook_dedup = WebhookDeduplicator()
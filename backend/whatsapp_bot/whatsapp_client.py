@@ -1,15 +1,29 @@
+import asyncio
 import requests
+import httpx
 from .config import config
+from structured_logging import get_logger
 import json
 
+# One line per outgoing message; never log bodies or recipients (patient data)
+logger = get_logger("whatsapp_bot.whatsapp_client", sampled=True)
+
 class WhatsAppClient:
-    def __init__(self):
-        self.api_url = f"{config.WHATSAPP_API_URL}/{config.WHATSAPP_PHONE_NUMBER_ID}/messages"
+    """Blocking client for sync code paths (REST endpoints, scripts).
+    Reuses one keep-alive session so calls don't each pay for a TLS handshake."""
+
+    def __init__(self, api_url: str = None):
+        self.api_url = api_url or f"{config.WHATSAPP_API_URL}/{config.WHATSAPP_PHONE_NUMBER_ID}/messages"
         self.headers = {
-            "Authorization": f"Bearer {config.WHATSAPP_ACCESS_TOKEN}",
+            "Authorization": f"Bearer {config.WHATSAPP_ACCESS_TOKEN}".strip(),
             "Content-Type": "application/json"
         }
-    
+        self.timeout = config.WHATSAPP_TIMEOUT_SECONDS
+        self._session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(pool_maxsize=config.WHATSAPP_POOL_SIZE)
+        self._session.mount("https://", adapter)
+        self._session.mount("http://", adapter)
+
     def _format_phone_number(self, phone: str) -> str:
         """Helper to format phone number to E.164 without +"""
         clean_phone = ''.join(filter(str.isdigit, phone))
@@ -21,45 +35,20 @@ class WhatsAppClient:
              return f"91{clean_phone[1:]}"
         return clean_phone
 
-    def send_message(self, to: str, message: str):
-        """Send a simple text message"""
-        formatted_to = self._format_phone_number(to)
-        payload = {
+    # ==================== PAYLOADS ====================
+
+    def _text_payload(self, to: str, message: str) -> dict:
+        return {
             "messaging_product": "whatsapp",
-            "to": formatted_to,
+            "to": self._format_phone_number(to),
             "type": "text",
             "text": {"body": message}
         }
-        
-        print(f"Sending WhatsApp message to {formatted_to}: {message}")
-        
-        try:
-            response = requests.post(self.api_url, headers=self.headers, json=payload)
-            response.raise_for_status()
-            return response.json()
-        except requests.exceptions.RequestException as error:
-            print(f"Error sending WhatsApp message: {error}")
-            if hasattr(error, 'response') and error.response is not None:
-                print(f"Response: {error.response.text}")
-            raise
-    
-    def send_interactive_list(self, to: str, header: str, body: str, button_text: str, sections: list):
-        """
-        Send an interactive list message
-        
-        sections format:
-        [
-            {
-                "title": "Section Title",
-                "rows": [
-                    {"id": "unique_id", "title": "Row Title", "description": "Optional description"}
-                ]
-            }
-        ]
-        """
-        payload = {
+
+    def _list_payload(self, to: str, header: str, body: str, button_text: str, sections: list) -> dict:
+        return {
             "messaging_product": "whatsapp",
-            "to": to,
+            "to": self._format_phone_number(to),
             "type": "interactive",
             "interactive": {
                 "type": "list",
@@ -71,37 +60,13 @@ class WhatsAppClient:
                 }
             }
         }
-        
-        formatted_to = self._format_phone_number(to)
-        payload["to"] = formatted_to
-        
-        print(f"Sending interactive list to {formatted_to}")
-        
-        try:
-            response = requests.post(self.api_url, headers=self.headers, json=payload)
-            response.raise_for_status()
-            return response.json()
-        except requests.exceptions.RequestException as error:
-            print(f"Error sending interactive list: {error}")
-            if hasattr(error, 'response') and error.response is not None:
-                print(f"Response: {error.response.text}")
-            raise
-    
-    def send_interactive_buttons(self, to: str, body: str, buttons: list):
-        """
-        Send interactive reply buttons (max 3 buttons)
-        
-        buttons format:
-        [
-            {"id": "unique_id", "title": "Button Text"}
-        ]
-        """
+
+    def _buttons_payload(self, to: str, body: str, buttons: list) -> dict:
         if len(buttons) > 3:
             buttons = buttons[:3]  # WhatsApp allows max 3 buttons
-        
-        payload = {
+        return {
             "messaging_product": "whatsapp",
-            "to": to,
+            "to": self._format_phone_number(to),
             "type": "interactive",
             "interactive": {
                 "type": "button",
@@ -113,24 +78,73 @@ class WhatsAppClient:
                 }
             }
         }
-        
-        formatted_to = self._format_phone_number(to)
-        payload["to"] = formatted_to
-        
-        print(f"Sending interactive buttons to {formatted_to}")
-        
+
+    def _template_payload(self, to: str, template_name: str, language_code: str, components: list) -> dict:
+        template = {
+            "name": template_name,
+            "language": {"code": language_code}
+        }
+        if components:
+            template["components"] = components
+        return {
+            "messaging_product": "whatsapp",
+            "to": self._format_phone_number(to),
+            "type": "template",
+            "template": template
+        }
+
+    # ==================== TRANSPORT ====================
+
+    def _post(self, payload: dict, label: str, raise_errors: bool = True):
+        logger.debug("Sending %s", label)
         try:
-            response = requests.post(self.api_url, headers=self.headers, json=payload)
+            response = self._session.post(self.api_url, headers=self.headers, json=payload, timeout=self.timeout)
             response.raise_for_status()
             return response.json()
         except requests.exceptions.RequestException as error:
-            print(f"Error sending interactive buttons: {error}")
-            if hasattr(error, 'response') and error.response is not None:
-                print(f"Response: {error.response.text}")
+            response = error.response.text if getattr(error, 'response', None) is not None else None
+            logger.error("Error sending %s: %s", label, error, extra={"response": response})
+            if raise_errors:
+                raise
+
+    def send_message(self, to: str, message: str):
+        """Send a simple text message"""
+        payload = self._text_payload(to, message)
+        return self._post(payload, "WhatsApp message")
+
+    def send_interactive_list(self, to: str, header: str, body: str, button_text: str, sections: list):
+        """
+        Send an interactive list message
+
+        sections format:
+        [
+            {
+                "title": "Section Title",
+                "rows": [
+                    {"id": "unique_id", "title": "Row Title", "description": "Optional description"}
+                ]
+            }
+        ]
+        """
+        payload = self._list_payload(to, header, body, button_text, sections)
+        return self._post(payload, "interactive list")
+
+    def send_interactive_buttons(self, to: str, body: str, buttons: list):
+        """
+        Send interactive reply buttons (max 3 buttons)
+
+        buttons format:
+        [
+            {"id": "unique_id", "title": "Button Text"}
+        ]
+        """
+        payload = self._buttons_payload(to, body, buttons)
+        return self._post(payload, "interactive buttons", raise_errors=False)
+
     def send_template(self, to: str, template_name: str, language_code: str = "en_US", components: list = None):
         """
         Send a WhatsApp Template Message
-        
+
         components format:
         [
             {
@@ -142,30 +156,83 @@ class WhatsAppClient:
             }
         ]
         """
-        payload = {
-            "messaging_product": "whatsapp",
-            "to": to,
-            "type": "template",
-            "template": {
-                "name": template_name,
-                "language": {"code": language_code}
-            }
-        }
+        payload = self._template_payload(to, template_name, language_code, components)
+        return self._post(payload, "template")
 
 
-        formatted_to = self._format_phone_number(to)
-        payload["to"] = formatted_to
-        
-        print(f"Sending Template '{template_name}' to {formatted_to}")
-        
-        try:
-            response = requests.post(self.api_url, headers=self.headers, json=payload)
-            response.raise_for_status()
-            return response.json()
-        except requests.exceptions.RequestException as error:
-            print(f"Error sending template: {error}")
-            if hasattr(error, 'response') and error.response is not None:
-                print(f"Response: {error.response.text}")
-            raise
+class AsyncWhatsAppClient(WhatsAppClient):
+    """Non-blocking client for the webhook handlers.
+
+    One httpx.AsyncClient per event loop keeps a pool of keep-alive
+    connections to the Graph API; every request has a timeout and at most
+    WHATSAPP_MAX_CONCURRENCY requests are in flight at once."""
+
+    def __init__(self, api_url: str = None, max_concurrency: int = None):
+        super().__init__(api_url)
+        self.max_concurrency = max_concurrency or config.WHATSAPP_MAX_CONCURRENCY
+        self._client = None
+        self._semaphore = None
+        self._loop = None
+
+    def _ensure_client(self) -> httpx.AsyncClient:
+        loop = asyncio.get_running_loop()
+        if self._client is None or self._loop is not loop:
+            # httpx clients and semaphores are bound to the loop that created them
+            self._client = httpx.AsyncClient(
+                headers=self.headers,
+                timeout=httpx.Timeout(self.timeout),
+                limits=httpx.Limits(
+                    max_connections=config.WHATSAPP_POOL_SIZE,
+                    max_keepalive_connections=config.WHATSAPP_POOL_SIZE
+                )
+            )
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+            self._loop = loop
+        return self._client
+
+    async def _post(self, payload: dict, label: str, raise_errors: bool = True):
+        client = self._ensure_client()
+        logger.debug("Sending %s", label)
+        async with self._semaphore:
+            try:
+                response = await client.post(self.api_url, json=payload)
+                response.raise_for_status()
+                return response.json()
+            except httpx.HTTPError as error:
+                response = error.response.text if isinstance(error, httpx.HTTPStatusError) else None
+                logger.error("Error sending %s: %r", label, error, extra={"response": response})
+                if raise_errors:
+                    raise
+
+    async def send_message(self, to: str, message: str):
+        """Send a simple text message"""
+        payload = self._text_payload(to, message)
+        return await self._post(payload, "WhatsApp message")
+
+    async def send_interactive_list(self, to: str, header: str, body: str, button_text: str, sections: list):
+        """Send an interactive list message (see WhatsAppClient.send_interactive_list)"""
+        payload = self._list_payload(to, header, body, button_text, sections)
+        return await self._post(payload, "interactive list")
+
+    async def send_interactive_buttons(self, to: str, body: str, buttons: list):
+        """Send interactive reply buttons, max 3 (see WhatsAppClient.send_interactive_buttons)"""
+        payload = self._buttons_payload(to, body, buttons)
+        return await self._post(payload, "interactive buttons", raise_errors=False)
+
+    async def send_template(self, to: str, template_name: str, language_code: str = "en_US", components: list = None):
+        """Send a WhatsApp Template Message (see WhatsAppClient.send_template)"""
+        payload = self._template_payload(to, template_name, language_code, components)
+        return await self._post(payload, "template")
+
+    async def send_payload(self, payload: dict):
+        """Post a prebuilt Graph API body (used by the outbox dispatcher)"""
+        return await self._post(payload, f"{payload.get('type', 'queued')} message")
+
+    async def aclose(self):
+        """Close pooled connections (app shutdown)"""
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
 
 whatsapp_client = WhatsAppClient()
+async_whatsapp_client = AsyncWhatsAppClient()
@@ -37,6 +37,8 @@ const AppointmentList = () => {
     const [doctors, setDoctors] = useState([]);
     const [loading, setLoading] = useState(true);
     const [error, setError] = useState('');
+    const [nextCursor, setNextCursor] = useState(null);
+    const [loadingMore, setLoadingMore] = useState(false);
 
     // Initialize filters from URL params or defaults
     const [filters, setFilters] = useState({
@@ -68,20 +70,24 @@ const AppointmentList = () => {
         ? doctors.filter(d => d.specialization === selectedDepartment)
         : doctors;
 
+    const listParams = () => {
+        const params = {};
+        if (filters.date) params.date = filters.date;
+        if (filters.doctorId) params.doctorId = filters.doctorId;
+        if (filters.status) params.status = filters.status;
+        return params;
+    };
+
     const fetchData = async () => {
         try {
             setLoading(true);
-            const params = {};
-            if (filters.date) params.date = filters.date;
-            if (filters.doctorId) params.doctorId = filters.doctorId;
-            if (filters.status) params.status = filters.status;
-
             const [appointmentsRes, doctorsRes] = await Promise.all([
-                api.get('/appointments', { params }),
+                api.get('/appointments', { params: listParams() }),
                 api.get('/doctors')
             ]);
 
             setAppointments(appointmentsRes.data.data);
+            setNextCursor(appointmentsRes.data.nextCursor || null);
             setDoctors(doctorsRes.data.data);
             setError('');
         } catch (err) {
@@ -96,6 +102,19 @@ const AppointmentList = () => {
         fetchData();
     }, [filters]);
 
+    const handleLoadMore = async () => {
+        try {
+            setLoadingMore(true);
+            const response = await api.get('/appointments', { params: { ...listParams(), cursor: nextCursor } });
+            setAppointments((current) => [...current, ...response.data.data]);
+            setNextCursor(response.data.nextCursor || null);
+        } catch (err) {
+            console.error('Failed to load more appointments:', err);
+        } finally {
+            setLoadingMore(false);
+        }
+    };
+
     const handleMenuOpen = (event, appointment) => {
         setAnchorEl(event.currentTarget);
         setSelectedAppointment(appointment);
@@ -184,7 +203,17 @@ const AppointmentList = () => {
             setSelectedDepartment('');
         } catch (err) {
             console.error('Failed to create appointment:', err);
-            alert(err.response?.data?.detail || 'Failed to create appointment');
+            const detail = err.response?.data?.detail;
+            if (err.response?.status === 409 && detail?.message) {
+                // Slot already taken - suggest the next free one
+                const next = detail.nextAvailable;
+                alert(next ? `${detail.message}. Next free slot: ${next.date} at ${next.time}.` : detail.message);
+                if (next) {
+                    setNewAppointment({ ...newAppointment, date: next.date, time: next.time });
+                }
+                return;
+            }
+            alert(detail || 'Failed to create appointment');
         }
     };
 
@@ -353,6 +382,13 @@ const AppointmentList = () => {
                             </TableBody>
                         </Table>
                     </TableContainer>
+                    {nextCursor && (
+                        <Box display="flex" justifyContent="center" mt={2}>
+                            <Button variant="outlined" onClick={handleLoadMore} disabled={loadingMore}>
+                                {loadingMore ? 'Loading...' : 'Load more'}
+                            </Button>
+                        </Box>
+                    )}
                 </CardContent>
             </Card>
 
@@ -1,4 +1,4 @@
-import React, { useState, useEffect } from 'react';
+import React, { useState } from 'react';
 import { useNavigate } from 'react-router-dom';
 import {
     Box,
@@ -19,6 +19,7 @@ import {
     MedicalServices
 } from '@mui/icons-material';
 import api from '../services/api';
+import { useLiveFeed, applySummaryDelta, applyQueueDelta } from '../services/liveFeed';
 import { useAuth } from '../context/AuthContext';
 import StatCard from '../components/StatCard';
 import CalendarWidget from '../components/CalendarWidget';
@@ -50,16 +51,11 @@ const Dashboard = () => {
         }
     };
 
-    useEffect(() => {
-        fetchDashboardData();
-
-        // Auto-refresh queue every 15 seconds
-        const interval = setInterval(() => {
-            fetchDashboardData();
-        }, 15000);
-
-        return () => clearInterval(interval);
-    }, []);
+    // Load once, then follow the live change feed instead of polling
+    useLiveFeed(fetchDashboardData, (event) => {
+        setSummary((current) => applySummaryDelta(current, event));
+        setQueue((current) => applyQueueDelta(current, event));
+    });
 
     if (loading) {
         return (
@@ -184,7 +180,7 @@ const Dashboard = () => {
                             Current Queue ({queue.length})
                         </Typography>
                         <Chip
-                            label="Auto-refreshing every 15s"
+                            label="Live"
                             size="small"
                             color="primary"
                             variant="outlined"
@@ -1,4 +1,4 @@
-import React, { useState, useEffect } from 'react';
+import React, { useState } from 'react';
 import {
     Box,
     Grid,
@@ -21,6 +21,7 @@ import {
     AccessTime
 } from '@mui/icons-material';
 import api from '../services/api';
+import { useLiveFeed, applySummaryDelta, applyQueueDelta } from '../services/liveFeed';
 import { useAuth } from '../context/AuthContext';
 import StatCard from '../components/StatCard';
 
@@ -49,16 +50,11 @@ const Queue = () => {
         }
     };
 
-    useEffect(() => {
-        fetchQueueData();
-
-        // Auto-refresh every 15 seconds
-        const interval = setInterval(() => {
-            fetchQueueData();
-        }, 15000);
-
-        return () => clearInterval(interval);
-    }, []);
+    // Load once, then follow the live change feed instead of polling
+    useLiveFeed(fetchQueueData, (event) => {
+        setSummary((current) => applySummaryDelta(current, event));
+        setQueue((current) => applyQueueDelta(current, event));
+    });
 
     if (loading) {
         return (
@@ -107,7 +103,7 @@ const Queue = () => {
                     Current Queue
                 </Typography>
                 <Typography variant="body1" color="text.secondary">
-                    Live patient queue - Auto-refreshes every 15 seconds
+                    Live patient queue - Updates as appointments change
                 </Typography>
             </Box>
 
@@ -0,0 +1,101 @@
+import { useEffect, useRef } from 'react';
+import api from './api';
+
+// Subscribe to the /api/live change feed.
+// `load` fetches the full snapshot; it runs on every (re)connect, so events
+// missed while disconnected are covered. Events that arrive while a load is
+// in flight may or may not be in it, so the load is repeated instead of
+// applying them. It also reruns when the clinic's date changes (the feed's
+// `day` events), as the feed only covers the clinic's today - the browser's
+// own date can differ near midnight or in another timezone. `onEvent` gets
+// every other appointment event.
+export const useLiveFeed = (load, onEvent) => {
+    const handlers = useRef({ load, onEvent });
+    handlers.current = { load, onEvent };
+
+    useEffect(() => {
+        const source = new EventSource(`${api.defaults.baseURL}/live`);
+        let loading = false;
+        let stale = false;
+
+        const reload = async () => {
+            if (loading) {
+                stale = true;
+                return;
+            }
+            loading = true;
+            do {
+                stale = false;
+                await handlers.current.load();
+            } while (stale);
+            loading = false;
+        };
+
+        // Clinic date the loaded snapshot is for, from the server
+        let day = null;
+        const changeDay = (next) => {
+            const changed = day !== null && next !== day;
+            day = next;
+            if (changed) reload();
+            return changed;
+        };
+
+        source.onopen = reload;
+        source.addEventListener('day', (e) => {
+            changeDay(JSON.parse(e.data).day);
+        });
+        source.addEventListener('appointment', (e) => {
+            const event = JSON.parse(e.data);
+            if (changeDay(event.day)) return;
+            if (loading) {
+                stale = true;
+                return;
+            }
+            handlers.current.onEvent(event);
+        });
+
+        return () => {
+            source.close();
+        };
+    }, []);
+};
+
+const addCounts = (counts, delta) => {
+    const next = { ...counts };
+    Object.entries(delta).forEach(([key, value]) => {
+        next[key] = (next[key] || 0) + value;
+    });
+    return next;
+};
+
+// Apply an appointment event to the /dashboard/summary data
+export const applySummaryDelta = (summary, event) => {
+    if (!summary) return summary;
+    return {
+        ...summary,
+        summary: addCounts(summary.summary, event.summary),
+        doctorSummary: summary.doctorSummary.map((doc) => {
+            const delta = event.doctorSummary.find((d) => d.doctorId === doc.doctorId);
+            if (!delta) return doc;
+            const { doctorId, ...counts } = delta;
+            return addCounts(doc, counts);
+        })
+    };
+};
+
+// /api/queue order: slot time, then id
+const queueOrder = (a, b) => {
+    if (a.slotStartTime !== b.slotStartTime) return a.slotStartTime < b.slotStartTime ? -1 : 1;
+    return a.id - b.id;
+};
+
+// Apply an appointment event to the /queue list
+export const applyQueueDelta = (queue, event) => {
+    const { appointment } = event;
+    const rest = queue.filter((apt) => apt.id !== appointment.id);
+    if (!event.inQueue) return rest;
+    // Re-insert rather than replace in place, in case the slot was rescheduled
+    const index = rest.findIndex((apt) => queueOrder(appointment, apt) < 0);
+    if (index === -1) return [...rest, appointment];
+    return [...rest.slice(0, index), appointment, ...rest.slice(index)];
+};